@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+钉钉消息异步发送队列
+请求线程只负责把消息写入磁盘暂存区并入队，后台线程批量投递到钉钉，
+失败按指数退避重试；进程重启后会从暂存区恢复未发送的消息。
+
+钉钉机器人每分钟最多接收 20 条消息，超出的会被丢弃。后台线程在
+DIGEST_WINDOW 时间窗内把同一来源的消息合并成一条汇总消息，每次发送
+（包括重试）前都要从 RateLimiter 拿到配额，积压时只会让汇总变长，
+不会超出每分钟的条数限制。
+"""
+import fcntl
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+
+from webhook_metrics import REGISTRY
+
+# 配置
+# 钉钉机器人地址只在这里配置一份，webhook_receiver、webhook_hub、hotspot_replay 和爬虫都从这里导入；
+# 设置环境变量 DINGTALK_WEBHOOK 可以换成别的机器人
+DINGTALK_WEBHOOK = os.environ.get("DINGTALK_WEBHOOK", "https://oapi.dingtalk.com/robot/send?access_token=3db7259b8553e2bc2b61d16481c998a6443f3f223196412381d2a7f8d9bfe2ef")
+SPOOL_DIR = "/root/.openclaw/workspace/data/dingtalk_spool"
+QUEUE_MAXSIZE = 1000       # 内存队列上限，满了直接拒绝新消息
+DIGEST_WINDOW = 10.0       # 同一来源的消息在这个时间窗内合并发送（秒）
+DIGEST_MAX_CHARS = 4000    # 单条汇总消息的最大长度，超出拆成多条
+MESSAGE_PREFIX = "微博 - "  # 钉钉机器人安全设置要求的关键词
+RATE_LIMIT_PER_MINUTE = 20 # 每个机器人每分钟最多发送的消息数
+RATE_STATE_DIR = "/root/.openclaw/workspace/data"
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0         # 第 n 次重试前等待 BACKOFF_BASE * 2^(n-1) 秒
+BACKOFF_MAX = 60.0
+SEND_TIMEOUT = 30
+ADOPT_INTERVAL = 30.0      # 多进程模式下接管已退出 worker 暂存消息的间隔（秒）
+OWNER_LOCK = ".owner.lock" # 单进程模式的队列对暂存根目录持有共享锁，worker 拿不到排他锁时不接管根目录
+
+# 指标
+SEND_SECONDS = REGISTRY.histogram("dingtalk_send_seconds", "单次调用钉钉接口的耗时")
+DELIVERY_SECONDS = REGISTRY.histogram("dingtalk_delivery_seconds", "消息从入队到发送成功的耗时",
+                                      buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600))
+MESSAGES_TOTAL = REGISTRY.counter("dingtalk_messages_total", "按结果统计的消息数", labelnames=("result",))
+QUEUE_DEPTH = REGISTRY.gauge("dingtalk_queue_depth", "等待发送的消息数")
+
+
+class RateLimiter:
+    """滑动窗口限速器
+    
+    最近一分钟的发送时间记录在状态文件里，用文件锁保护，同一个机器人的
+    多个进程（webhook_receiver、weibo_crawler 等）共享同一份配额。
+    """
+    
+    def __init__(self, webhook_url, per_minute=RATE_LIMIT_PER_MINUTE, state_dir=RATE_STATE_DIR):
+        self.per_minute = per_minute
+        key = hashlib.sha1(webhook_url.encode()).hexdigest()[:12]
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_file = os.path.join(state_dir, f"dingtalk_rate_{key}.json")
+    
+    def acquire(self, timeout=None, stop_event=None):
+        """占用一个发送配额，没有配额时等待；超时或 stop_event 被设置时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+    
+    def _try_acquire(self):
+        """拿到配额返回 0，否则返回还需等待的秒数"""
+        with open(self.state_file, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                sent = json.loads(f.read() or "[]")
+            except ValueError:
+                sent = []
+            now = time.time()
+            sent = [t for t in sent if now - t < 60]
+            if len(sent) >= self.per_minute:
+                return sent[0] + 60 - now
+            sent.append(now)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(sent))
+            return 0
+
+
+class DingTalkQueue:
+    """带磁盘暂存、按来源合并、限速发送的钉钉投递队列"""
+    
+    def __init__(self, webhook_url, spool_dir=SPOOL_DIR, maxsize=QUEUE_MAXSIZE,
+                 digest_window=DIGEST_WINDOW, rate_per_minute=RATE_LIMIT_PER_MINUTE,
+                 prefix=MESSAGE_PREFIX, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, timeout=SEND_TIMEOUT,
+                 worker=False):
+        self.webhook_url = webhook_url
+        self.spool_root = spool_dir
+        # 多进程模式下每个 worker 使用自己的暂存子目录，避免重复发送
+        self.spool_dir = os.path.join(spool_dir, f"worker-{os.getpid()}") if worker else spool_dir
+        self.failed_dir = os.path.join(spool_dir, "failed")
+        self.digest_window = digest_window
+        self.prefix = prefix
+        self.limiter = RateLimiter(webhook_url, per_minute=rate_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        os.makedirs(self.failed_dir, exist_ok=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._owner = None
+        if not worker:
+            # 根目录是本进程的暂存区，进程存活期间一直持有，退出时由系统释放
+            self._owner = open(os.path.join(self.spool_root, OWNER_LOCK), 'a')
+            fcntl.flock(self._owner, fcntl.LOCK_SH)
+        
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)  # 有消息发送成功或判定失败时通知 drain()
+        self._latencies = deque(maxlen=1000)
+        self._stats = {"submitted": 0, "rejected": 0, "sent": 0, "failed": 0,
+                       "retries": 0, "inflight": 0, "recovered": 0, "digests": 0}
+        self._stopping = threading.Event()
+        
+        self._recover()
+        QUEUE_DEPTH.set_function(self._queue.qsize)
+        self._thread = threading.Thread(target=self._run, name="dingtalk-queue", daemon=True)
+        self._thread.start()
+    
+    def submit(self, content, source=None):
+        """写入暂存区并入队；队列已满时返回 False"""
+        item = {
+            "id": f"{time.time_ns()}-{uuid.uuid4().hex[:8]}",
+            "source": source,
+            "content": content,
+            "created": time.time(),
+        }
+        if self._queue.full():
+            return self._reject()
+        # fsync 可能要几十毫秒，不在锁内做，锁只保护入队和计数
+        self._write_spool(item)
+        with self._lock:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                pass  # 写暂存区期间被其他线程占满
+            else:
+                self._stats["submitted"] += 1
+                return True
+        self._remove_spool(item)
+        return self._reject()
+    
+    def _reject(self):
+        with self._lock:
+            self._stats["rejected"] += 1
+        MESSAGES_TOTAL.inc("rejected")
+        return False
+    
+    def depth(self):
+        """等待发送的消息数"""
+        return self._queue.qsize()
+    
+    def stats(self):
+        """队列深度、投递计数和投递延迟（秒）"""
+        with self._lock:
+            result = dict(self._stats)
+            latencies = sorted(self._latencies)
+        result["depth"] = self._queue.qsize()
+        if latencies:
+            result["latency_p50"] = latencies[len(latencies) // 2]
+            result["latency_p99"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            result["latency_max"] = latencies[-1]
+        return result
+    
+    def _outstanding(self):
+        """已提交（含恢复）但还没有发送成功或判定失败的消息数，需持有 _lock"""
+        stats = self._stats
+        return stats["submitted"] + stats["recovered"] - stats["sent"] - stats["failed"]
+    
+    def drain(self, timeout=None):
+        """等待已提交的消息全部发送或判定失败，返回是否已全部完成
+        
+        后台线程取出后还在合并窗口里等待的消息不在队列里，也没有标记为 inflight，
+        所以不能只看 depth() 和 inflight；这里按 submitted + recovered == sent + failed 判断。
+        超时或后台线程已停止时返回 False。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._settled:
+            while self._outstanding() > 0:
+                if not self._thread.is_alive():
+                    return False
+                wait = 1.0
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return False
+                self._settled.wait(wait)
+        return True
+    
+    def close(self, timeout=5):
+        """停止后台线程，未发送的消息留在暂存区，下次启动时恢复"""
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._owner and not self._thread.is_alive():
+            self._owner.close()
+            self._owner = None
+    
+    def _recover(self):
+        """把上次未发送完的暂存消息重新入队"""
+        self._load_spool(sorted(os.listdir(self.spool_dir)))
+        self._adopt_orphans()
+        if self._stats["recovered"]:
+            print(f"[DingTalk] 从暂存区恢复 {self._stats['recovered']} 条消息")
+    
+    def _load_spool(self, names):
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, name), 'r', encoding='utf-8') as f:
+                    item = json.load(f)
+                self._queue.put_nowait(item)
+                with self._lock:
+                    self._stats["recovered"] += 1
+            except queue.Full:
+                break
+            except Exception as e:
+                print(f"[DingTalk] 暂存消息读取失败 {name}: {e}")
+    
+    def _adopt_orphans(self):
+        """接管已退出 worker（以及已退出的单进程模式）留下的暂存消息
+        
+        用 rename 把文件移进自己的目录，多个 worker 同时接管时每个文件只会被一个拿到。
+        根目录只在没有单进程模式的队列持有 OWNER_LOCK 时接管，接管期间持有排他锁。
+        """
+        sources = []
+        owner_lock = None
+        if self.spool_dir != self.spool_root:
+            owner_lock = open(os.path.join(self.spool_root, OWNER_LOCK), 'a')
+            try:
+                fcntl.flock(owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                sources.append(self.spool_root)
+            except BlockingIOError:
+                pass  # 有存活的进程在使用根目录
+        for name in os.listdir(self.spool_root):
+            path = os.path.join(self.spool_root, name)
+            if not name.startswith("worker-") or path == self.spool_dir:
+                continue
+            try:
+                os.kill(int(name[len("worker-"):]), 0)
+                continue  # worker 仍在运行
+            except ProcessLookupError:
+                sources.append(path)
+            except (ValueError, PermissionError):
+                continue
+        
+        adopted = []
+        try:
+            for source in sources:
+                for name in sorted(os.listdir(source)):
+                    if not name.endswith(".json"):
+                        continue
+                    try:
+                        os.rename(os.path.join(source, name), os.path.join(self.spool_dir, name))
+                        adopted.append(name)
+                    except FileNotFoundError:
+                        pass
+                if source != self.spool_root:
+                    try:
+                        os.rmdir(source)
+                    except OSError:
+                        pass
+        finally:
+            if owner_lock:
+                owner_lock.close()
+        self._load_spool(sorted(adopted))
+    
+    def _write_spool(self, item):
+        path = os.path.join(self.spool_dir, f"{item['id']}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(item, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def _remove_spool(self, item, failed=False):
+        path = os.path.join(self.spool_dir, f"{item['id']}.json")
+        try:
+            if failed:
+                os.replace(path, os.path.join(self.failed_dir, f"{item['id']}.json"))
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def _collect(self):
+        """等第一条消息满 DIGEST_WINDOW 后取出队列里的全部消息"""
+        try:
+            items = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        linger = items[0]["created"] + self.digest_window - time.time()
+        if linger > 0 and self._stopping.wait(linger):
+            return []  # 消息仍在暂存区，下次启动时恢复
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+    
+    def _build_digests(self, items):
+        """按来源分组，每组拼成一条或多条不超过 DIGEST_MAX_CHARS 的汇总消息"""
+        groups = {}
+        for item in items:
+            groups.setdefault(item.get("source"), []).append(item)
+        
+        digests = []
+        for source, group in groups.items():
+            chunk, size = [], 0
+            for item in group:
+                if chunk and size + len(item["content"]) > DIGEST_MAX_CHARS:
+                    digests.append((self._format_digest(source, chunk), chunk))
+                    chunk, size = [], 0
+                chunk.append(item)
+                size += len(item["content"]) + 8
+            if chunk:
+                digests.append((self._format_digest(source, chunk), chunk))
+        return digests
+    
+    def _format_digest(self, source, chunk):
+        tag = f"【{source}】" if source else ""
+        if len(chunk) == 1:
+            return f"{self.prefix}{tag}{chunk[0]['content']}"
+        lines = [f"{self.prefix}{tag}{len(chunk)} 条消息汇总"]
+        for i, item in enumerate(chunk, 1):
+            lines.append(f"{i}. {item['content']}")
+        return "\n".join(lines)
+    
+    def _run(self):
+        last_adopt = time.monotonic()
+        while not self._stopping.is_set():
+            if self.spool_dir != self.spool_root and time.monotonic() - last_adopt > ADOPT_INTERVAL:
+                self._adopt_orphans()
+                last_adopt = time.monotonic()
+            items = self._collect()
+            if not items:
+                continue
+            for content, batch in self._build_digests(items):
+                if not self._deliver(content, batch):
+                    return
+    
+    def _deliver(self, content, batch):
+        """发送一条汇总消息，每次尝试都占用一个限速配额；停止时返回 False"""
+        with self._lock:
+            self._stats["inflight"] = len(batch)
+        
+        delivered = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                with self._lock:
+                    self._stats["retries"] += 1
+                if self._stopping.wait(delay):
+                    return False
+            if not self.limiter.acquire(stop_event=self._stopping):
+                return False
+            try:
+                delivered = self._send(content)
+            except Exception as e:
+                print(f"[DingTalk] 发送失败 (第 {attempt + 1} 次): {e}")
+            if delivered:
+                break
+        
+        now = time.time()
+        with self._lock:
+            self._stats["inflight"] = 0
+            if delivered:
+                self._stats["sent"] += len(batch)
+                self._stats["digests"] += 1
+                self._latencies.extend(now - item["created"] for item in batch)
+            else:
+                self._stats["failed"] += len(batch)
+            self._settled.notify_all()
+        MESSAGES_TOTAL.inc("sent" if delivered else "failed", amount=len(batch))
+        if delivered:
+            for item in batch:
+                DELIVERY_SECONDS.observe(now - item["created"])
+        for item in batch:
+            self._remove_spool(item, failed=not delivered)
+        if not delivered:
+            print(f"[DingTalk] {len(batch)} 条消息重试 {self.max_retries} 次后仍失败，已移入 {self.failed_dir}")
+        return True
+    
+    def _send(self, content):
+        payload = {
+            "msgtype": "text",
+            "text": {
+                "content": content
+            }
+        }
+        with SEND_SECONDS.time():
+            resp = requests.post(self.webhook_url, json=payload, timeout=self.timeout)
+        result = resp.json()
+        print(f"[DingTalk] 钉钉发送结果: {result}")
+        return result.get("errcode", 0) == 0
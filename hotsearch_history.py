@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+微博热搜排名时间序列
+监测脚本每轮都另存一个 data/raw_hotsearch_*.json，同一个话题在不同轮次之间
+没有关联。这里把每一轮的完整榜单追加到一个 SQLite 库里：
+
+  runs    每轮一行：run_ts（Unix 秒）、榜单条数
+  topics  话题标题 → 整数 id，标题只存一次
+  ranks   (topic_id, run_ts) 为主键的排名快照：rank、hot_count、热度标签、分类
+
+ranks 按 (topic_id, run_ts) 聚簇（WITHOUT ROWID），查一个话题的轨迹只读连续的一段；
+另有 (run_ts, rank) 索引，按时间取某一轮的榜单。置顶话题没有数字排名，rank 存 NULL。
+热度标签是 hot_count 里的文字部分（如 '综艺 806438' 的 '综艺'）。
+
+查询：
+  trajectory(title)       话题每一轮的排名和热度
+  peak(title)             最高排名、达到的时间、最高热度
+  time_on_list(title)     首次 / 最后上榜时间、上榜轮数、累计在榜时长
+  top_movers(start, end)  每小时排名上升最多的话题（与上一小时最后一轮相比）
+
+数据库使用 WAL 模式，cron 和守护进程写入时可以同时查询。
+
+用法:
+  python3 hotsearch_history.py import [文件 ...]       导入 data/raw_hotsearch_*.json
+  python3 hotsearch_history.py trajectory 标题
+  python3 hotsearch_history.py peak 标题
+  python3 hotsearch_history.py movers [--from ...] [--to ...] [--limit 5]
+  python3 hotsearch_history.py bench [--days 90]      在临时库里生成数据测试查询耗时
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+# 配置
+HISTORY_DB = os.environ.get("HOTSEARCH_HISTORY_DB", "/root/.openclaw/workspace/data/hotsearch_history.db")
+RAW_DUMPS = "/root/.openclaw/workspace/data/raw_hotsearch_*.json"
+MAX_RUN_GAP = 7200   # 相邻两轮间隔超过这么久（秒）时，只按这么久计算在榜时长（监测中断过）
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_ts INTEGER PRIMARY KEY,
+    total INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS ranks (
+    topic_id INTEGER NOT NULL,
+    run_ts INTEGER NOT NULL,
+    rank INTEGER,
+    hot_count INTEGER,
+    label TEXT,
+    category TEXT,
+    PRIMARY KEY (topic_id, run_ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ranks_run ON ranks (run_ts, rank);
+"""
+
+_HOT_COUNT = re.compile(r'(\d+)\s*$')
+
+
+def _to_ts(value):
+    """ISO 时间字符串 / datetime / Unix 秒 → Unix 秒，None 原样返回"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(datetime.fromisoformat(value.replace(' ', 'T')).timestamp())
+
+
+def _to_iso(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec='seconds') if ts is not None else None
+
+
+def _parse_rank(rank):
+    try:
+        return int(rank)
+    except (TypeError, ValueError):
+        return None  # 置顶
+
+
+def _parse_hot_count(hot_count):
+    """'综艺 806438' → (806438, '综艺')；没有数字时热度为 None"""
+    if isinstance(hot_count, int):
+        return hot_count, None
+    text = (hot_count or '').strip()
+    match = _HOT_COUNT.search(text)
+    if not match:
+        return None, text or None
+    return int(match.group(1)), text[:match.start()].strip() or None
+
+
+class HotSearchHistory:
+    """热搜排名时间序列库；一个实例对应一个连接，不要跨线程共享"""
+    
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._topic_ids = {}
+    
+    def close(self):
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _topic_id(self, title):
+        topic_id = self._topic_ids.get(title)
+        if topic_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO topics (title) VALUES (?)", (title,))
+            topic_id = self.conn.execute("SELECT id FROM topics WHERE title = ?", (title,)).fetchone()[0]
+            self._topic_ids[title] = topic_id
+        return topic_id
+    
+    def record_run(self, hot_list, run_ts=None, categories=None, total=None):
+        """追加一轮榜单，返回 run_ts；同一秒重复写入时覆盖
+        
+        hot_list: parse_hotsearch() 的结果；categories: {标题: 分类}，没有分类的话题存 NULL；
+        total: 榜单总条数，hot_list 只是其中一部分时（如只导入了健康话题）传入
+        """
+        run_ts = _to_ts(run_ts) if run_ts is not None else int(time.time())
+        categories = categories or {}
+        rows = []
+        for topic in hot_list:
+            title = (topic.get('title') or '').strip()
+            if not title:
+                continue
+            hot_count, label = _parse_hot_count(topic.get('hot_count'))
+            rows.append((self._topic_id(title), run_ts, _parse_rank(topic.get('rank')),
+                         hot_count, label, categories.get(title)))
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO runs (run_ts, total) VALUES (?, ?)",
+                              (run_ts, total if total is not None else len(rows)))
+            self.conn.execute("DELETE FROM ranks WHERE run_ts = ?", (run_ts,))
+            self.conn.executemany("INSERT OR REPLACE INTO ranks VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return run_ts
+    
+    def _find_topic(self, title):
+        row = self.conn.execute("SELECT id FROM topics WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+    
+    def trajectory(self, title, start=None, end=None):
+        """[{'run_ts', 'rank', 'hot_count', 'label', 'category'}, ...]，按时间排序"""
+        topic_id = self._find_topic(title)
+        if topic_id is None:
+            return []
+        rows = self.conn.execute(
+            "SELECT run_ts, rank, hot_count, label, category FROM ranks"
+            " WHERE topic_id = ? AND run_ts >= ? AND run_ts < ? ORDER BY run_ts",
+            (topic_id, _to_ts(start) or 0, _to_ts(end) or 2 ** 62)).fetchall()
+        return [{'run_ts': _to_iso(ts), 'rank': rank, 'hot_count': hot, 'label': label, 'category': category}
+                for ts, rank, hot, label, category in rows]
+    
+    def peak(self, title):
+        """最高排名（数字最小）及首次达到的时间、最高热度；没有记录时返回 None"""
+        topic_id = self._find_topic(title)
+        if topic_id is None:
+            return None
+        best = self.conn.execute(
+            "SELECT rank, run_ts FROM ranks WHERE topic_id = ? AND rank IS NOT NULL"
+            " ORDER BY rank, run_ts LIMIT 1", (topic_id,)).fetchone()
+        hottest = self.conn.execute(
+            "SELECT MAX(hot_count) FROM ranks WHERE topic_id = ?", (topic_id,)).fetchone()[0]
+        return {
+            'title': title,
+            'peak_rank': best[0] if best else None,
+            'peak_at': _to_iso(best[1]) if best else None,
+            'max_hot_count': hottest,
+        }
+    
+    def time_on_list(self, title, max_gap=MAX_RUN_GAP):
+        """上榜统计：每一轮在榜时，按到下一轮的间隔（最多 max_gap 秒）累计在榜时长"""
+        topic_id = self._find_topic(title)
+        if topic_id is None:
+            return None
+        first, last, runs = self.conn.execute(
+            "SELECT MIN(run_ts), MAX(run_ts), COUNT(*) FROM ranks WHERE topic_id = ?", (topic_id,)).fetchone()
+        if not runs:
+            return None
+        # 只需要话题在榜期间及最后一次上榜之后那一轮的 runs
+        seconds = self.conn.execute(
+            """
+            SELECT COALESCE(SUM(MIN(COALESCE(r.next_ts - r.run_ts, 0), ?)), 0)
+            FROM (SELECT run_ts, LEAD(run_ts) OVER (ORDER BY run_ts) AS next_ts
+                  FROM runs WHERE run_ts >= ?
+                    AND run_ts <= COALESCE((SELECT MIN(run_ts) FROM runs WHERE run_ts > ?), ?)) AS r
+            JOIN ranks ON ranks.topic_id = ? AND ranks.run_ts = r.run_ts
+            """, (max_gap, first, last, last, topic_id)).fetchone()[0]
+        return {
+            'title': title,
+            'first_seen': _to_iso(first),
+            'last_seen': _to_iso(last),
+            'runs': runs,
+            'seconds': seconds,
+        }
+    
+    def top_movers(self, start=None, end=None, limit=5):
+        """每小时排名上升最多的话题：比较每小时最后一轮与上一小时最后一轮的排名
+        
+        返回 [{'hour', 'title', 'from_rank', 'to_rank', 'climb'}, ...]，按小时、上升名次排序；
+        只统计两轮都有数字排名的话题，新上榜的话题不算。
+        """
+        start_ts = _to_ts(start) or 0
+        end_ts = _to_ts(end) or 2 ** 62
+        rows = self.conn.execute(
+            """
+            WITH hourly AS (
+                SELECT run_ts / 3600 AS hour, MAX(run_ts) AS run_ts FROM runs
+                WHERE run_ts >= ? - 3600 AND run_ts < ? GROUP BY run_ts / 3600
+            ),
+            pairs AS (
+                SELECT hour, run_ts,
+                       LAG(run_ts) OVER (ORDER BY hour) AS prev_ts,
+                       LAG(hour) OVER (ORDER BY hour) AS prev_hour
+                FROM hourly
+            ),
+            moves AS (
+                SELECT pairs.hour AS hour, cur.topic_id AS topic_id, prev.rank AS from_rank, cur.rank AS to_rank,
+                       prev.rank - cur.rank AS climb,
+                       ROW_NUMBER() OVER (PARTITION BY pairs.hour ORDER BY prev.rank - cur.rank DESC, cur.rank) AS n
+                FROM pairs
+                JOIN ranks AS cur ON cur.run_ts = pairs.run_ts
+                JOIN ranks AS prev ON prev.topic_id = cur.topic_id AND prev.run_ts = pairs.prev_ts
+                WHERE pairs.prev_hour = pairs.hour - 1 AND pairs.run_ts >= ?
+                  AND cur.rank IS NOT NULL AND prev.rank IS NOT NULL AND prev.rank > cur.rank
+            )
+            SELECT moves.hour, topics.title, from_rank, to_rank, climb
+            FROM moves JOIN topics ON topics.id = moves.topic_id
+            WHERE n <= ? ORDER BY moves.hour, climb DESC, to_rank
+            """, (start_ts, end_ts, start_ts, limit)).fetchall()
+        return [{'hour': _to_iso(hour * 3600), 'title': title, 'from_rank': from_rank,
+                 'to_rank': to_rank, 'climb': climb}
+                for hour, title, from_rank, to_rank, climb in rows]
+    
+    def run_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+
+def import_raw_dumps(history, paths):
+    """导入监测脚本以前保存的 raw_hotsearch_*.json（只有健康话题），返回导入的轮数"""
+    count = 0
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            topics = data.get('health_topics', [])
+            history.record_run(topics, data['timestamp'], {t['title']: '健康' for t in topics if t.get('title')},
+                               total=data.get('total'))
+            count += 1
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[History] 跳过 {path}: {e}")
+    return count
+
+
+def _synthetic_runs(days, per_run=50, interval=3600, seed=1):
+    """生成 days 天、每 interval 秒一轮的模拟榜单，话题平均在榜约 8 小时"""
+    rng = random.Random(seed)
+    start = int(time.time()) // 3600 * 3600 - days * 86400
+    board = [f"话题{i}" for i in range(per_run)]
+    next_id = per_run
+    for n in range(days * 86400 // interval):
+        for _ in range(rng.randint(2, 10)):
+            board.pop(rng.randrange(len(board)))
+            board.insert(rng.randrange(len(board) + 1), f"话题{next_id}")
+            next_id += 1
+        for _ in range(5):
+            i, j = rng.randrange(per_run), rng.randrange(per_run)
+            board[i], board[j] = board[j], board[i]
+        yield start + n * interval, [{'rank': str(i + 1), 'title': t, 'hot_count': str(rng.randint(1, 10 ** 6))}
+                                     for i, t in enumerate(board)]
+
+
+def benchmark(days=90, rounds=20):
+    """在临时库里写入 days 天的每小时榜单，返回写入和各查询的耗时"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        with HotSearchHistory(os.path.join(tmp, "bench.db")) as history:
+            start = time.perf_counter()
+            runs = 0
+            for run_ts, hot_list in _synthetic_runs(days):
+                history.record_run(hot_list, run_ts)
+                runs += 1
+            results['record_run (毫秒/轮)'] = (time.perf_counter() - start) / runs * 1e3
+            rows = history.conn.execute("SELECT COUNT(*) FROM ranks").fetchone()[0]
+            titles = [t for (t,) in history.conn.execute(
+                "SELECT title FROM topics ORDER BY random() LIMIT ?", (rounds,))]
+            last_day = history.conn.execute("SELECT MAX(run_ts) FROM runs").fetchone()[0] - 86400
+            queries = {
+                'trajectory': lambda t: history.trajectory(t),
+                'peak': lambda t: history.peak(t),
+                'time_on_list': lambda t: history.time_on_list(t),
+                'top_movers (24 小时)': lambda t: history.top_movers(last_day, None),
+            }
+            for name, query in queries.items():
+                start = time.perf_counter()
+                for title in titles:
+                    query(title)
+                results[f'{name} (毫秒/次)'] = (time.perf_counter() - start) / len(titles) * 1e3
+            results['_size'] = (runs, rows, os.path.getsize(history.path))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="微博热搜排名时间序列")
+    parser.add_argument("--db", default=HISTORY_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import", help="导入以前保存的 raw_hotsearch_*.json")
+    p.add_argument("files", nargs="*")
+    for name in ("trajectory", "peak", "time"):
+        sub.add_parser(name).add_argument("title")
+    p = sub.add_parser("movers", help="每小时排名上升最多的话题")
+    p.add_argument("--from", dest="start", help="起始时间（含），ISO 格式")
+    p.add_argument("--to", dest="end", help="结束时间（不含），ISO 格式")
+    p.add_argument("--limit", type=int, default=5)
+    p = sub.add_parser("bench", help="在临时库里测试写入和查询耗时")
+    p.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+    
+    if args.command == "bench":
+        results = benchmark(args.days)
+        runs, rows, size = results.pop('_size')
+        print(f"[History] {args.days} 天 {runs} 轮, {rows} 条排名, 库大小 {size / 1024 / 1024:.1f} MB")
+        for name, millis in results.items():
+            print(f"  {name:<24} {millis:8.3f}")
+        return
+    
+    with HotSearchHistory(args.db) as history:
+        if args.command == "import":
+            paths = args.files or sorted(glob.glob(RAW_DUMPS))
+            print(f"[History] 导入 {import_raw_dumps(history, paths)} 轮，共 {history.run_count()} 轮")
+            return
+        if args.command == "trajectory":
+            result = history.trajectory(args.title)
+        elif args.command == "peak":
+            result = history.peak(args.title)
+        elif args.command == "time":
+            result = history.time_on_list(args.title)
+        else:
+            result = history.top_movers(args.start, args.end, args.limit)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
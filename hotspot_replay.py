@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+热点日志回放 / 回填
+修改筛选或汇总逻辑后，把历史记录（原始 JSONL 和压缩分段）重新送进与线上
+相同的 webhook_sinks 管道。按天切分给多个进程并行处理，可以限制总速率。
+
+可用的 sink：
+  summary   重新计算每天的汇总统计，写到 --summary-dir（默认 hotspots/summary_replay）
+  file      按原始时间戳写入 --log-dir 下的 JSONL（不能是日志源目录本身）
+  dingtalk  推送到钉钉（仍受机器人限速），暂存在单独的 --spool-dir，
+            不会接管线上 webhook_receiver 暂存区里的消息
+  gateway   转发到 OpenClaw 网关
+
+用法:
+  python3 hotspot_replay.py --from 2026-10-01 --to 2026-10-08 --sinks summary
+  python3 hotspot_replay.py --from 2026-10-17T08:00 --source weibo_crawler --sinks gateway --rate 50
+  python3 hotspot_replay.py --dry-run                     只统计会回放多少条，不调用任何 sink
+"""
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+from dingtalk_queue import SPOOL_DIR as DINGTALK_SPOOL_DIR
+from hotspot_store import LOG_DIR, STORE_DIR, iter_day_events, list_days
+from hotspot_summary import new_day_state, update_state
+from webhook_sinks import Sink, SinkPipeline
+
+# 配置
+SUMMARY_DIR = f"{LOG_DIR}/summary_replay"
+SPOOL_DIR = f"{DINGTALK_SPOOL_DIR}_replay"  # 不能与线上的暂存区相同，否则 worker 会接管它的消息
+DEFAULT_SINKS = ("summary",)
+IN_FLIGHT = 500            # 每个进程最多同时在管道中的记录数
+PROGRESS_INTERVAL = 10.0   # 打印进度的间隔（秒）
+
+
+class SummarySink(Sink):
+    """按天重新计算汇总统计，关闭时写入 summary_dir"""
+    
+    name = "summary"
+    timeout = 5.0
+    concurrency = 1  # update_state 不是线程安全的，且需要按顺序累加
+    
+    def __init__(self, summary_dir=SUMMARY_DIR):
+        self.summary_dir = summary_dir
+        self._days = {}
+    
+    def send(self, event):
+        day = event["timestamp"][:10]
+        state = self._days.get(day)
+        if state is None:
+            state = self._days[day] = new_day_state(day)
+        update_state(state, event)
+    
+    def close(self):
+        os.makedirs(self.summary_dir, exist_ok=True)
+        for day, state in self._days.items():
+            path = f"{self.summary_dir}/{day}.json"
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+
+def build_sinks(names, options):
+    """在回放进程内创建 sink；返回 (sink 列表, 钉钉队列或 None)"""
+    sinks = []
+    queue = None
+    for name in names:
+        if name == "summary":
+            sinks.append(SummarySink(options["summary_dir"]))
+        elif name == "file":
+            from webhook_logger import JsonlGroupWriter
+            from webhook_sinks import FileLogSink
+            os.makedirs(options["log_dir"], exist_ok=True)
+            sinks.append(FileLogSink(JsonlGroupWriter(log_dir=options["log_dir"], fsync_policy="never")))
+        elif name == "dingtalk":
+            from dingtalk_queue import DINGTALK_WEBHOOK, DingTalkQueue
+            from webhook_sinks import DingTalkSink
+            queue = DingTalkQueue(DINGTALK_WEBHOOK, spool_dir=options["spool_dir"], worker=True)
+            sinks.append(DingTalkSink(queue))
+        elif name == "gateway":
+            from openclaw_client import GatewayClient
+            from webhook_sinks import GatewaySink
+            sinks.append(GatewaySink(GatewayClient(timeout=GatewaySink.timeout)))
+        else:
+            raise ValueError(f"未知的 sink: {name}")
+    return sinks, queue
+
+
+class Pacer:
+    """开环限速：第 n 条记录不早于 start + n / rate 发出，rate 为 None 时不限速"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = time.monotonic()
+    
+    def wait(self):
+        if not self.interval:
+            return
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time, time.monotonic() - 1.0) + self.interval
+
+
+def replay_days(task):
+    """在一个进程里回放若干天，返回统计结果"""
+    days, options = task
+    stats = {"days": days, "records": 0, "sinks": {}, "seconds": 0.0}
+    start_time = time.perf_counter()
+    pipeline = None
+    queue = None
+    if not options["dry_run"]:
+        sinks, queue = build_sinks(options["sinks"], options)
+        pipeline = SinkPipeline(sinks)
+    pacer = Pacer(options["rate"])
+    pending = []
+    last_progress = time.monotonic()
+    
+    def collect(handle):
+        for name, result in pipeline.collect(handle).items():
+            counts = stats["sinks"].setdefault(name, {})
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+    
+    try:
+        for day in days:
+            for record in iter_day_events(day, options["start"], options["end"],
+                                          options["source"], options["category"],
+                                          options["source_log_dir"], options["store_dir"]):
+                pacer.wait()
+                stats["records"] += 1
+                if pipeline:
+                    pending.append(pipeline.submit(record.get("data") or {}, record["timestamp"]))
+                    if len(pending) >= IN_FLIGHT:
+                        collect(pending.pop(0))
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    print(f"[Replay] 进程 {os.getpid()}: {day} 已回放 {stats['records']} 条")
+        for handle in pending:
+            collect(handle)
+        if queue:
+            # 等钉钉队列发完再退出，否则消息会留在暂存区
+            queue.drain()
+    finally:
+        if pipeline:
+            pipeline.close()
+    stats["seconds"] = time.perf_counter() - start_time
+    return stats
+
+
+def partition(days, workers):
+    """把日期轮流分给各进程，相邻日期的数据量接近，轮流分配比切块更均匀"""
+    groups = [days[i::workers] for i in range(workers)]
+    return [g for g in groups if g]
+
+
+def replay(start=None, end=None, source=None, category=None, sinks=DEFAULT_SINKS,
+           workers=None, rate=None, dry_run=False, log_dir=None, summary_dir=SUMMARY_DIR,
+           source_log_dir=LOG_DIR, store_dir=STORE_DIR, spool_dir=SPOOL_DIR):
+    """回放 [start, end) 内的记录，返回汇总统计；rate 是所有进程合计的每秒记录数"""
+    if "file" in sinks and not dry_run:
+        if not log_dir or os.path.abspath(log_dir) == os.path.abspath(source_log_dir):
+            raise ValueError("file sink 需要用 --log-dir 指定另一个目录，不能写回日志源目录")
+    if "dingtalk" in sinks and not dry_run:
+        if os.path.abspath(spool_dir) == os.path.abspath(DINGTALK_SPOOL_DIR):
+            raise ValueError("dingtalk sink 需要单独的 --spool-dir，不能使用线上的钉钉暂存区")
+    days = list_days(start, end, source_log_dir, store_dir)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(days) or 1))
+    options = {
+        "start": start, "end": end, "source": source, "category": category,
+        "sinks": list(sinks), "dry_run": dry_run,
+        "rate": rate / workers if rate else None,
+        "log_dir": log_dir, "summary_dir": summary_dir,
+        "source_log_dir": source_log_dir, "store_dir": store_dir, "spool_dir": spool_dir,
+    }
+    print(f"[Replay] {len(days)} 天, {workers} 个进程, sink: {'(dry-run)' if dry_run else ', '.join(sinks)}"
+          f", 速率上限: {rate or '不限'}")
+    
+    started = time.perf_counter()
+    tasks = [(group, options) for group in partition(days, workers)]
+    if workers == 1:
+        results = [replay_days(task) for task in tasks]
+    else:
+        with Pool(workers) as pool:
+            results = pool.map(replay_days, tasks)
+    elapsed = time.perf_counter() - started
+    
+    report = {"days": len(days), "workers": workers, "dry_run": dry_run,
+              "records": sum(r["records"] for r in results),
+              "seconds": round(elapsed, 3), "sinks": {}}
+    report["records_per_second"] = round(report["records"] / elapsed, 1) if elapsed > 0 else None
+    for result in results:
+        for name, counts in result["sinks"].items():
+            total = report["sinks"].setdefault(name, {})
+            for status, count in counts.items():
+                total[status] = total.get(status, 0) + count
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点日志回放 / 回填")
+    parser.add_argument("--from", dest="start", help="起始时间（含），ISO 格式")
+    parser.add_argument("--to", dest="end", help="结束时间（不含），ISO 格式")
+    parser.add_argument("--source")
+    parser.add_argument("--category")
+    parser.add_argument("--sinks", default=','.join(DEFAULT_SINKS), help="逗号分隔: summary, file, dingtalk, gateway")
+    parser.add_argument("--workers", type=int, help="并行进程数，默认 CPU 核数")
+    parser.add_argument("--rate", type=float, help="所有进程合计每秒最多回放的记录数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不调用 sink")
+    parser.add_argument("--log-dir", help="file sink 的输出目录")
+    parser.add_argument("--summary-dir", default=SUMMARY_DIR, help="summary sink 的输出目录")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="dingtalk sink 的暂存目录")
+    parser.add_argument("--report", help="把统计结果另存为 JSON 文件")
+    args = parser.parse_args()
+    
+    report = replay(args.start, args.end, args.source, args.category,
+                    sinks=[s.strip() for s in args.sinks.split(',') if s.strip()],
+                    workers=args.workers, rate=args.rate, dry_run=args.dry_run,
+                    log_dir=args.log_dir, summary_dir=args.summary_dir,
+                    spool_dir=args.spool_dir)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
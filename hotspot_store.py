@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+热点日志压缩分段存储
+当天的记录仍写在 hotspots/YYYY-MM-DD.jsonl；一天结束后把它压缩成
+hotspots/store/ 下的分段文件（压缩前按时间戳重新排序），每 BLOCK_RECORDS 条记录压缩成一个独立的块
+（gzip member 或 zstd frame），旁边的 .idx 索引记录每个块的字节位置、
+时间范围、来源和分类。按时间范围查询时只解压命中的块。
+全部分段写完后才写入 YYYY-MM-DD.manifest.json，没有 manifest 的日期视为未压缩。
+最近几天的事件另有 RecentEventIndex 内存索引，webhook_logger 的 GET /events 优先查它。
+
+安装了 zstandard 时使用 zstd，否则使用 gzip。
+
+用法:
+  python3 hotspot_store.py compact                 压缩已结束的日志
+  python3 hotspot_store.py query FROM TO [来源] [分类]  按时间范围查询
+"""
+import gzip
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from webhook_codec import loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 配置
+LOG_DIR = os.environ.get("HOTSPOT_LOG_DIR", "/root/.openclaw/workspace/hotspots")  # 压测时指向临时目录
+STORE_DIR = f"{LOG_DIR}/store"
+BLOCK_RECORDS = 500                    # 每个压缩块的记录数
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024   # 单个分段文件的最大压缩后大小
+COMPACT_GRACE = 600                    # 日志文件最后修改超过这么久（秒）才压缩，留给跨零点的迟到记录
+KEEP_PLAIN_AFTER_COMPACT = False       # 压缩并校验后是否保留原始 JSONL
+COMPRESSION = "zstd" if zstandard else "gzip"
+RECENT_DAYS = 2                        # 内存索引保留最近几天（含今天）的事件
+
+_EXTENSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("读取 zstd 分段需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _to_iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class SegmentWriter:
+    """把一天的记录写成若干压缩分段和对应的索引"""
+    
+    def __init__(self, day, store_dir=STORE_DIR, codec=COMPRESSION):
+        self.day = day
+        self.store_dir = store_dir
+        self.codec = codec
+        os.makedirs(store_dir, exist_ok=True)
+        self._seq = 0
+        self._file = None
+        self._index = None
+        self._block = []  # [(行, 解析后的记录)]
+        self._segments = []
+        self.records = 0
+        self.skipped = 0  # 无法解析（损坏或写了一半）的行
+    
+    def add(self, line, record=None):
+        """加入一行（record 为已解析的记录时不再解析）；无法解析的行跳过并计入 skipped，返回是否加入"""
+        if record is None:
+            record = _parse_line(line)
+        if record is None:
+            self.skipped += 1
+            return False
+        self._block.append((line if line.endswith('\n') else line + '\n', record))
+        if len(self._block) >= BLOCK_RECORDS:
+            self._flush_block()
+        return True
+    
+    def close(self):
+        """写完剩余的块并写入 manifest，之后读者才能看到这一天的分段"""
+        self._flush_block()
+        self._close_segment()
+        manifest = {
+            "day": self.day,
+            "codec": self.codec,
+            "records": self.records,
+            "segments": self._segments,
+        }
+        path = f"{self.store_dir}/{self.day}.manifest.json"
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+    
+    def _open_segment(self):
+        base = f"{self.day}.{self._seq:03d}"
+        self._segments.append({"data": base + _EXTENSIONS[self.codec], "index": base + ".idx"})
+        self._file = open(f"{self.store_dir}/{base}{_EXTENSIONS[self.codec]}", 'wb')
+        self._index = open(f"{self.store_dir}/{base}.idx", 'w', encoding='utf-8')
+        self._seq += 1
+    
+    def _close_segment(self):
+        if not self._file:
+            return
+        for f in (self._file, self._index):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        self._file = None
+        self._index = None
+    
+    def _flush_block(self):
+        if not self._block:
+            return
+        if self._file and self._file.tell() >= SEGMENT_MAX_BYTES:
+            self._close_segment()
+        if not self._file:
+            self._open_segment()
+        
+        timestamps = []
+        sources = set()
+        categories = set()
+        for _, record in self._block:
+            data = record.get("data")
+            data = data if isinstance(data, dict) else {}
+            timestamps.append(str(record.get("timestamp", "")))
+            sources.add(str(data.get("source", "unknown")))
+            categories.add(str(data.get("category", "未分类")))
+        
+        payload = _compress(''.join(line for line, _ in self._block).encode('utf-8'), self.codec)
+        entry = {
+            "offset": self._file.tell(),
+            "length": len(payload),
+            "count": len(self._block),
+            "first_ts": min(timestamps),
+            "last_ts": max(timestamps),
+            "sources": sorted(sources),
+            "categories": sorted(categories),
+        }
+        self._file.write(payload)
+        self._index.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.records += len(self._block)
+        self._block = []
+
+
+def _parse_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _timestamp_seconds(record):
+    try:
+        return datetime.fromisoformat(record["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _iter_sorted_lines(path):
+    """按时间戳稳定排序读出一天的日志，产出 (行, 记录)，无法解析的行记录为 None
+    
+    并发写入时行的先后和时间戳只是大致一致。第一遍找出记录最多比前面出现过的
+    最大时间戳早多少秒，第二遍用只容纳这段时间窗口的小根堆重排，内存占用取决于
+    乱序的程度而不是一整天的数据量。时间戳无法解析的记录留在原来的位置。
+    """
+    lateness = 0.0
+    latest = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = _parse_line(line) if line.strip() else None
+            seconds = _timestamp_seconds(record) if record else None
+            if seconds is None:
+                continue
+            if latest is None or seconds > latest:
+                latest = seconds
+            else:
+                lateness = max(lateness, latest - seconds)
+    
+    heap = []
+    latest = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = _parse_line(line)
+            if record is None:
+                yield line, None
+                continue
+            seconds = _timestamp_seconds(record)
+            if seconds is None:
+                seconds = latest if latest is not None else float('-inf')
+            heapq.heappush(heap, (seconds, lineno, line, record))
+            if latest is None or seconds > latest:
+                latest = seconds
+            # 之后的记录都不会早于 latest - lateness，比它早的可以输出了
+            while heap[0][0] < latest - lateness:
+                _, _, line, record = heapq.heappop(heap)
+                yield line, record
+    while heap:
+        _, _, line, record = heapq.heappop(heap)
+        yield line, record
+
+
+def compact_day(day, log_dir=LOG_DIR, store_dir=STORE_DIR, keep_plain=KEEP_PLAIN_AFTER_COMPACT):
+    """把 day 的 JSONL 按时间戳排序后压缩成分段；成功返回记录数"""
+    plain = f"{log_dir}/{day}.jsonl"
+    if list_segments(day, store_dir):
+        return 0
+    writer = SegmentWriter(day, store_dir)
+    lines = 0
+    for line, record in _iter_sorted_lines(plain):
+        writer.add(line, record)
+        lines += 1
+    writer.close()
+    if writer.records + writer.skipped != lines:
+        raise RuntimeError(f"{day} 压缩后记录数不一致: {writer.records} + {writer.skipped} != {lines}")
+    if writer.skipped:
+        print(f"[Store] {day} 有 {writer.skipped} 行无法解析，已跳过")
+    if not keep_plain:
+        os.remove(plain)
+    return writer.records
+
+
+def compact_pending(log_dir=LOG_DIR, store_dir=STORE_DIR, grace=COMPACT_GRACE):
+    """压缩所有已结束（早于今天且超过 grace 秒未修改）且尚未压缩的日志"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    compacted = {}
+    for name in sorted(os.listdir(log_dir)):
+        if not name.endswith('.jsonl') or len(name) != len('YYYY-MM-DD.jsonl'):
+            continue
+        day = name[:10]
+        path = f"{log_dir}/{name}"
+        if day >= today or time.time() - os.path.getmtime(path) < grace:
+            continue
+        if list_segments(day, store_dir):
+            continue
+        try:
+            compacted[day] = compact_day(day, log_dir, store_dir)
+            print(f"[Store] 已压缩 {day}: {compacted[day]} 条")
+        except Exception as e:
+            print(f"[Store] 压缩 {day} 失败: {e}")
+    return compacted
+
+
+def list_segments(day, store_dir=STORE_DIR):
+    """返回 day 已完成的分段 [(数据文件路径, 索引路径, 编码)]"""
+    try:
+        with open(f"{store_dir}/{day}.manifest.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return []
+    return [(f"{store_dir}/{seg['data']}", f"{store_dir}/{seg['index']}", manifest["codec"])
+            for seg in manifest["segments"]]
+
+
+def _matches(record, start, end, source, category):
+    timestamp = record.get("timestamp", "")
+    if start and timestamp < start:
+        return False
+    if end and timestamp >= end:
+        return False
+    data = record.get("data") or {}
+    if source and str(data.get("source", "unknown")) != source:
+        return False
+    if category and str(data.get("category", "未分类")) != category:
+        return False
+    return True
+
+
+def iter_segment_events(day, start=None, end=None, source=None, category=None, store_dir=STORE_DIR):
+    """读取 day 的压缩分段，按索引跳过不相关的块"""
+    for path, index_path, codec in list_segments(day, store_dir):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            blocks = [json.loads(line) for line in f if line.strip()]
+        with open(path, 'rb') as f:
+            for block in blocks:
+                if start and block["last_ts"] < start:
+                    continue
+                if end and block["first_ts"] >= end:
+                    continue
+                if source and source not in block["sources"]:
+                    continue
+                if category and category not in block["categories"]:
+                    continue
+                f.seek(block["offset"])
+                data = _decompress(f.read(block["length"]), codec)
+                for line in data.decode('utf-8').splitlines():
+                    record = loads(line)
+                    if _matches(record, start, end, source, category):
+                        yield record
+
+
+def iter_plain_events(day, start=None, end=None, source=None, category=None, log_dir=LOG_DIR):
+    """读取尚未压缩的当天 JSONL"""
+    path = f"{log_dir}/{day}.jsonl"
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            try:
+                record = loads(line)
+            except ValueError:
+                continue
+            if _matches(record, start, end, source, category):
+                yield record
+
+
+def iter_day_events(day, start=None, end=None, source=None, category=None,
+                    log_dir=LOG_DIR, store_dir=STORE_DIR):
+    """读取磁盘上某一天的事件，已压缩的走分段索引，否则读原始 JSONL"""
+    if list_segments(day, store_dir):
+        return iter_segment_events(day, start, end, source, category, store_dir)
+    return iter_plain_events(day, start, end, source, category, log_dir)
+
+
+def iter_events(start=None, end=None, source=None, category=None,
+                log_dir=LOG_DIR, store_dir=STORE_DIR):
+    """按时间范围 [start, end) 读取事件，已压缩的日期走分段索引，其余读原始 JSONL
+    
+    start / end 可以是 ISO 格式字符串或 datetime；不指定 start 时从最早的数据开始。
+    压缩分段在压缩时已按时间戳排序；尚未压缩的 JSONL 按提交顺序排列，并发写入时
+    时间戳可能略有先后颠倒（当天的数据由 RecentEventIndex 按时间戳排序）。
+    """
+    start, end = _to_iso(start), _to_iso(end)
+    for day in _days_between(start, end, log_dir, store_dir):
+        yield from iter_day_events(day, start, end, source, category, log_dir, store_dir)
+
+
+class RecentEventIndex:
+    """最近 days 天事件的内存索引
+    
+    写入当天 JSONL 的一方在每次提交后调用 observe()（与 HotspotAggregator 相同的
+    回调签名）。第一次见到某一天时先从文件读入已有记录，之后只追加新提交的行；
+    字节位置对不上（重启、其他进程写入）时从文件补读。每天的记录按时间戳排序，
+    查询时二分定位范围。索引之外的日期回退到磁盘上的分段 / JSONL。
+    """
+    
+    def __init__(self, log_dir=LOG_DIR, store_dir=STORE_DIR, days=RECENT_DAYS):
+        self.log_dir = log_dir
+        self.store_dir = store_dir
+        self.days = days
+        self._lock = threading.Lock()
+        self._days = {}  # day -> {"offset", "timestamps", "records"}
+    
+    def observe(self, day, lines, start_offset, end_offset):
+        with self._lock:
+            entry = self._load(day)
+            if entry is None:
+                return
+            if start_offset != entry["offset"]:
+                self._catch_up(day, entry)
+                return
+            for line in lines:
+                self._add(entry, loads(line))
+            entry["offset"] = end_offset
+    
+    def size(self):
+        """索引中的记录数"""
+        with self._lock:
+            return sum(len(entry["records"]) for entry in self._days.values())
+    
+    def iter_events(self, start=None, end=None, source=None, category=None):
+        """与模块级 iter_events 相同，索引覆盖的日期直接查内存（本身已按时间戳排序）"""
+        start, end = _to_iso(start), _to_iso(end)
+        with self._lock:
+            indexed = set(self._days)
+        days = set(_days_between(start, end, self.log_dir, self.store_dir))
+        days.update(d for d in indexed
+                    if (not start or d >= start[:10]) and (not end or d <= end[:10]))
+        for day in sorted(days):
+            records = self._slice(day, start, end)
+            if records is None:
+                yield from iter_day_events(day, start, end, source, category,
+                                           self.log_dir, self.store_dir)
+                continue
+            for record in records:
+                if _matches(record, None, None, source, category):
+                    yield record
+    
+    def _slice(self, day, start, end):
+        """返回 day 中落在 [start, end) 的记录副本，不在索引中时返回 None"""
+        with self._lock:
+            entry = self._days.get(day)
+            if entry is None:
+                return None
+            timestamps = entry["timestamps"]
+            lo = bisect_left(timestamps, start) if start else 0
+            hi = bisect_left(timestamps, end) if end else len(timestamps)
+            return entry["records"][lo:hi]
+    
+    def _load(self, day):
+        entry = self._days.get(day)
+        if entry is not None:
+            return entry
+        newer = sorted((d for d in self._days if d > day), reverse=True)
+        if len(newer) >= self.days:
+            return None  # 比索引保留的日期还早，留给磁盘查询
+        entry = self._days[day] = {"offset": 0, "timestamps": [], "records": []}
+        self._catch_up(day, entry)
+        for old_day in sorted(self._days, reverse=True)[self.days:]:
+            del self._days[old_day]
+        return entry
+    
+    def _catch_up(self, day, entry):
+        path = f"{self.log_dir}/{day}.jsonl"
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            f.seek(entry["offset"])
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                try:
+                    self._add(entry, loads(raw))
+                except ValueError:
+                    pass
+                entry["offset"] += len(raw)
+    
+    @staticmethod
+    def _add(entry, record):
+        timestamp = record.get("timestamp", "")
+        timestamps = entry["timestamps"]
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            entry["records"].append(record)
+        else:
+            # 并发请求的时间戳和提交顺序可能有微小差异
+            pos = bisect_right(timestamps, timestamp)
+            timestamps.insert(pos, timestamp)
+            entry["records"].insert(pos, record)
+
+
+def list_days(start=None, end=None, log_dir=LOG_DIR, store_dir=STORE_DIR):
+    """返回 [start, end) 范围内有数据（原始 JSONL 或压缩分段）的日期"""
+    return _days_between(_to_iso(start), _to_iso(end), log_dir, store_dir)
+
+
+def _days_between(start, end, log_dir, store_dir):
+    days = set()
+    for directory in (log_dir, store_dir):
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name[:4].isdigit() and name[4:5] == '-' and name[7:8] == '-':
+                    days.add(name[:10])
+    first = start[:10] if start else None
+    last = end[:10] if end else None
+    return sorted(d for d in days if (not first or d >= first) and (not last or d <= last))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('compact', 'query'):
+        print(__doc__)
+        sys.exit(1)
+    
+    if sys.argv[1] == 'compact':
+        result = compact_pending()
+        print(f"共压缩 {len(result)} 天")
+        return
+    
+    start = sys.argv[2] if len(sys.argv) > 2 else None
+    end = sys.argv[3] if len(sys.argv) > 3 else None
+    source = sys.argv[4] if len(sys.argv) > 4 else None
+    category = sys.argv[5] if len(sys.argv) > 5 else None
+    for record in iter_events(start, end, source, category):
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
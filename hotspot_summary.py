@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+热点日志增量汇总
+webhook_logger 每提交一批记录就更新当天的累计统计（按来源、分类、话题计数，
+话题的最高排名和峰值热度），并定期把统计状态保存到 hotspots/summary/，
+中午汇总时直接读取状态即可出报告，不需要重读整天的 JSONL。
+
+状态里记录了已统计到的 JSONL 字节位置，服务重启或漏掉的部分会从该位置补读。
+
+用法: python3 hotspot_summary.py [YYYY-MM-DD]
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from webhook_codec import loads
+
+# 配置
+LOG_DIR = os.environ.get("HOTSPOT_LOG_DIR", "/root/.openclaw/workspace/hotspots")  # 压测时指向临时目录
+SUMMARY_DIR = f"{LOG_DIR}/summary"
+CHECKPOINT_INTERVAL = 30.0  # 状态落盘间隔（秒）
+REPORT_TOP_N = 20
+
+
+def _to_int(value):
+    """把排名 / 热度转成整数，'置顶'、'剧集 12345' 之类无法识别的返回 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.search(r'\d+', str(value or ''))
+    return int(match.group()) if match else None
+
+
+def new_day_state(day):
+    return {
+        "date": day,
+        "offset": 0,          # 已统计到的 JSONL 字节位置
+        "records": 0,
+        "first_seen": None,
+        "last_seen": None,
+        "sources": {},
+        "categories": {},
+        "titles": {},
+    }
+
+
+def update_state(state, record):
+    """把一条日志记录累加到当天的统计里"""
+    data = record.get("data") or {}
+    timestamp = record.get("timestamp")
+    state["records"] += 1
+    if timestamp:
+        if not state["first_seen"] or timestamp < state["first_seen"]:
+            state["first_seen"] = timestamp
+        if not state["last_seen"] or timestamp > state["last_seen"]:
+            state["last_seen"] = timestamp
+    
+    source = data.get("source", "unknown")
+    category = data.get("category", "未分类")
+    state["sources"][source] = state["sources"].get(source, 0) + 1
+    state["categories"][category] = state["categories"].get(category, 0) + 1
+    
+    title = data.get("title") or data.get("message", "")[:50]
+    if not title:
+        return
+    topic = state["titles"].get(title)
+    if topic is None:
+        topic = state["titles"][title] = {
+            "count": 0, "source": source, "category": category,
+            "best_rank": None, "peak_hot_count": None,
+            "first_seen": timestamp, "last_seen": timestamp,
+        }
+    topic["count"] += 1
+    topic["last_seen"] = timestamp
+    rank = _to_int(data.get("rank"))
+    if rank is not None and (topic["best_rank"] is None or rank < topic["best_rank"]):
+        topic["best_rank"] = rank
+    hot_count = _to_int(data.get("hot_count"))
+    if hot_count is not None and (topic["peak_hot_count"] is None or hot_count > topic["peak_hot_count"]):
+        topic["peak_hot_count"] = hot_count
+
+
+class HotspotAggregator:
+    """按天维护的增量统计，由写入当天 JSONL 的一方在每次提交后调用 observe()"""
+    
+    def __init__(self, log_dir=LOG_DIR, summary_dir=SUMMARY_DIR,
+                 checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.log_dir = log_dir
+        self.summary_dir = summary_dir
+        self.checkpoint_interval = checkpoint_interval
+        os.makedirs(summary_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._days = {}
+        self._last_checkpoint = time.monotonic()
+    
+    def observe(self, day, lines, start_offset, end_offset):
+        """记录已写入 day 的 JSONL 的若干行，start_offset / end_offset 是这些行在文件中的字节范围"""
+        with self._lock:
+            state = self._load(day)
+            if start_offset != state["offset"]:
+                # 中间有没统计到的数据（重启、其他进程写入等），从文件补读
+                self._catch_up(state)
+            else:
+                for line in lines:
+                    update_state(state, loads(line))
+                state["offset"] = end_offset
+            if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                self._checkpoint_all()
+    
+    def summary(self, day):
+        """返回当天的统计（会先补读尚未统计的部分）"""
+        with self._lock:
+            state = self._load(day)
+            self._catch_up(state)
+            return json.loads(json.dumps(state))
+    
+    def checkpoint(self):
+        with self._lock:
+            self._checkpoint_all()
+    
+    def _load(self, day):
+        state = self._days.get(day)
+        if state is not None:
+            return state
+        # 切换到新的一天时把旧的状态落盘后释放
+        for old_day in [d for d in self._days if d < day]:
+            self._save(self._days.pop(old_day))
+        try:
+            with open(f"{self.summary_dir}/{day}.json", 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = new_day_state(day)
+        self._days[day] = state
+        return state
+    
+    def _catch_up(self, state):
+        path = f"{self.log_dir}/{state['date']}.jsonl"
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            f.seek(state["offset"])
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                try:
+                    update_state(state, loads(raw))
+                except ValueError:
+                    pass
+                state["offset"] += len(raw)
+    
+    def _checkpoint_all(self):
+        for state in self._days.values():
+            self._save(state)
+        self._last_checkpoint = time.monotonic()
+    
+    def _save(self, state):
+        path = f"{self.summary_dir}/{state['date']}.json"
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def format_report(state, top_n=REPORT_TOP_N):
+    """把统计状态格式化成 Markdown 汇总报告"""
+    lines = [f"# 热点汇总 - {state['date']}\n"]
+    lines.append(f"**记录数**: {state['records']}  ")
+    lines.append(f"**时间范围**: {state['first_seen'] or '-'} ~ {state['last_seen'] or '-'}\n")
+    
+    lines.append("## 来源\n")
+    lines.append("| 来源 | 记录数 |")
+    lines.append("|------|------|")
+    for source, count in sorted(state["sources"].items(), key=lambda x: -x[1]):
+        lines.append(f"| {source} | {count} |")
+    
+    lines.append("\n## 分类\n")
+    lines.append("| 分类 | 记录数 |")
+    lines.append("|------|------|")
+    for category, count in sorted(state["categories"].items(), key=lambda x: -x[1]):
+        lines.append(f"| {category} | {count} |")
+    
+    lines.append(f"\n## 热门话题 Top {top_n}\n")
+    lines.append("| 话题 | 分类 | 出现次数 | 最高排名 | 峰值热度 |")
+    lines.append("|------|------|------|------|------|")
+    topics = sorted(state["titles"].items(),
+                    key=lambda x: (-x[1]["count"], x[1]["best_rank"] or 999))
+    for title, topic in topics[:top_n]:
+        best_rank = topic["best_rank"] if topic["best_rank"] is not None else '-'
+        peak = topic["peak_hot_count"] if topic["peak_hot_count"] is not None else '-'
+        lines.append(f"| {title} | {topic['category']} | {topic['count']} | {best_rank} | {peak} |")
+    
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    day = sys.argv[1] if len(sys.argv) > 1 else datetime.now().strftime('%Y-%m-%d')
+    aggregator = HotspotAggregator()
+    state = aggregator.summary(day)
+    aggregator.checkpoint()
+    print(format_report(state))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+OpenClaw 网关客户端
+到网关的 HTTP 连接放在连接池里复用（keep-alive），每条消息不用再做一次
+TCP 握手。连续失败达到阈值后熔断，一段时间内直接失败，不再占用连接和线程，
+冷却后放行一个探测请求，成功才恢复。
+
+同步调用用 post() / post_many()，asyncio 代码用 apost() / apost_many()，
+后者在客户端自己的线程池里执行，不阻塞事件循环。
+
+网关的 hooks 接口一次只接收一条消息，也不支持 HTTP pipelining，
+post_many() 把一批消息分摊到池里的多个长连接上并发发送。
+"""
+import asyncio
+import http.client
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from webhook_codec import dumps_bytes, loads
+from webhook_metrics import REGISTRY
+
+# 配置
+OPENCLAW_GATEWAY = "http://127.0.0.1:18789"
+OPENCLAW_HOOK_PATH = "/hooks/agent"                          # 网关接收外部事件的路径
+OPENCLAW_HOOK_TOKEN = os.environ.get("OPENCLAW_HOOK_TOKEN")  # 网关开启鉴权时使用
+POOL_SIZE = 8              # 最多保持的长连接数
+REQUEST_TIMEOUT = 5.0      # 单次请求超时（秒）
+POOL_TIMEOUT = 5.0         # 连接全部占用时等待空闲连接的最长时间（秒）
+FAILURE_THRESHOLD = 5      # 连续失败多少次后熔断
+RESET_TIMEOUT = 30.0       # 熔断后多久放行探测请求（秒）
+
+GATEWAY_SECONDS = REGISTRY.histogram("openclaw_gateway_request_seconds", "调用 OpenClaw 网关的耗时")
+GATEWAY_REQUESTS = REGISTRY.counter("openclaw_gateway_requests_total", "按结果统计的网关请求数",
+                                    labelnames=("result",))
+GATEWAY_CIRCUIT_OPEN = REGISTRY.gauge("openclaw_gateway_circuit_open", "网关熔断器是否处于打开状态")
+
+
+class GatewayError(Exception):
+    """网关返回错误状态码或连接失败；status 是 HTTP 状态码，连接失败时为 None"""
+    
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(GatewayError):
+    """熔断中，请求没有发出；retry_after 是距离下次探测的秒数"""
+    
+    def __init__(self, retry_after):
+        super().__init__(f"OpenClaw 网关熔断中，{retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器：closed -> open -> half-open -> closed"""
+    
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+    
+    def before_call(self):
+        """请求前调用；熔断中抛出 CircuitOpenError，冷却结束后只放行一个探测请求"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self.reset_timeout or self._probing:
+                raise CircuitOpenError(max(0.0, self.reset_timeout - elapsed))
+            self._probing = True
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"[OpenClaw] 连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self._opened_at = time.monotonic()
+            self._probing = False
+    
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+
+class ConnectionPool:
+    """http.client 长连接池，取出的连接用完放回，出错的连接直接丢弃"""
+    
+    def __init__(self, base_url, size=POOL_SIZE, timeout=REQUEST_TIMEOUT, pool_timeout=POOL_TIMEOUT):
+        url = urlsplit(base_url)
+        self.scheme = url.scheme or "http"
+        self.host = url.hostname
+        self.port = url.port
+        self.size = size
+        self.timeout = timeout
+        self.pool_timeout = pool_timeout
+        self._idle = []   # 空闲连接，后放回的先取出
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)   # 放回或丢弃连接时通知等待者
+        self._created = 0
+    
+    def acquire(self):
+        """返回 (连接, 是否为复用的连接)"""
+        deadline = time.monotonic() + self.pool_timeout
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop(), True
+                if self._created < self.size:
+                    self._created += 1
+                    return self._new_connection(), False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise GatewayError("等待网关连接超时")
+                self._available.wait(remaining)
+    
+    def release(self, conn):
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+    
+    def discard(self, conn):
+        conn.close()
+        with self._available:
+            self._created -= 1
+            # 空出的名额可以新建连接，唤醒一个等待者
+            self._available.notify()
+    
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+    
+    def _new_connection(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+
+class GatewayClient:
+    """OpenClaw 网关客户端，线程安全，整个进程共用一个实例即可"""
+    
+    def __init__(self, base_url=OPENCLAW_GATEWAY, path=OPENCLAW_HOOK_PATH, token=OPENCLAW_HOOK_TOKEN,
+                 pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT, breaker=None):
+        self.path = path
+        self.headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="openclaw")
+        GATEWAY_CIRCUIT_OPEN.set_function(lambda: int(self.breaker.is_open()))
+    
+    def post(self, payload):
+        """发送一条消息，返回网关的 JSON 响应（没有响应体时返回 None）"""
+        self.breaker.before_call()
+        try:
+            with GATEWAY_SECONDS.time():
+                result = self._request(dumps_bytes(payload))
+        except GatewayError as e:
+            # 4xx 说明网关正常工作、只是拒绝了这条消息，不计入熔断
+            if e.status is not None and e.status < 500:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            GATEWAY_REQUESTS.inc("error")
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            GATEWAY_REQUESTS.inc("error")
+            raise
+        self.breaker.record_success()
+        GATEWAY_REQUESTS.inc("ok")
+        return result
+    
+    def post_many(self, payloads):
+        """并发发送一批消息，按顺序返回每条的响应或异常对象"""
+        futures = [self._executor.submit(self.post, payload) for payload in payloads]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    async def apost(self, payload):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.post, payload)
+    
+    async def apost_many(self, payloads):
+        return await asyncio.gather(*(self.apost(p) for p in payloads), return_exceptions=True)
+    
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+    
+    def _request(self, body):
+        # 复用的连接可能已被网关关闭，遇到连接类错误时换一个新连接重试一次
+        for attempt in range(2):
+            conn, reused = self.pool.acquire()
+            try:
+                conn.request("POST", self.path, body=body, headers=self.headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self.pool.discard(conn)
+                if reused and attempt == 0:
+                    continue
+                raise GatewayError(f"网关连接断开: {e}") from e
+            except Exception:
+                self.pool.discard(conn)
+                raise
+            if resp.will_close:
+                self.pool.discard(conn)
+            else:
+                self.pool.release(conn)
+            if resp.status >= 400:
+                raise GatewayError(f"网关返回 {resp.status}: {data[:200].decode('utf-8', 'replace')}",
+                                   resp.status)
+            if not data:
+                return None
+            try:
+                return loads(data)
+            except ValueError:
+                return data.decode('utf-8', 'replace')
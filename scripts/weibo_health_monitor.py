@@ -5,150 +5,322 @@
 1. 爬取微博热搜
 2. 筛选健康相关话题
 3. 发送到钉钉群
-4. 记录到知识库
+4. 记录到知识库和本机的 webhook_logger
+5. 完整榜单追加到热搜排名时间序列库（hotsearch_history.py）
+
+用法:
+  python3 weibo_health_monitor.py             执行一次（cron 每小时调度），只推送与上次相比
+      新上榜、排名上升 RANK_CLIMB_THRESHOLD 位以上和已下榜（连续 DROP_GRACE_SECONDS 秒
+      不在榜）的健康话题
+  python3 weibo_health_monitor.py --full      推送全部健康话题（每日汇总）
+  python3 weibo_health_monitor.py --daemon    常驻运行：复用同一个 keep-alive 会话，
+      支持 ETag / If-Modified-Since 时用条件请求；榜单变化大时缩短轮询间隔，
+      稳定时放宽；每天 DIGEST_HOUR 点后的第一轮发完整汇总
 """
 
+import argparse
 import requests
-import re
 import json
+import signal
+import sqlite3
 import sys
 import os
+import threading
 from datetime import datetime
 from urllib.parse import unquote
 
-# 健康相关关键词
-HEALTH_KEYWORDS = [
-    '健康', '医疗', '医院', '医生', '疾病', '病症', '症状', '治疗', '手术',
-    '养生', '保健', '营养', '饮食', '减肥', '健身', '运动', '睡眠', '心理',
-    '癌症', '肿瘤', '糖尿病', '高血压', '心脏病', '感冒', '发烧', '流感',
-    '疫苗', '接种', '过敏', '鼻炎', '哮喘', '近视', '眼科', '牙科', '口腔',
-    '体检', '检查', '诊断', '药物', '药品', '中医', '西医', '护理', '康复',
-    '新冠', '病毒', '感染', '传染', '免疫力', '维生素', '蛋白', '脂肪', '糖',
-    '猝死', '急救', '医保', '医药', '卫生', '口罩', '防护', '消毒', '杀菌',
-    '抑郁', '焦虑', '精神', '失眠', '头痛', '胃痛', '咳嗽', '发烧', '发热',
-    '卫健委', '急救中心', '结石', '肾', '肝', '胃', '肺', '心', '脑', '血',
-    '孕', '胎', '婴', '儿', '老', '病', '痛', '药', '诊', '疗'
-]
-
-# 排除关键词（娱乐/综艺等）
-EXCLUDE_KEYWORDS = [
-    '恋综', '综艺', '电视剧', '电影', '明星', '演员', '歌手', '偶像',
-    'CP', '恋爱', '分手', '结婚', '离婚', '出轨', '爆料', '路透',
-    '直播', '网红', '主播', '粉丝', '应援', '打榜', '投票', '选秀'
-]
-
-def load_cookie():
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hotsearch_history import HotSearchHistory
+from topic_classifier import load_rules
+from weibo_hotsearch_parser import parse_hotsearch
+from webhook_client import post_bulk
+
+# 健康话题筛选规则（关键词和娱乐类排除词）见 config/weibo_category_rules.json
+HEALTH_RULES = load_rules('health')
+
+COOKIE_FILE = '/root/.openclaw/workspace/config/weibo_cookie.txt'
+HOTSEARCH_URL = 'https://s.weibo.com/top/summary?cate=realtimehot'
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Referer': 'https://weibo.com/',
+    'Connection': 'keep-alive',
+}
+
+# 守护进程模式（--daemon）
+DAEMON_INTERVAL = 600        # 初始轮询间隔（秒）
+DAEMON_MIN_INTERVAL = 120    # 榜单变化剧烈时最短的间隔
+DAEMON_MAX_INTERVAL = 1800   # 榜单稳定或请求出错时最长的间隔
+CHURN_HIGH = 0.3             # 排名有变化的话题比例超过这个值时间隔减半
+CHURN_LOW = 0.1              # 低于这个值时间隔放宽 1.5 倍
+DIGEST_HOUR = 9              # 每天这个钟点之后的第一轮发一次完整汇总（full 模式）
+
+# 增量推送：只推送与上次推送时相比新上榜、排名明显上升和已下榜的健康话题
+SNAPSHOT_FILE = '/root/.openclaw/workspace/data/last_health_snapshot.json'
+RANK_CLIMB_THRESHOLD = 5     # 排名比上次推送时至少上升这么多位才算排名上升
+DROP_GRACE_SECONDS = 600     # 连续不在榜这么久（秒）才算已下榜，守护进程短间隔轮询时话题偶尔
+                             # 掉出一轮不会先报已下榜、下一轮又报新上榜
+SNAPSHOT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 知识库按天一个 Markdown 文件，每轮只追加新的一段
+KB_DIR = '/root/.openclaw/workspace/knowledge/weibo_hotsearch'
+KB_FSYNC_POLICY = 'always'   # always: 每次追加后 fsync；never: 交给操作系统
+ERROR_LOG = '/root/.openclaw/workspace/data/hotsearch_error.log'
+
+def load_cookie(cookie_file=COOKIE_FILE):
     """从文件加载 Cookie"""
     try:
-        with open('/root/.openclaw/workspace/config/weibo_cookie.txt', 'r') as f:
+        with open(cookie_file, 'r') as f:
             return f.read().strip()
     except Exception as e:
         print(f"读取 Cookie 失败: {e}")
         return None
 
-def fetch_weibo_hotsearch():
-    """获取微博热搜榜"""
-    cookie = load_cookie()
-    if not cookie:
-        return None
+class HotSearchFetcher:
+    """抓取热搜页；守护进程模式下一直复用同一个 keep-alive 会话，
+    并带上次响应的 ETag / Last-Modified 做条件请求（服务器支持时返回 304，不重新下载页面）"""
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Cookie': cookie,
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        'Referer': 'https://weibo.com/',
-        'Connection': 'keep-alive',
-    }
+    def __init__(self, cookie_file=COOKIE_FILE):
+        self.cookie_file = cookie_file
+        self.session = requests.Session()
+        self.session.headers.update(REQUEST_HEADERS)
+        self.etag = None
+        self.last_modified = None
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes': 0}
+        self._cookie_mtime = None
     
-    try:
-        session = requests.Session()
-        session.headers.update(headers)
-        
-        url = 'https://s.weibo.com/top/summary?cate=realtimehot'
-        response = session.get(url, timeout=15, allow_redirects=True)
-        response.encoding = 'utf-8'
+    def _refresh_cookie(self):
+        """Cookie 文件更新后重新读取，守护进程不用重启"""
+        try:
+            mtime = os.stat(self.cookie_file).st_mtime
+        except OSError as e:
+            print(f"读取 Cookie 失败: {e}")
+            return False
+        if mtime != self._cookie_mtime:
+            cookie = load_cookie(self.cookie_file)
+            if not cookie:
+                return False
+            self.session.headers['Cookie'] = cookie
+            self._cookie_mtime = mtime
+        return True
+    
+    def fetch(self):
+        """返回 (状态, html)，状态为 'ok'、'not_modified' 或 'error'"""
+        if not self._refresh_cookie():
+            return 'error', None
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        try:
+            response = self.session.get(HOTSEARCH_URL, headers=headers, timeout=15, allow_redirects=True)
+        except requests.RequestException as e:
+            print(f"请求异常: {e}")
+            return 'error', None
+        self.stats['requests'] += 1
         
+        if response.status_code == 304:
+            self.stats['not_modified'] += 1
+            return 'not_modified', None
         if 'passport.weibo.com' in response.url:
             print("Cookie 已失效或需要重新登录")
-            return None
+            return 'error', None
+        if response.status_code != 200:
+            print(f"请求失败: HTTP {response.status_code}")
+            return 'error', None
         
-        return response.text
-    except Exception as e:
-        print(f"请求异常: {e}")
-        return None
+        self.stats['bytes'] += len(response.content)
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        response.encoding = 'utf-8'
+        return 'ok', response.text
 
-def parse_hotsearch(html):
-    """解析热搜数据"""
-    if not html:
-        return []
-    
-    hot_list = []
+def fetch_weibo_hotsearch():
+    """获取微博热搜榜"""
+    _, html = HotSearchFetcher().fetch()
+    return html
+
+def filter_health_topics(hot_list):
+    """筛选健康相关话题，排除娱乐内容"""
+    # 标题包含健康关键词，且标题和热度标签中都没有综艺等娱乐类关键词
+    rows = [(item.get('title', ''), None, item.get('hot_count', '')) for item in hot_list]
+    return [item for item, matched in zip(hot_list, HEALTH_RULES.classify_many(rows)) if matched]
+
+def rank_value(rank):
+    """排名转成整数用于比较，置顶记为 0"""
+    try:
+        return int(rank)
+    except (TypeError, ValueError):
+        return 0
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """读取上次的基线，返回 (健康话题 {标题: 排名}, 暂时不在榜的话题 {标题: 首次不在榜的时间})
     
-    # 根据实际 HTML 结构解析
-    pattern = r'<tr[^>]*>\s*<td[^>]*class=["\']td-01[^"\']*["\'][^>]*>\s*(?:<i[^>]*>)?([^\s<]*)(?:</i>)?\s*</td>\s*<td[^>]*class=["\']td-02["\'][^>]*>\s*<a[^\u003e]*href=["\']([^"\']+)["\'][^\u003e]*target=["\']_blank["\'][^\u003e]*>([^\u003c]+)</a>\s*(?:<i[^>]*>[^\u003c]*</i>)?\s*(?:<span[^\u003e]*>([^\u003c]*)\u003c/span>)?\s*</td>'
+    没有快照时返回 (None, {})。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        return snapshot.get('topics'), snapshot.get('missing') or {}
+    except (OSError, ValueError) as e:
+        if os.path.exists(path):
+            print(f"读取上次快照失败: {e}")
+        return None, {}
+
+def save_snapshot(topics, path=SNAPSHOT_FILE, missing=None):
+    """保存新的基线 {标题: 排名}，先写临时文件再替换，中途退出不会留下半个文件"""
+    snapshot = {
+        'timestamp': datetime.now().strftime(SNAPSHOT_TIME_FORMAT),
+        'topics': topics,
+        'missing': missing or {}
+    }
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+def absent_topics(previous, health_topics, missing=None, now=None, grace=DROP_GRACE_SECONDS):
+    """基线中本轮不在榜的话题，返回 (已下榜 [(标题, 原排名)], 仍在宽限期内 {标题: 首次不在榜的时间})
     
-    matches = re.findall(pattern, html, re.DOTALL)
+    第一次发现不在榜时记下时间，连续不在榜满 grace 秒才算已下榜；中途回到榜上的不再记录。
+    """
+    now = now or datetime.now()
+    missing = missing or {}
+    current = {topic['title'] for topic in health_topics}
+    dropped = []
+    waiting = {}
+    for title, rank in (previous or {}).items():
+        if title in current:
+            continue
+        since = missing.get(title) or now.strftime(SNAPSHOT_TIME_FORMAT)
+        try:
+            elapsed = (now - datetime.strptime(since, SNAPSHOT_TIME_FORMAT)).total_seconds()
+        except ValueError:
+            elapsed = grace
+        if elapsed >= grace:
+            dropped.append((title, rank))
+        else:
+            waiting[title] = since
+    return dropped, waiting
+
+def diff_snapshots(previous, health_topics, climb_threshold=RANK_CLIMB_THRESHOLD,
+                   missing=None, now=None, grace=DROP_GRACE_SECONDS):
+    """与上次快照比较，返回 {'new': [话题], 'rising': [(话题, 原排名)], 'dropped': [(标题, 原排名)]}
     
-    for match in matches:
-        rank, link, title, hot_count = match
-        rank = rank.strip()
-        title = title.strip()
-        hot_count = hot_count.strip() if hot_count else ''
-        
-        # 处理排名（可能是 "icon-top" 或数字）
-        if not rank or 'icon' in rank:
-            rank = '置顶'
-        
-        # 确保链接完整
-        if link.startswith('/'):
-            link = f'https://s.weibo.com{link}'
-        elif not link.startswith('http'):
-            link = f'https://s.weibo.com/weibo?q={link}'
-        
-        if title:
-            hot_list.append({
-                'rank': rank,
-                'title': title,
-                'link': link,
-                'hot_count': hot_count
-            })
+    previous 为 None（第一次运行）时全部算新上榜。missing / grace 的含义见 absent_topics()。
+    """
+    previous = previous or {}
+    diff = {'new': [], 'rising': [], 'dropped': []}
+    for topic in health_topics:
+        title = topic['title']
+        if title not in previous:
+            diff['new'].append(topic)
+        elif rank_value(previous[title]) - rank_value(topic['rank']) >= climb_threshold:
+            diff['rising'].append((topic, previous[title]))
+    diff['dropped'], _ = absent_topics(previous, health_topics, missing, now, grace)
+    return diff
+
+def changed_topics(diff):
+    """增量中需要记录和推送的话题：新上榜和排名上升的"""
+    return diff['new'] + [topic for topic, _ in diff['rising']]
+
+def next_baseline(previous, health_topics, diff=None, missing=None, now=None, grace=DROP_GRACE_SECONDS):
+    """推送后的新基线，返回 (基线 {标题: 排名}, 暂时不在榜的话题 {标题: 首次不在榜的时间})
     
-    return hot_list
+    推送过的话题（新上榜、排名上升，diff 为 None 即 full 模式时是全部）记为当前排名；
+    其余仍在榜的话题保留上次的基线排名，缓慢上升的话题累计超过阈值时仍会被发现；
+    不在榜但还在宽限期内的话题保留原排名，已下榜的话题不再保留。
+    """
+    previous = previous or {}
+    emitted = {topic['title'] for topic in (health_topics if diff is None else changed_topics(diff))}
+    baseline = {}
+    for topic in health_topics:
+        title = topic['title']
+        baseline[title] = topic['rank'] if title in emitted or title not in previous else previous[title]
+    _, waiting = absent_topics(previous, health_topics, missing, now, grace)
+    for title in waiting:
+        baseline[title] = previous[title]
+    return baseline, waiting
 
-def filter_health_topics(hot_list):
-    """筛选健康相关话题，排除娱乐内容"""
-    health_topics = []
+def has_changes(diff):
+    return bool(diff['new'] or diff['rising'] or diff['dropped'])
+
+def change_label(topic, previous_rank=None):
+    if previous_rank is None:
+        return "新上榜"
+    return f"第{previous_rank}位 → 第{topic['rank']}位"
+
+def _fsync_dir(path):
+    fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_new_file(path, data, fsync_policy, replace=False):
+    """先写临时文件再放到 path：replace=False 时用 link，path 已存在则抛出 FileExistsError"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            if fsync_policy == 'always':
+                f.flush()
+                os.fsync(f.fileno())
+        if replace:
+            os.replace(tmp, path)
+        else:
+            os.link(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if fsync_policy == 'always':
+        _fsync_dir(path)
+
+def append_to_knowledge_base(path, header, content, fsync_policy=KB_FSYNC_POLICY):
+    """把一段记录追加到知识库文件，不读取也不重写已有内容
     
-    for item in hot_list:
-        title = item.get('title', '')
-        hot_count = item.get('hot_count', '')
-        
-        # 检查是否包含健康关键词
-        is_health = False
-        for keyword in HEALTH_KEYWORDS:
-            if keyword in title:
-                is_health = True
-                break
-        
-        if not is_health:
-            continue
-        
-        # 检查是否是娱乐内容
-        is_entertainment = False
-        for exclude in EXCLUDE_KEYWORDS:
-            if exclude in title or exclude in hot_count:
-                is_entertainment = True
-                break
-        
-        if not is_entertainment:
-            health_topics.append(item)
+    新文件通过临时文件一次写好标题和记录再放到位，不会出现只有一半的文件；
+    已有文件用 O_APPEND 一次 write 追加。只有文件不以标题开头（比如被手工清空过）
+    需要整理时，才读取全文、补上标题后写临时文件再 rename 替换。
+    """
+    if fsync_policy not in ('always', 'never'):
+        raise ValueError(f"未知的 fsync 策略: {fsync_policy}")
+    header_bytes = header.encode('utf-8')
+    data = content.encode('utf-8')
+    try:
+        _write_new_file(path, header_bytes + data, fsync_policy)
+        return
+    except FileExistsError:
+        pass
     
-    return health_topics
+    fd = os.open(path, os.O_RDWR | os.O_APPEND)
+    try:
+        size = os.fstat(fd).st_size
+        head = os.pread(fd, len(header_bytes), 0)
+        if head != header_bytes[:size]:
+            # 文件开头不是标题，需要整理：整体重写
+            existing = os.pread(fd, size, 0)
+            if existing and not existing.endswith(b'\n'):
+                existing += b'\n'
+            _write_new_file(path, header_bytes + existing + data, fsync_policy, replace=True)
+            return
+        if size < len(header_bytes):
+            # 上次只写了一部分标题
+            data = header_bytes[size:] + data
+        elif os.pread(fd, 1, size - 1) != b'\n':
+            # 上次追加中途中断，最后一行不完整，另起一行
+            data = b'\n' + data
+        os.write(fd, data)
+        if fsync_policy == 'always':
+            os.fsync(fd)
+    finally:
+        os.close(fd)
 
-def save_to_knowledge_base(health_topics):
-    """保存到知识库"""
-    if not health_topics:
+def save_to_knowledge_base(health_topics, diff=None):
+    """保存到知识库；传入 diff 时只记录新上榜、排名上升和已下榜的话题"""
+    topics = health_topics if diff is None else changed_topics(diff)
+    if not topics and not (diff and diff['dropped']):
         return
     
     now = datetime.now()
@@ -157,47 +329,80 @@ def save_to_knowledge_base(health_topics):
     timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
     
     # 确保知识库目录存在
-    kb_dir = '/root/.openclaw/workspace/knowledge/weibo_hotsearch'
-    os.makedirs(kb_dir, exist_ok=True)
+    os.makedirs(KB_DIR, exist_ok=True)
     
     # 按日期存储
-    kb_file = f'{kb_dir}/{date_str}.md'
-    
-    # 读取现有内容
-    existing_content = ""
-    if os.path.exists(kb_file):
-        with open(kb_file, 'r', encoding='utf-8') as f:
-            existing_content = f.read()
+    kb_file = f'{KB_DIR}/{date_str}.md'
     
     # 构建新记录
     new_records = []
-    new_records.append(f"\n## {time_str} 健康热搜\n")
-    new_records.append(f"**采集时间**: {timestamp}\n")
-    new_records.append("| 排名 | 话题 | 链接 | 热度 |")
-    new_records.append("|------|------|------|------|")
-    
-    for topic in health_topics:
-        rank = topic['rank']
-        title = topic['title']
-        link = topic['link']
-        hot = topic.get('hot_count', '')
-        new_records.append(f"| {rank} | {title} | [{link}]({link}) | {hot} |")
+    if diff is None:
+        new_records.append(f"\n## {time_str} 健康热搜\n")
+        new_records.append(f"**采集时间**: {timestamp}\n")
+        new_records.append("| 排名 | 话题 | 链接 | 热度 |")
+        new_records.append("|------|------|------|------|")
+        
+        for topic in topics:
+            rank = topic['rank']
+            title = topic['title']
+            link = topic['link']
+            hot = topic.get('hot_count', '')
+            new_records.append(f"| {rank} | {title} | [{link}]({link}) | {hot} |")
+    else:
+        new_records.append(f"\n## {time_str} 健康热搜变化\n")
+        new_records.append(f"**采集时间**: {timestamp}\n")
+        if topics:
+            new_records.append("| 排名 | 话题 | 链接 | 热度 | 变化 |")
+            new_records.append("|------|------|------|------|------|")
+            changes = [(topic, None) for topic in diff['new']] + diff['rising']
+            for topic, previous_rank in changes:
+                link = topic['link']
+                new_records.append(f"| {topic['rank']} | {topic['title']} | [{link}]({link}) | "
+                                   f"{topic.get('hot_count', '')} | {change_label(topic, previous_rank)} |")
+        if diff['dropped']:
+            dropped = '、'.join(f"{title}（上次第{rank}位）" for title, rank in diff['dropped'])
+            new_records.append(f"\n**已下榜**: {dropped}")
     
     new_content = '\n'.join(new_records)
     
-    # 如果是新文件，添加标题
-    if not existing_content:
-        existing_content = f"# 微博健康热搜记录 - {date_str}\n"
-    
-    # 追加新记录
-    with open(kb_file, 'w', encoding='utf-8') as f:
-        f.write(existing_content + new_content + '\n')
+    # 追加新记录，新文件先写标题
+    append_to_knowledge_base(kb_file, f"# 微博健康热搜记录 - {date_str}\n", new_content + '\n')
     
     print(f"✅ 已记录到知识库: {kb_file}")
     return kb_file
 
-def format_dingtalk_message(health_topics, all_count=0):
-    """格式化钉钉消息"""
+def push_to_logger(health_topics):
+    """推送到本机的 webhook_logger（优先走 Unix 域套接字），服务未运行时跳过"""
+    records = [{
+        'source': 'weibo_health_monitor',
+        'title': topic['title'],
+        'rank': topic['rank'],
+        'hot_count': topic.get('hot_count', ''),
+        'category': '健康',
+        'link': topic['link']
+    } for topic in health_topics]
+    try:
+        status, _ = post_bulk(records)
+        print(f"✅ 已推送到 webhook 日志: {len(records)} 条 (HTTP {status})")
+    except OSError as e:
+        print(f"webhook 日志服务不可用: {e}")
+
+def record_history(hot_list, health_topics, history=None):
+    """把完整榜单追加到热搜排名时间序列库（hotsearch_history.py），写入失败时只打印"""
+    categories = {topic['title']: '健康' for topic in health_topics}
+    try:
+        if history is not None:
+            history.record_run(hot_list, categories=categories)
+        else:
+            with HotSearchHistory() as history:
+                history.record_run(hot_list, categories=categories)
+    except (OSError, sqlite3.Error) as e:
+        print(f"写入热搜时间序列失败: {e}")
+
+def format_dingtalk_message(health_topics, all_count=0, diff=None):
+    """格式化钉钉消息；传入 diff 时只包含变化的部分，没有变化时返回 None"""
+    if diff is not None:
+        return format_diff_message(health_topics, all_count, diff)
     if not health_topics:
         return None
     
@@ -216,6 +421,41 @@ def format_dingtalk_message(health_topics, all_count=0):
     
     return '\n'.join(lines)
 
+def format_diff_message(health_topics, all_count, diff):
+    """格式化增量钉钉消息"""
+    if not has_changes(diff):
+        return None
+    
+    now = datetime.now().strftime('%Y-%m-%d %H:%M')
+    
+    lines = [f"📊 微博健康热搜变化（{now}）\n"]
+    lines.append(f"共监测 {all_count} 条热搜，健康相关 {len(health_topics)} 条："
+                 f"新上榜 {len(diff['new'])} 条，排名上升 {len(diff['rising'])} 条，下榜 {len(diff['dropped'])} 条\n")
+    
+    sections = (("🆕 新上榜", [(topic, None) for topic in diff['new']]), ("📈 排名上升", diff['rising']))
+    for heading, changes in sections:
+        if not changes:
+            continue
+        lines.append(heading)
+        for i, (topic, previous_rank) in enumerate(changes[:10], 1):
+            lines.append(f"{i}. #{topic['title']}#")
+            if previous_rank is None:
+                lines.append(f"   排名：第{topic['rank']}位")
+            else:
+                lines.append(f"   排名：{change_label(topic, previous_rank)}")
+            lines.append(f"   链接：{topic['link']}")
+            if topic.get('hot_count'):
+                lines.append(f"   热度：{topic['hot_count']}")
+        lines.append("")
+    
+    if diff['dropped']:
+        lines.append("📉 已下榜")
+        for title, rank in diff['dropped'][:10]:
+            lines.append(f"- #{title}#（上次第{rank}位）")
+        lines.append("")
+    
+    return '\n'.join(lines)
+
 def send_to_dingtalk(message):
     """发送到钉钉群"""
     if not message:
@@ -228,37 +468,35 @@ def send_to_dingtalk(message):
         f.write(message)
     print(f"✅ 消息已准备: {msg_file}")
 
-def main():
-    print("="*60)
-    print("微博健康热搜监测任务")
-    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("="*60)
-    
-    # 1. 获取热搜
-    html = fetch_weibo_hotsearch()
-    if not html:
-        print("\n❌ 获取失败，Cookie 可能已失效")
-        # 记录失败日志
-        log_file = '/root/.openclaw/workspace/data/hotsearch_error.log'
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Cookie失效\n")
-        sys.exit(1)
-    
-    # 2. 解析数据
-    print("\n解析热搜数据...")
-    hot_list = parse_hotsearch(html)
-    print(f"共获取 {len(hot_list)} 条热搜")
+def log_error(reason):
+    """记录失败日志"""
+    with open(ERROR_LOG, 'a', encoding='utf-8') as f:
+        f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {reason}\n")
+
+def report_topics(hot_list, health_topics, full=False):
+    """记录到知识库和 webhook 日志、准备钉钉消息、保存原始数据，返回 (原始数据文件, 知识库文件)
     
-    # 3. 筛选健康话题
-    health_topics = filter_health_topics(hot_list)
-    print(f"找到 {len(health_topics)} 条健康相关热搜")
+    默认只处理与上次推送时相比新上榜、排名上升和已下榜的话题，没有变化时什么都不写；
+    full=True 时处理全部健康话题，用于每天的完整汇总。
+    """
+    previous, missing = load_snapshot()
+    now = datetime.now()
+    diff = None if full else diff_snapshots(previous, health_topics, missing=missing, now=now)
+    topics = health_topics if full else changed_topics(diff)
+    baseline, missing = next_baseline(previous, health_topics, diff, missing, now)
+    if not full and not has_changes(diff):
+        # 没有要推送的变化，也要记下本轮暂时不在榜的话题
+        save_snapshot(baseline, missing=missing)
+        print("\n与上次推送相比健康热搜没有变化")
+        return None, None
     
     # 4. 记录到知识库
-    if health_topics:
-        kb_file = save_to_knowledge_base(health_topics)
+    kb_file = save_to_knowledge_base(health_topics, diff)
+    if topics:
+        push_to_logger(topics)
     
     # 5. 准备钉钉消息
-    message = format_dingtalk_message(health_topics, len(hot_list))
+    message = format_dingtalk_message(health_topics, len(hot_list), diff)
     if message:
         send_to_dingtalk(message)
         print("\n" + "="*60)
@@ -266,21 +504,155 @@ def main():
         print("="*60)
     else:
         print("\n本轮暂无健康相关热搜")
+    save_snapshot(baseline, missing=missing)
     
     # 6. 保存原始数据
     raw_data = {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'mode': 'full' if full else 'delta',
         'total': len(hot_list),
         'health_count': len(health_topics),
         'health_topics': health_topics
     }
+    if diff is not None:
+        raw_data['changes'] = {
+            'new': [topic['title'] for topic in diff['new']],
+            'rising': [{'title': topic['title'], 'from': rank, 'to': topic['rank']} for topic, rank in diff['rising']],
+            'dropped': [title for title, _ in diff['dropped']]
+        }
     raw_file = f"/root/.openclaw/workspace/data/raw_hotsearch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     with open(raw_file, 'w', encoding='utf-8') as f:
         json.dump(raw_data, f, ensure_ascii=False, indent=2)
+    return raw_file, kb_file
+
+def ranking_churn(previous, current):
+    """榜单变化程度：新上榜或排名变化的话题占当前榜单的比例，没有上一轮数据时返回 None"""
+    if not previous or not current:
+        return None
+    previous_ranks = {topic['title']: topic['rank'] for topic in previous}
+    changed = sum(1 for topic in current if previous_ranks.get(topic['title']) != topic['rank'])
+    return changed / len(current)
+
+class AdaptiveInterval:
+    """按榜单变化程度调整轮询间隔：变化大时减半，稳定时放宽，出错时退到最长间隔"""
+    
+    def __init__(self, interval=DAEMON_INTERVAL, min_interval=DAEMON_MIN_INTERVAL, max_interval=DAEMON_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+    
+    def update(self, churn):
+        """根据本轮的变化程度返回下一次轮询前等待的秒数；churn 为 None 时保持不变"""
+        if churn is not None:
+            if churn >= CHURN_HIGH:
+                self.interval = max(self.min_interval, self.interval / 2)
+            elif churn <= CHURN_LOW:
+                self.interval = min(self.max_interval, self.interval * 1.5)
+        return self.interval
+    
+    def backoff(self):
+        self.interval = self.max_interval
+        return self.interval
+
+def run_daemon(interval=DAEMON_INTERVAL, min_interval=DAEMON_MIN_INTERVAL, max_interval=DAEMON_MAX_INTERVAL):
+    """常驻运行：复用会话轮询热搜，每轮只推送健康话题的变化，每天 DIGEST_HOUR 点后发一次完整汇总"""
+    fetcher = HotSearchFetcher()
+    history = HotSearchHistory()
+    poller = AdaptiveInterval(interval, min_interval, max_interval)
+    stop = threading.Event()
+    
+    def on_signal(signum, frame):
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    print(f"[Daemon] 微博健康热搜监测已启动，轮询间隔 {poller.min_interval:.0f}-{poller.max_interval:.0f} 秒")
+    
+    previous = None
+    digest_day = None
+    while not stop.is_set():
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        status, html = fetcher.fetch()
+        try:
+            hot_list = parse_hotsearch(html) if status == 'ok' else None
+            if status == 'ok' and not hot_list:
+                print(f"[Daemon] {now} 未解析到热搜数据")
+                status = 'error'
+            
+            if status == 'error':
+                log_error("获取失败")
+                wait = poller.backoff()
+            elif status == 'not_modified':
+                print(f"[Daemon] {now} 页面未变化 (304)")
+                wait = poller.update(0.0)
+            else:
+                churn = ranking_churn(previous, hot_list)
+                previous = hot_list
+                health_topics = filter_health_topics(hot_list)
+                record_history(hot_list, health_topics, history)
+                print(f"[Daemon] {now} 共 {len(hot_list)} 条热搜，{len(health_topics)} 条健康相关"
+                      + (f"，榜单变化 {churn:.0%}" if churn is not None else ""))
+                today = datetime.now()
+                full = today.hour >= DIGEST_HOUR and digest_day != today.date()
+                report_topics(hot_list, health_topics, full=full)
+                if full:
+                    digest_day = today.date()
+                wait = poller.update(churn)
+        except Exception as e:
+            # 写知识库、原始数据或快照失败时只跳过这一轮，不让守护进程退出
+            print(f"[Daemon] {now} 本轮处理失败: {e}")
+            try:
+                log_error(f"本轮处理失败: {e}")
+            except OSError:
+                pass
+            wait = poller.backoff()
+        print(f"[Daemon] {wait:.0f} 秒后再次检查（请求 {fetcher.stats['requests']} 次，"
+              f"304 {fetcher.stats['not_modified']} 次，下载 {fetcher.stats['bytes'] // 1024} KB）")
+        stop.wait(wait)
+    history.close()
+    print("[Daemon] 已停止")
+
+def main():
+    parser = argparse.ArgumentParser(description="微博健康热搜监测")
+    parser.add_argument('--daemon', action='store_true', help="常驻运行，按榜单变化自动调整轮询间隔（默认只执行一次，由 cron 调度）")
+    parser.add_argument('--interval', type=float, default=DAEMON_INTERVAL, help="守护进程的初始轮询间隔（秒）")
+    parser.add_argument('--min-interval', type=float, default=DAEMON_MIN_INTERVAL)
+    parser.add_argument('--max-interval', type=float, default=DAEMON_MAX_INTERVAL)
+    parser.add_argument('--full', action='store_true', help="推送全部健康话题（每日汇总），默认只推送与上次相比的变化")
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon(args.interval, args.min_interval, args.max_interval)
+        return
+    
+    print("="*60)
+    print("微博健康热搜监测任务")
+    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("="*60)
+    
+    # 1. 获取热搜
+    html = fetch_weibo_hotsearch()
+    if not html:
+        print("\n❌ 获取失败，Cookie 可能已失效")
+        # 记录失败日志
+        log_error("Cookie失效")
+        sys.exit(1)
+    
+    # 2. 解析数据
+    print("\n解析热搜数据...")
+    hot_list = parse_hotsearch(html)
+    print(f"共获取 {len(hot_list)} 条热搜")
+    
+    # 3. 筛选健康话题
+    health_topics = filter_health_topics(hot_list)
+    print(f"找到 {len(health_topics)} 条健康相关热搜")
+    record_history(hot_list, health_topics)
+    
+    raw_file, kb_file = report_topics(hot_list, health_topics, full=args.full)
     
     print(f"\n✅ 任务完成")
-    print(f"   - 原始数据: {raw_file}")
-    if health_topics:
+    if raw_file:
+        print(f"   - 原始数据: {raw_file}")
+    if kb_file:
         print(f"   - 知识库: {kb_file}")
 
 if __name__ == '__main__':
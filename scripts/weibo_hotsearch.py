@@ -5,32 +5,18 @@
 """
 
 import requests
-import re
 import json
 import sys
+import os
 from datetime import datetime
 from urllib.parse import unquote
 
-# 健康相关关键词
-HEALTH_KEYWORDS = [
-    '健康', '医疗', '医院', '医生', '疾病', '病症', '症状', '治疗', '手术',
-    '养生', '保健', '营养', '饮食', '减肥', '健身', '运动', '睡眠', '心理',
-    '癌症', '肿瘤', '糖尿病', '高血压', '心脏病', '感冒', '发烧', '流感',
-    '疫苗', '接种', '过敏', '鼻炎', '哮喘', '近视', '眼科', '牙科', '口腔',
-    '体检', '检查', '诊断', '药物', '药品', '中医', '西医', '护理', '康复',
-    '新冠', '病毒', '感染', '传染', '免疫力', '维生素', '蛋白', '脂肪', '糖',
-    '猝死', '急救', '医保', '医药', '卫生', '口罩', '防护', '消毒', '杀菌',
-    '抑郁', '焦虑', '精神', '失眠', '头痛', '胃痛', '咳嗽', '发烧', '发热',
-    '卫健委', '急救中心', '结石', '肾', '肝', '胃', '肺', '心', '脑', '血',
-    '孕', '胎', '婴', '儿', '老', '病', '痛', '药', '诊', '疗'
-]
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from topic_classifier import load_rules
+from weibo_hotsearch_parser import parse_hotsearch
 
-# 排除关键词（娱乐/综艺等）
-EXCLUDE_KEYWORDS = [
-    '恋综', '综艺', '电视剧', '电影', '明星', '演员', '歌手', '偶像',
-    'CP', '恋爱', '分手', '结婚', '离婚', '出轨', '爆料', '路透',
-    '直播', '网红', '主播', '粉丝', '应援', '打榜', '投票', '选秀'
-]
+# 健康话题筛选规则（关键词和娱乐类排除词）见 config/weibo_category_rules.json
+HEALTH_RULES = load_rules('health')
 
 def load_cookie():
     """从文件加载 Cookie"""
@@ -73,73 +59,11 @@ def fetch_weibo_hotsearch():
         print(f"请求异常: {e}")
         return None
 
-def parse_hotsearch(html):
-    """解析热搜数据"""
-    if not html:
-        return []
-    
-    hot_list = []
-    
-    # 根据实际 HTML 结构解析
-    pattern = r'<tr[^>]*>\s*<td[^>]*class=["\']td-01[^"\']*["\'][^>]*>\s*(?:<i[^>]*>)?([^\s<]*)(?:</i>)?\s*</td>\s*<td[^>]*class=["\']td-02["\'][^>]*>\s*<a[^\u003e]*href=["\']([^"\']+)["\'][^\u003e]*target=["\']_blank["\'][^\u003e]*>([^\u003c]+)</a>\s*(?:<i[^>]*>[^\u003c]*</i>)?\s*(?:<span[^\u003e]*>([^\u003c]*)\u003c/span>)?\s*</td>'
-    
-    matches = re.findall(pattern, html, re.DOTALL)
-    
-    for match in matches:
-        rank, link, title, hot_count = match
-        rank = rank.strip()
-        title = title.strip()
-        hot_count = hot_count.strip() if hot_count else ''
-        
-        # 处理排名（可能是 "icon-top" 或数字）
-        if not rank or 'icon' in rank:
-            rank = '置顶'
-        
-        # 确保链接完整
-        if link.startswith('/'):
-            link = f'https://s.weibo.com{link}'
-        elif not link.startswith('http'):
-            link = f'https://s.weibo.com/weibo?q={link}'
-        
-        if title:
-            hot_list.append({
-                'rank': rank,
-                'title': title,
-                'link': link,
-                'hot_count': hot_count
-            })
-    
-    return hot_list
-
 def filter_health_topics(hot_list):
     """筛选健康相关话题，排除娱乐内容"""
-    health_topics = []
-    
-    for item in hot_list:
-        title = item.get('title', '')
-        hot_count = item.get('hot_count', '')
-        
-        # 检查是否包含健康关键词
-        is_health = False
-        for keyword in HEALTH_KEYWORDS:
-            if keyword in title:
-                is_health = True
-                break
-        
-        if not is_health:
-            continue
-        
-        # 检查是否是娱乐内容（标题或热度标签中包含综艺等关键词）
-        is_entertainment = False
-        for exclude in EXCLUDE_KEYWORDS:
-            if exclude in title or exclude in hot_count:
-                is_entertainment = True
-                break
-        
-        if not is_entertainment:
-            health_topics.append(item)
-    
-    return health_topics
+    # 标题包含健康关键词，且标题和热度标签中都没有综艺等娱乐类关键词
+    rows = [(item.get('title', ''), None, item.get('hot_count', '')) for item in hot_list]
+    return [item for item, matched in zip(hot_list, HEALTH_RULES.classify_many(rows)) if matched]
 
 def format_output(health_topics, all_count=0):
     """格式化输出"""
@@ -0,0 +1,91 @@
+"""weibo_health_monitor 增量推送的基线与下榜判断"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+import weibo_health_monitor as monitor
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+
+def topic(title, rank):
+    return {'title': title, 'rank': rank, 'link': '', 'hot_count': ''}
+
+
+def since(seconds_ago):
+    return (NOW - timedelta(seconds=seconds_ago)).strftime(monitor.SNAPSHOT_TIME_FORMAT)
+
+
+def test_first_run_reports_everything_as_new():
+    diff = monitor.diff_snapshots(None, [topic('A', '1'), topic('B', '2')], now=NOW)
+    assert [t['title'] for t in diff['new']] == ['A', 'B']
+    assert not diff['rising'] and not diff['dropped']
+
+
+def test_slow_climb_is_reported_once_it_adds_up():
+    """A 在两轮里各上升 3 位，基线只随推送过的话题前进，累计 6 位时报告排名上升"""
+    baseline = {'A': '17', 'B': '30'}
+    run1 = [topic('A', '14'), topic('B', '30'), topic('C', '40')]
+    diff1 = monitor.diff_snapshots(baseline, run1, now=NOW)
+    assert [t['title'] for t in diff1['new']] == ['C']
+    assert not diff1['rising']
+    baseline, missing = monitor.next_baseline(baseline, run1, diff1, now=NOW)
+    assert baseline == {'A': '17', 'B': '30', 'C': '40'}
+    assert missing == {}
+
+    run2 = [topic('A', '11'), topic('B', '30'), topic('C', '40')]
+    diff2 = monitor.diff_snapshots(baseline, run2, now=NOW)
+    assert [(t['title'], rank) for t, rank in diff2['rising']] == [('A', '17')]
+    baseline, _ = monitor.next_baseline(baseline, run2, diff2, now=NOW)
+    assert baseline == {'A': '11', 'B': '30', 'C': '40'}
+
+
+def test_full_mode_moves_every_topic_to_its_current_rank():
+    baseline, _ = monitor.next_baseline({'A': '17', 'B': '30'}, [topic('A', '14'), topic('B', '25')], now=NOW)
+    assert baseline == {'A': '14', 'B': '25'}
+
+
+def test_topic_missing_for_one_poll_is_not_dropped_or_new():
+    baseline = {'A': '3', 'B': '8'}
+    run1 = [topic('A', '3')]
+    diff1 = monitor.diff_snapshots(baseline, run1, now=NOW)
+    assert diff1['dropped'] == []
+    baseline, missing = monitor.next_baseline(baseline, run1, diff1, now=NOW)
+    assert baseline == {'A': '3', 'B': '8'}
+    assert missing == {'B': since(0)}
+
+    later = NOW + timedelta(seconds=120)
+    run2 = [topic('A', '3'), topic('B', '9')]
+    diff2 = monitor.diff_snapshots(baseline, run2, missing=missing, now=later)
+    assert not monitor.has_changes(diff2)
+    baseline, missing = monitor.next_baseline(baseline, run2, diff2, missing, later)
+    assert baseline == {'A': '3', 'B': '8'}
+    assert missing == {}
+
+
+def test_topic_is_dropped_after_the_grace_period():
+    baseline = {'A': '3', 'B': '8'}
+    run = [topic('A', '3')]
+    missing = {'B': since(monitor.DROP_GRACE_SECONDS - 1)}
+    diff = monitor.diff_snapshots(baseline, run, missing=missing, now=NOW)
+    assert diff['dropped'] == []
+
+    missing = {'B': since(monitor.DROP_GRACE_SECONDS)}
+    diff = monitor.diff_snapshots(baseline, run, missing=missing, now=NOW)
+    assert diff['dropped'] == [('B', '8')]
+    baseline, missing = monitor.next_baseline(baseline, run, diff, missing, NOW)
+    assert baseline == {'A': '3'}
+    assert missing == {}
+
+
+def test_zero_grace_drops_immediately():
+    diff = monitor.diff_snapshots({'A': '3', 'B': '8'}, [topic('A', '3')], now=NOW, grace=0)
+    assert diff['dropped'] == [('B', '8')]
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    assert monitor.load_snapshot(path) == (None, {})
+    monitor.save_snapshot({'A': '3'}, path, missing={'B': since(0)})
+    assert monitor.load_snapshot(path) == ({'A': '3'}, {'B': since(0)})
@@ -6,11 +6,19 @@
 
 import requests
 import json
+import os
+import sys
 import time
 import re
 from datetime import datetime
 from urllib.parse import quote, urlparse
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from topic_classifier import load_rules
+
+# 健康话题监测关键词见 config/weibo_category_rules.json 的 health_watch 规则集
+HEALTH_RULES = load_rules('health_watch')
+
 class SocialMediaCrawler:
     def __init__(self):
         self.session = requests.Session()
@@ -21,7 +29,7 @@ class SocialMediaCrawler:
             'Accept-Encoding': 'gzip, deflate, br',
             'Connection': 'keep-alive',
         })
-        
+    
     # ============ 小红书 ============
     
     def xhs_search(self, keyword, page=1):
@@ -119,12 +127,6 @@ class SocialMediaCrawler:
     
     def monitor_health_topics(self):
         """监测健康相关话题"""
-        health_keywords = [
-            '鼻炎', '过敏性鼻炎', '哮喘', '过敏',
-            '种植牙', '牙齿矫正', '近视手术',
-            '流感', '感冒', '发烧'
-        ]
-        
         results = {
             'timestamp': datetime.now().isoformat(),
             'weibo_hot': [],
@@ -133,8 +135,9 @@ class SocialMediaCrawler:
         
         # 获取微博热搜中的健康话题
         hot_list = self.weibo_hot_search()
-        for item in hot_list:
-            if any(kw in item['topic'] for kw in health_keywords):
+        matches = HEALTH_RULES.classify_many((item['topic'], None) for item in hot_list)
+        for item, matched in zip(hot_list, matches):
+            if matched:
                 results['weibo_hot'].append(item)
         
         return results
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+热搜话题关键词分类器
+各个微博脚本原来对每条标题逐个关键词做 `in` 扫描（健康关键词约 100 个、
+排除关键词约 25 个）。这里把所有关键词组编译成一个 Aho-Corasick 自动机，
+每条标题只扫描一遍，就能得到命中的全部关键词以及它们所属的分组。
+
+    classifier = KeywordClassifier({"health": HEALTH_KEYWORDS, "exclude": EXCLUDE_KEYWORDS})
+    classifier.labels("肾结石误认黄金")        -> {"health"}
+    classifier.match("流感疫苗接种")           -> {"health": ["流感", "疫苗", "接种"]}
+    classifier.labels_many(titles)             批量处理，重复的标题只扫描一次
+
+同一个关键词可以属于多个分组。自动机构建时就把失败链接展开成完整的
+状态转移表，扫描时每个字符只做一次字典查找。
+
+分类规则（关键词、排名上限、排除词）统一写在 config/weibo_category_rules.json，
+load_rules() 把一个规则集编译成 CategoryClassifier，所有微博脚本共用：
+
+    rules = load_rules("medical")
+    rules.classify("种植牙集采", rank=8)              -> [CategoryRule(dental 口腔牙科)]
+    rules.classify("激光近视手术", rank=8, mode="multi") -> 眼科、医美两个分类
+
+first 模式按规则集中的顺序取第一个符合条件的分类，multi 模式返回全部。
+
+用法:
+  python3 topic_classifier.py [标题来源文件 ...]   与逐词 `in` 扫描对比耗时并核对结果
+  python3 topic_classifier.py --title 标题 [--rank 5] [--rule-set medical] [--multi]
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from collections import deque
+
+from weibo_hotsearch_parser import parse_hotsearch
+
+# 分类规则
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "weibo_category_rules.json")
+MODES = ("first", "multi")
+
+# 历史标题，用于基准测试
+WORKSPACE = "/root/.openclaw/workspace"
+HISTORY_SOURCES = (
+    f"{WORKSPACE}/data/raw_hotsearch_*.json",
+    f"{WORKSPACE}/data/weibo_debug.html",
+    f"{WORKSPACE}/hotspots/*.jsonl",
+    f"{WORKSPACE}/knowledge/weibo_hotsearch/*.md",
+)
+
+
+class KeywordClassifier:
+    """多组关键词的 Aho-Corasick 匹配器，构建后只读，可以在线程间共享"""
+    
+    def __init__(self, groups):
+        """groups: {分组名: 关键词列表}，重复和空关键词会被忽略"""
+        self.groups = {label: list(dict.fromkeys(k for k in keywords if k)) for label, keywords in groups.items()}
+        self.keywords = []
+        keyword_labels = {}
+        for label, keywords in self.groups.items():
+            for keyword in keywords:
+                if keyword not in keyword_labels:
+                    keyword_labels[keyword] = []
+                    self.keywords.append(keyword)
+                keyword_labels[keyword].append(label)
+        self._keyword_labels = keyword_labels
+        self._build()
+    
+    def _build(self):
+        # 1. 关键词字典树
+        goto = [{}]
+        outputs = [[]]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][ch] = nxt
+                state = nxt
+            outputs[state].append(index)
+        
+        # 2. 按层计算失败链接，并把 goto 展开成完整的转移表（DFA）
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            # 失败状态的转移表已经算好（层数更小），在它基础上覆盖自己的 goto
+            table = dict(delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                table[ch] = nxt
+                queue.append(nxt)
+            delta[state] = table
+            outputs[state] = outputs[state] + outputs[fail[state]]
+        
+        self._delta = delta
+        # 每个状态结束的关键词（按长度从长到短）和这些关键词所属的分组
+        self._outputs = [tuple(sorted(out, key=lambda i: -len(self.keywords[i]))) for out in outputs]
+        self._state_labels = [frozenset(label for i in out for label in self._keyword_labels[self.keywords[i]])
+                              for out in outputs]
+    
+    def find(self, text):
+        """返回 text 中所有命中 [(起始位置, 关键词)]，按结束位置排序，重叠的命中都会列出"""
+        hits = []
+        if not text:
+            return hits
+        delta, outputs, keywords = self._delta, self._outputs, self.keywords
+        state = 0
+        for pos, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            for index in outputs[state]:
+                keyword = keywords[index]
+                hits.append((pos - len(keyword) + 1, keyword))
+        return hits
+    
+    def labels(self, text):
+        """返回 text 命中的分组名集合"""
+        found = set()
+        if not text:
+            return found
+        delta, state_labels = self._delta, self._state_labels
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if state_labels[state]:
+                found |= state_labels[state]
+        return found
+    
+    def match(self, text):
+        """返回 {分组名: 命中的关键词（按首次出现顺序，不重复）}，没有命中的分组不出现"""
+        result = {}
+        for _, keyword in self.find(text):
+            for label in self._keyword_labels[keyword]:
+                hits = result.setdefault(label, [])
+                if keyword not in hits:
+                    hits.append(keyword)
+        return result
+    
+    def labels_many(self, texts):
+        """批量版 labels()，相同的文本只扫描一次"""
+        cache = {}
+        results = []
+        for text in texts:
+            found = cache.get(text)
+            if found is None:
+                found = cache[text] = self.labels(text)
+            results.append(found)
+        return results
+    
+    def match_many(self, texts):
+        """批量版 match()，相同的文本只扫描一次"""
+        cache = {}
+        results = []
+        for text in texts:
+            found = cache.get(text)
+            if found is None:
+                found = cache[text] = self.match(text)
+            results.append(found)
+        return results
+
+
+class CategoryRule:
+    """一个分类：标题命中 keywords 之一、没有命中 exclude，且排名不超过 max_rank"""
+    
+    def __init__(self, key, name, keywords, max_rank=None, exclude=()):
+        self.key = key
+        self.name = name
+        self.keywords = list(keywords)
+        self.max_rank = max_rank
+        self.exclude = list(exclude)
+    
+    def __repr__(self):
+        return f"CategoryRule({self.key} {self.name})"
+
+
+def _parse_rank(rank):
+    try:
+        return int(rank)
+    except (TypeError, ValueError):
+        return None
+
+
+class CategoryClassifier:
+    """按一组 CategoryRule 分类标题，所有分类的关键词和排除词在同一个自动机里"""
+    
+    def __init__(self, rules, mode="first"):
+        if mode not in MODES:
+            raise ValueError(f"未知的分类模式: {mode}")
+        self.rules = list(rules)
+        self.mode = mode
+        groups = {}
+        for rule in self.rules:
+            groups[rule.key] = rule.keywords
+            if rule.exclude:
+                groups[f"{rule.key}:exclude"] = rule.exclude
+        self.matcher = KeywordClassifier(groups)
+        self._exclude_labels = frozenset(label for label in groups if label.endswith(":exclude"))
+    
+    def classify(self, title, rank=None, exclude_text=None, mode=None):
+        """返回符合条件的分类列表，first 模式最多一个
+        
+        rank 为 None 时不检查排名上限；分类有 max_rank 而排名无法识别（如 '置顶'）时
+        不归入该分类。exclude_text 是另外需要检查排除词的文本，如热度标签 '综艺 12345'。
+        """
+        labels = self.matcher.labels(title)
+        if not labels:
+            return []
+        if exclude_text and self._exclude_labels:
+            # 这段文本只用来检查排除词，命中的普通关键词不算
+            labels = labels | (self.matcher.labels(exclude_text) & self._exclude_labels)
+        mode = mode or self.mode
+        rank_value = _parse_rank(rank)
+        matched = []
+        for rule in self.rules:
+            if rule.key not in labels or f"{rule.key}:exclude" in labels:
+                continue
+            if rule.max_rank is not None and rank is not None:
+                if rank_value is None or rank_value > rule.max_rank:
+                    continue
+            matched.append(rule)
+            if mode == "first":
+                break
+        return matched
+    
+    def classify_many(self, rows, mode=None):
+        """批量分类，rows 的每一项是 (标题, 排名) 或 (标题, 排名, 排除检查文本)，相同的行只计算一次"""
+        cache = {}
+        results = []
+        for row in rows:
+            row = tuple(row)
+            matched = cache.get(row)
+            if matched is None:
+                matched = cache[row] = self.classify(*row, mode=mode)
+            results.append(matched)
+        return results
+
+
+_compiled_rules = {}
+
+
+def load_rules(rule_set, path=RULES_FILE):
+    """读取并编译规则集，同一进程里只编译一次"""
+    cache_key = (os.path.abspath(path), rule_set)
+    classifier = _compiled_rules.get(cache_key)
+    if classifier is not None:
+        return classifier
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    spec = config.get("rule_sets", {}).get(rule_set)
+    if spec is None:
+        raise ValueError(f"{path} 中没有规则集 {rule_set}")
+    rules = []
+    for item in spec.get("categories", []):
+        try:
+            rules.append(CategoryRule(item["key"], item.get("name", item["key"]), item["keywords"],
+                                      max_rank=item.get("max_rank"), exclude=item.get("exclude", ())))
+        except KeyError as e:
+            raise ValueError(f"规则集 {rule_set} 的分类缺少字段 {e}") from None
+    classifier = _compiled_rules[cache_key] = CategoryClassifier(rules, mode=spec.get("mode", "first"))
+    return classifier
+
+
+def _titles_from_file(path):
+    if path.endswith('.html'):
+        with open(path, encoding='utf-8') as f:
+            return [item['title'] for item in parse_hotsearch(f.read())]
+    if path.endswith('.md'):
+        titles = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                cells = [c.strip() for c in line.strip().strip('|').split('|')]
+                if len(cells) >= 2 and cells[0] not in ("排名", "") and not cells[0].startswith('-'):
+                    titles.append(cells[1])
+        return titles
+    if path.endswith('.jsonl'):
+        titles = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    data = json.loads(line).get("data") or {}
+                except ValueError:
+                    continue
+                if data.get("title"):
+                    titles.append(data["title"])
+        return titles
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return [t["title"] for t in data.get("health_topics", []) if t.get("title")]
+
+
+def load_history_titles(patterns=HISTORY_SOURCES):
+    """从原始热搜数据、调试页面、webhook 日志和知识库里收集历史标题"""
+    titles = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                titles.extend(_titles_from_file(path))
+            except (OSError, ValueError) as e:
+                print(f"[Classifier] 跳过 {path}: {e}")
+    return titles
+
+
+def benchmark(titles, groups, rounds=200):
+    """对比逐词 `in` 扫描与自动机，返回耗时（微秒/条）和结果不一致的标题"""
+    classifier = KeywordClassifier(groups)
+    
+    def loop_labels(title):
+        return {label for label, keywords in groups.items() if any(k in title for k in keywords)}
+    
+    mismatches = [t for t in titles if loop_labels(t) != classifier.labels(t)]
+    results = {}
+    for name, fn in (("in 循环", loop_labels), ("自动机", classifier.labels)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for title in titles:
+                fn(title)
+        results[name] = (time.perf_counter() - start) / (rounds * len(titles)) * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        classifier.labels_many(titles)
+    results["自动机 (批量)"] = (time.perf_counter() - start) / (rounds * len(titles)) * 1e6
+    return results, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关键词分类器基准测试")
+    parser.add_argument("sources", nargs="*", help="标题来源文件（.json / .jsonl / .html / .md），默认读取工作区的历史数据")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--rule-set", default="health", help="使用的规则集（见 config/weibo_category_rules.json）")
+    parser.add_argument("--title", help="只对这个标题分类并打印结果")
+    parser.add_argument("--rank", help="与 --title 一起使用的排名")
+    parser.add_argument("--multi", action="store_true", help="与 --title 一起使用，返回全部符合条件的分类")
+    args = parser.parse_args()
+    
+    rules = load_rules(args.rule_set)
+    if args.title:
+        matched = rules.classify(args.title, args.rank, mode="multi" if args.multi else None)
+        print(', '.join(f"{rule.name} ({rule.key})" for rule in matched) or "未分类")
+        print(f"命中关键词: {rules.matcher.match(args.title)}")
+        return
+    
+    titles = load_history_titles(args.sources or HISTORY_SOURCES)
+    if not titles:
+        print("[Classifier] 没有找到历史标题")
+        return
+    groups = rules.matcher.groups
+    results, mismatches = benchmark(titles, groups, args.rounds)
+    print(f"[Classifier] {len(titles)} 条历史标题, {sum(len(k) for k in groups.values())} 个关键词, {args.rounds} 轮")
+    for name, micros in results.items():
+        print(f"  {name:<12} {micros:8.2f} 微秒/条")
+    print(f"  结果不一致: {len(mismatches)} 条" + (f" {mismatches[:5]}" if mismatches else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Webhook 本机客户端
+爬虫脚本把数据推给同一台机器上的 webhook 服务时使用：优先走服务的
+Unix 域套接字，不经过 TCP 协议栈；套接字不存在或连不上时退回 TCP。
+
+    from webhook_client import post_bulk
+    post_bulk([{"source": "weibo", "title": "...", "rank": 3}])
+"""
+import http.client
+import json
+import socket
+from urllib.parse import urlsplit
+
+from webhook_common import RUN_DIR
+
+# 配置
+LOGGER_SOCKET = f"{RUN_DIR}/webhook_logger.sock"
+LOGGER_URL = "http://127.0.0.1:8080"
+TIMEOUT = 10
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """通过 Unix 域套接字发送 HTTP 请求"""
+    
+    def __init__(self, socket_path, timeout=TIMEOUT):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+    
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def _connect(socket_path, url, timeout):
+    if socket_path:
+        conn = UnixHTTPConnection(socket_path, timeout=timeout)
+        try:
+            conn.connect()
+            return conn
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass  # 服务没有开 Unix 域套接字，走 TCP
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    conn.connect()
+    return conn
+
+
+def request(method, path, body=None, content_type='application/json',
+            socket_path=LOGGER_SOCKET, url=LOGGER_URL, timeout=TIMEOUT):
+    """发送请求，返回 (状态码, 解析后的 JSON 响应)"""
+    conn = _connect(socket_path, url, timeout)
+    try:
+        headers = {'Content-Type': content_type} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        data = resp.read()
+    finally:
+        conn.close()
+    try:
+        return resp.status, json.loads(data) if data else None
+    except ValueError:
+        return resp.status, data.decode('utf-8', 'replace')
+
+
+def post_json(payload, path='/', **kwargs):
+    """发送一条记录"""
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    return request('POST', path, body, **kwargs)
+
+
+def post_bulk(records, path='/bulk', **kwargs):
+    """以 NDJSON 一次发送一批记录"""
+    body = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode()
+    return request('POST', path, body, content_type='application/x-ndjson', **kwargs)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Webhook JSON 编解码
+webhook 服务解析请求体、写日志、回复响应都要过一遍 JSON。安装了 orjson 或
+msgspec 时用它们编解码，否则退回标准库 json，调用方不需要关心用的是哪个。
+输出始终是 UTF-8、不转义中文，和 json.dumps(..., ensure_ascii=False) 等价
+（只是没有多余的空格）。
+
+快速后端处理不了的输入（编码超过 64 位的整数、解析标准库才接受的 NaN /
+Infinity 等）会自动交给标准库再试一次，结果和以前一致；解析失败抛出 ValueError。
+
+HotspotRecord 是爬虫推送数据的可选类型约束（source / category / rank /
+title / hot_count），validate_record() 只检查这几个字段的类型，其他字段原样保留。
+
+环境变量 WEBHOOK_JSON_CODEC=orjson|msgspec|json 可以强制指定后端。
+
+用法: python3 webhook_codec.py [--iterations 20000]   对比各后端的编解码耗时
+"""
+import argparse
+import json
+import os
+import time
+from typing import Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# 配置
+CODEC = os.environ.get("WEBHOOK_JSON_CODEC", "auto")
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _json_dumps_bytes(obj):
+    return json.dumps(obj, ensure_ascii=False).encode()
+
+
+def _orjson_loads(data):
+    try:
+        return orjson.loads(data)
+    except ValueError:
+        return json.loads(data)
+
+
+def _orjson_dumps_bytes(obj):
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        return _json_dumps_bytes(obj)
+
+
+if msgspec:
+    _msgspec_decoder = msgspec.json.Decoder()
+    _msgspec_encoder = msgspec.json.Encoder()
+
+
+def _msgspec_loads(data):
+    try:
+        return _msgspec_decoder.decode(data.encode() if isinstance(data, str) else data)
+    except msgspec.DecodeError:
+        return json.loads(data)
+
+
+def _msgspec_dumps_bytes(obj):
+    try:
+        return _msgspec_encoder.encode(obj)
+    except (TypeError, OverflowError, msgspec.EncodeError):
+        return _json_dumps_bytes(obj)
+
+
+_BACKENDS = {
+    "json": (_json_loads, _json_dumps_bytes),
+    "orjson": (_orjson_loads, _orjson_dumps_bytes),
+    "msgspec": (_msgspec_loads, _msgspec_dumps_bytes),
+}
+
+
+def available_backends():
+    """按优先顺序返回已安装的后端名"""
+    names = []
+    if orjson:
+        names.append("orjson")
+    if msgspec:
+        names.append("msgspec")
+    names.append("json")
+    return names
+
+
+def _select_backend(name):
+    backends = available_backends()
+    if name == "auto":
+        return backends[0]
+    if name not in backends:
+        print(f"[Codec] 后端 {name} 不可用，改用 {backends[0]}")
+        return backends[0]
+    return name
+
+
+BACKEND = _select_backend(CODEC)
+# loads(data) 解析 bytes 或 str，失败抛出 ValueError；dumps_bytes(obj) 返回 UTF-8 编码的 JSON
+loads, dumps_bytes = _BACKENDS[BACKEND]
+
+
+def dumps(obj):
+    """编码为不转义中文的 JSON 字符串"""
+    return dumps_bytes(obj).decode()
+
+
+# 爬虫推送数据的类型约束：字段都可以缺省；rank / hot_count 可能是
+# '置顶'、'剧集 12345' 这样的字符串，所以也接受 str
+RECORD_SCHEMA = {
+    "source": (str,),
+    "category": (str,),
+    "title": (str,),
+    "rank": (int, str),
+    "hot_count": (int, str),
+}
+
+if msgspec:
+    class HotspotRecord(msgspec.Struct):
+        source: Optional[str] = None
+        category: Optional[str] = None
+        title: Optional[str] = None
+        rank: Union[int, str, None] = None
+        hot_count: Union[int, str, None] = None
+
+
+def _check_schema(data):
+    if not isinstance(data, dict):
+        raise ValueError("记录必须是 JSON 对象")
+    errors = []
+    for field, types in RECORD_SCHEMA.items():
+        value = data.get(field)
+        # bool 是 int 的子类，排名和热度不应该是布尔值
+        if value is not None and (isinstance(value, bool) or not isinstance(value, types)):
+            errors.append(f"{field} 应为 {' / '.join(t.__name__ for t in types)}，实际是 {type(value).__name__}")
+    if errors:
+        raise ValueError("字段类型不符: " + "; ".join(errors))
+
+
+def validate_record(data):
+    """按 HotspotRecord 检查已知字段的类型，不符合时抛出 ValueError；不修改 data"""
+    if msgspec and isinstance(data, dict):
+        try:
+            msgspec.convert(data, HotspotRecord, strict=True)
+            return
+        except msgspec.ValidationError:
+            pass  # 用统一的检查生成错误信息
+    _check_schema(data)
+
+
+def _sample_payloads():
+    record = {
+        "source": "weibo_crawler", "category": "医药", "rank": 7,
+        "title": "医保药品目录调整结果公布", "hot_count": 1234567,
+        "message": "微博热搜第7名: 医保药品目录调整结果公布（热度 1234567）" * 3,
+        "url": "https://s.weibo.com/weibo?q=%23医保药品目录调整结果公布%23",
+    }
+    event = {"timestamp": "2026-10-18T12:00:00.123456", "data": record}
+    return {"record": record, "event": event,
+            "batch": {"status": "ok", "results": [{"index": i, "status": "ok"} for i in range(50)]}}
+
+
+def benchmark(iterations=20000):
+    """返回 {后端: {用例: 每次操作的微秒数}}"""
+    results = {}
+    payloads = _sample_payloads()
+    for name in available_backends():
+        backend_loads, backend_dumps = _BACKENDS[name]
+        timings = {}
+        for label, obj in payloads.items():
+            encoded = _json_dumps_bytes(obj)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                backend_loads(encoded)
+            timings[f"loads_{label}"] = (time.perf_counter() - start) / iterations * 1e6
+            start = time.perf_counter()
+            for _ in range(iterations):
+                backend_dumps(obj)
+            timings[f"dumps_{label}"] = (time.perf_counter() - start) / iterations * 1e6
+        results[name] = timings
+    record = payloads["record"]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        validate_record(record)
+    results["validate_record"] = {"record": (time.perf_counter() - start) / iterations * 1e6}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 编解码后端对比")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    print(f"[Codec] 当前后端: {BACKEND}，已安装: {', '.join(available_backends())}")
+    results = benchmark(args.iterations)
+    validate = results.pop("validate_record")
+    cases = list(next(iter(results.values())))
+    print(f"{'用例':<16}" + ''.join(f"{name:>12}" for name in results) + "   (微秒/次)")
+    for case in cases:
+        print(f"{case:<16}" + ''.join(f"{results[name][case]:>12.2f}" for name in results))
+    print(f"validate_record {validate['record']:.2f} 微秒/次")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Webhook 服务公共工具
+webhook_server / webhook_logger / webhook_receiver 共用的请求解析、响应辅助函数、
+过载保护（请求体大小上限、并发请求上限）、本机 Unix 域套接字监听以及多进程
+（SO_REUSEPORT 预派生）运行模式
+"""
+import codecs
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+from webhook_codec import dumps_bytes, loads
+
+BULK_CHUNK_SIZE = 64 * 1024
+RUN_DIR = "/root/.openclaw/workspace/run"  # Unix 域套接字所在目录
+UNIX_SOCKET_MODE = 0o660
+UNIX_LISTEN_BACKLOG = 128
+
+
+def send_json(handler, status, payload, headers=None):
+    """以 JSON 格式返回响应"""
+    body = dumps_bytes(payload)
+    handler.send_response(status)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def reject(handler, status, error, retry_after=None):
+    """拒绝请求且不读取请求体，回复后关闭连接；过载时带上 Retry-After（秒）"""
+    handler.close_connection = True
+    headers = {'Connection': 'close'}
+    if retry_after is not None:
+        headers['Retry-After'] = str(max(1, int(retry_after)))
+    send_json(handler, status, {"status": "error", "error": error}, headers)
+
+
+def read_content_length(handler, limit):
+    """在读取请求体之前检查 Content-Length
+    
+    缺失时视为 0；不是非负整数时回复 400，超过 limit 字节时回复 413，
+    这两种情况返回 None，调用方直接结束处理。
+    """
+    value = handler.headers.get('Content-Length', '0').strip()
+    if not value.isdigit():
+        reject(handler, 400, "Content-Length 不合法")
+        return None
+    content_length = int(value)
+    if content_length > limit:
+        reject(handler, 413, f"请求体过大: {content_length} 字节，上限 {limit} 字节")
+        return None
+    return content_length
+
+
+class InFlightLimit:
+    """同时处理的请求数上限，满了立即拒绝，不让请求在进程里排队堆积"""
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._active = 0
+    
+    def try_acquire(self):
+        if not self._semaphore.acquire(blocking=False):
+            return False
+        with self._lock:
+            self._active += 1
+        return True
+    
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        self._semaphore.release()
+    
+    def active(self):
+        return self._active
+
+
+def _read_chunks(rfile, content_length):
+    remaining = content_length
+    while remaining > 0:
+        chunk = rfile.read(min(BULK_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def iter_bulk_records(rfile, content_length, validate=None):
+    """流式解析批量请求体，逐条产出 (序号, 记录, 错误信息)
+    
+    请求体可以是 NDJSON（每行一个 JSON 对象）或 JSON 数组，按首个非空白
+    字符是否为 '[' 区分。按块读取，不会把整个请求体先读进内存再解析。
+    NDJSON 中某一行解析失败只影响这一行；JSON 数组出错后无法继续定位
+    后面的元素，产出一条错误后结束。
+    validate 是可选的检查函数（如 webhook_codec.validate_record），抛出
+    ValueError 的记录按错误产出。
+    """
+    chunks = _read_chunks(rfile, content_length)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+    if not head.strip():
+        return
+    
+    if head.lstrip()[:1] == b'[':
+        yield from _iter_json_array(head, chunks, validate)
+    else:
+        yield from _iter_ndjson(head, chunks, validate)
+
+
+def _check_record(index, record, validate=None):
+    if not isinstance(record, dict):
+        return (index, None, "记录必须是 JSON 对象")
+    if validate:
+        try:
+            validate(record)
+        except ValueError as e:
+            return (index, None, str(e))
+    return (index, record, None)
+
+
+def _iter_ndjson(head, chunks, validate=None):
+    index = 0
+    buf = head
+    
+    def parse(line):
+        nonlocal index
+        line = line.strip()
+        if not line:
+            return None
+        index += 1
+        try:
+            record = loads(line)
+        except ValueError as e:
+            return (index - 1, None, f"JSON 解析失败: {e}")
+        return _check_record(index - 1, record, validate)
+    
+    while True:
+        *lines, buf = buf.split(b'\n')
+        for line in lines:
+            result = parse(line)
+            if result:
+                yield result
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        buf += chunk
+    
+    result = parse(buf)
+    if result:
+        yield result
+
+
+def _iter_json_array(head, chunks, validate=None):
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    bad_utf8 = None
+    
+    def decode(data, final=False):
+        """增量解码；遇到非法 UTF-8 时只返回之前的合法部分，错误留给出错的那条记录"""
+        nonlocal bad_utf8
+        pending = utf8.getstate()[0]
+        try:
+            return utf8.decode(data, final)
+        except UnicodeDecodeError as e:
+            bad_utf8 = e
+            return (pending + data)[:e.start].decode('utf-8')
+    
+    buf = decode(head).lstrip()[1:]  # 去掉开头的 '['
+    index = 0
+    eof = bad_utf8 is not None
+    
+    while True:
+        # 跳过元素之间的空白和逗号
+        pos = 0
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        buf = buf[pos:]
+        
+        if buf[:1] == ']':
+            return
+        if buf:
+            try:
+                record, end = decoder.raw_decode(buf)
+            except ValueError as e:
+                if eof:
+                    yield (index, None, f"JSON 解析失败: {bad_utf8 or e}")
+                    return
+            else:
+                yield _check_record(index, record, validate)
+                index += 1
+                buf = buf[end:]
+                continue
+        elif eof:
+            yield (index, None, f"JSON 解析失败: {bad_utf8}" if bad_utf8 else "JSON 数组不完整")
+            return
+        
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buf += decode(b'', final=True)
+        else:
+            buf += decode(chunk)
+            # 非法字节之后的内容无法可靠切分，按数据结束处理
+            eof = bad_utf8 is not None
+
+
+def create_server(server_class, address, handler_class, reuse_port=False):
+    """创建 HTTP 服务；reuse_port=True 时设置 SO_REUSEPORT，多个进程可以监听同一端口"""
+    server = server_class(address, handler_class, bind_and_activate=False)
+    server.allow_reuse_port = reuse_port
+    try:
+        server.server_bind()
+        server.server_activate()
+    except Exception:
+        server.server_close()
+        raise
+    return server
+
+
+def bind_unix_socket(path, mode=UNIX_SOCKET_MODE):
+    """绑定并监听 Unix 域套接字，返回监听 socket
+    
+    路径上已有套接字文件时先尝试连接：能连上说明另一个实例正在使用，抛出 OSError；
+    连不上则是上次异常退出留下的，删除后重新绑定。多进程模式下由 master 绑定，
+    fork 出的 worker 继承同一个监听 socket 一起 accept。
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(f"{path} 已存在且不是套接字")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise OSError(f"{path} 正在被其他进程使用")
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        os.chmod(path, mode)
+        sock.listen(UNIX_LISTEN_BACKLOG)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def remove_unix_socket(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class UnixListener(socketserver.UnixStreamServer):
+    """在已绑定的 Unix 域套接字上接收请求，交给与 TCP 服务相同的 handler
+    
+    handler 通过 self.server 访问的属性（log_writer、dingtalk_queue 等）
+    都转给 TCP 服务，两个入口共用同一份状态。
+    """
+    
+    def __init__(self, sock, handler_class, primary):
+        self.primary = primary
+        super().__init__(sock.getsockname(), handler_class, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+    
+    def __getattr__(self, name):
+        return getattr(self.primary, name)
+    
+    def get_request(self):
+        conn, _ = self.socket.accept()
+        # AF_UNIX 的对端地址是空字符串，BaseHTTPRequestHandler 需要 (host, port)
+        return conn, ('unix', 0)
+    
+    def server_close(self):
+        # 监听 socket 由创建者关闭（多进程模式下是 master）
+        pass
+
+
+class ThreadingUnixListener(socketserver.ThreadingMixIn, UnixListener):
+    daemon_threads = True
+
+
+def start_unix_listener(server, sock):
+    """在后台线程中为 server 增加 Unix 域套接字入口，返回 listener
+    
+    server 是多线程服务时 listener 也每个请求一个线程，否则逐个处理。
+    """
+    cls = ThreadingUnixListener if isinstance(server, socketserver.ThreadingMixIn) else UnixListener
+    listener = cls(sock, server.RequestHandlerClass, server)
+    threading.Thread(target=listener.serve_forever, name="unix-listener", daemon=True).start()
+    return listener
+
+
+def serve_until_signalled(server):
+    """serve_forever，收到 SIGTERM 后停止接收新连接并返回"""
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+
+
+def serve_prefork(worker_main, workers, on_tick=None, tick_interval=1.0, on_stop=None):
+    """预派生多进程模式
+    
+    master 进程 fork 出 workers 个子进程，各自调用 worker_main() 监听同一端口
+    （worker 需要用 reuse_port=True 创建服务）。master 每 tick_interval 秒调用
+    一次 on_tick，并补上意外退出的 worker。
+    
+    SIGHUP 平滑重载：先启动新一批 worker，再通知旧 worker 处理完当前请求后退出。
+    SIGTERM / SIGINT 平滑关闭：通知所有 worker 退出，等它们结束后调用 on_stop。
+    """
+    children = {}  # pid -> 所属批次
+    state = {"generation": 0, "reload": False, "stop": False}
+    
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                worker_main()
+            except Exception as e:
+                print(f"[Webhook] worker {os.getpid()} 异常退出: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = state["generation"]
+    
+    def reap():
+        while children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                children.clear()
+                return
+            if pid == 0:
+                return
+            generation = children.pop(pid, None)
+            if generation == state["generation"] and not state["stop"]:
+                print(f"[Webhook] worker {pid} 意外退出，重新启动")
+                spawn()
+    
+    def on_hup(signum, frame):
+        state["reload"] = True
+    
+    def on_term(signum, frame):
+        state["stop"] = True
+    
+    signal.signal(signal.SIGHUP, on_hup)
+    signal.signal(signal.SIGTERM, on_term)
+    signal.signal(signal.SIGINT, on_term)
+    
+    for _ in range(workers):
+        spawn()
+    print(f"[Webhook] master {os.getpid()} 已启动 {workers} 个 worker")
+    
+    while not state["stop"]:
+        time.sleep(tick_interval)
+        reap()
+        if state["reload"] and not state["stop"]:
+            state["reload"] = False
+            old = list(children)
+            state["generation"] += 1
+            for _ in range(workers):
+                spawn()
+            for pid in old:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass  # 已经自己退出，下一轮 reap() 回收
+            print(f"[Webhook] 平滑重载: 新 worker 已启动，旧 worker {old} 正在退出")
+        if on_tick:
+            on_tick()
+    
+    print("[Webhook] 正在关闭所有 worker...")
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in list(children):
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    children.clear()
+    if on_stop:
+        on_stop()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Webhook 重复数据过滤
+爬虫每小时都会重新推送同一批热搜，webhook_logger 收到后按内容键去重：
+键由 DEDUP_KEY_FIELDS 指定的字段组成，排名按 DEDUP_RANK_WINDOW 分桶
+（默认 5，即排名在同一个 5 名区间内的变动视为重复），取哈希后放进按天
+划分的有界 LRU 索引。被丢弃的重复记录按来源计数，通过 /metrics 输出。
+
+第一次遇到某一天时从当天的 JSONL 预热索引，服务重启后不会把已记录的话题再写一遍。
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from webhook_metrics import REGISTRY
+
+# 配置
+DEDUP_KEY_FIELDS = ("source", "title", "rank")  # 组成去重键的字段
+DEDUP_RANK_WINDOW = 5         # 排名分桶宽度，1 表示排名必须完全相同
+DEDUP_MAX_KEYS = 100000       # 每天最多保留的键数，超出后淘汰最久未出现的
+DEDUP_KEEP_DAYS = 2           # 保留最近几天的索引，接收跨零点的迟到记录
+
+DUPLICATES_DROPPED = REGISTRY.counter(
+    "webhook_duplicates_dropped_total", "按来源统计的被丢弃重复记录数", labelnames=("source",))
+DEDUP_KEYS = REGISTRY.gauge("webhook_dedup_keys", "去重索引中的键数")
+
+
+def _rank_bucket(value, window):
+    try:
+        return int(value) // window
+    except (TypeError, ValueError):
+        return value  # '置顶' 之类无法分桶的排名按原值比较
+
+
+class DedupIndex:
+    """按天划分的内容哈希 LRU 索引"""
+    
+    def __init__(self, key_fields=DEDUP_KEY_FIELDS, rank_window=DEDUP_RANK_WINDOW,
+                 max_keys=DEDUP_MAX_KEYS, keep_days=DEDUP_KEEP_DAYS, log_dir=None):
+        self.key_fields = tuple(key_fields)
+        self.rank_window = max(1, rank_window)
+        self.max_keys = max_keys
+        self.keep_days = keep_days
+        self.log_dir = log_dir
+        self._lock = threading.Lock()
+        self._days = {}  # day -> OrderedDict(key -> None)
+        DEDUP_KEYS.set_function(self.size)
+    
+    def key(self, data):
+        """计算记录的去重键；键字段都缺失时对整条记录取哈希"""
+        values = {}
+        for field in self.key_fields:
+            value = data.get(field)
+            if field == "title" and not value:
+                value = data.get("message")
+            if field == "rank":
+                value = _rank_bucket(value, self.rank_window)
+            values[field] = value
+        if all(v is None for k, v in values.items() if k != "source"):
+            values = data
+        raw = json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.blake2b(raw.encode(), digest_size=12).digest()
+    
+    def check(self, day, data):
+        """记录尚未出现过时登记并返回其键，重复时计数并返回 None"""
+        key = self.key(data)
+        with self._lock:
+            keys = self._load(day)
+            if key in keys:
+                keys.move_to_end(key)
+                duplicate = True
+            else:
+                self._insert(keys, key)
+                duplicate = False
+        if duplicate:
+            DUPLICATES_DROPPED.inc(str(data.get("source", "unknown")))
+            return None
+        return key
+    
+    def forget(self, day, key):
+        """记录最终没有写入（落盘失败等）时撤销登记，允许重试"""
+        with self._lock:
+            keys = self._days.get(day)
+            if keys is not None:
+                keys.pop(key, None)
+    
+    def size(self):
+        with self._lock:
+            return sum(len(keys) for keys in self._days.values())
+    
+    def _insert(self, keys, key):
+        keys[key] = None
+        if len(keys) > self.max_keys:
+            keys.popitem(last=False)
+    
+    def _load(self, day):
+        keys = self._days.get(day)
+        if keys is not None:
+            return keys
+        keys = self._days[day] = OrderedDict()
+        for old_day in sorted(self._days, reverse=True)[self.keep_days:]:
+            del self._days[old_day]
+        path = f"{self.log_dir}/{day}.jsonl" if self.log_dir else None
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        data = json.loads(line).get("data") or {}
+                    except (ValueError, AttributeError):
+                        continue
+                    if isinstance(data, dict):
+                        self._insert(keys, self.key(data))
+        return keys
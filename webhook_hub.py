@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Webhook 接收服务 - 多路分发模式
+一个服务同时完成 webhook_logger（写日志）、webhook_receiver（推送钉钉）和
+webhook_server（转发 OpenClaw 网关）的工作：每条事件经 webhook_sinks 的
+SinkPipeline 并发交给各个 sink，每个 sink 独立超时和重试。
+
+POST /        分发一条事件，返回各 sink 的结果
+POST /bulk    NDJSON 或 JSON 数组，逐条分发
+GET /stats    钉钉队列状态
+GET /metrics  Prometheus 指标（含每个 sink 的耗时和结果计数）
+
+同时监听 Unix 域套接字（默认 run/webhook_hub.sock），供本机爬虫使用。
+
+用法: python3 webhook_hub.py [--port 8080] [--sinks file,dingtalk,gateway]
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+from collections import deque
+
+from dingtalk_queue import DINGTALK_WEBHOOK, DingTalkQueue
+from openclaw_client import GatewayClient
+from webhook_common import (RUN_DIR, InFlightLimit, bind_unix_socket, create_server, iter_bulk_records,
+                            read_content_length, reject, remove_unix_socket, send_json,
+                            serve_until_signalled, start_unix_listener)
+from webhook_codec import loads
+from webhook_logger import JsonlGroupWriter
+from webhook_metrics import MetricsHandlerMixin, instrumented
+from webhook_sinks import DingTalkSink, FileLogSink, GatewaySink, SinkPipeline
+
+# 配置
+OPENCLAW_GATEWAY = "http://127.0.0.1:18789"
+DEFAULT_SINKS = ("file", "dingtalk", "gateway")
+UNIX_SOCKET = f"{RUN_DIR}/webhook_hub.sock"
+
+# 过载保护
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BULK_BODY_BYTES = 16 * 1024 * 1024
+MAX_IN_FLIGHT = 128        # 同时处理的 POST 请求数高水位，超出回复 429
+BULK_IN_FLIGHT = 256       # 单个 /bulk 请求同时在管道中的事件数，超出时先等最早的一条
+RETRY_AFTER = 2
+
+
+class HubServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+class WebhookHandler(MetricsHandlerMixin, BaseHTTPRequestHandler):
+    metric_routes = ('/', '/bulk', '/stats', '/metrics')
+    
+    @instrumented
+    def do_POST(self):
+        bulk = self.path.startswith('/bulk')
+        content_length = read_content_length(self, MAX_BULK_BODY_BYTES if bulk else MAX_BODY_BYTES)
+        if content_length is None:
+            return
+        in_flight = self.server.in_flight
+        if not in_flight.try_acquire():
+            reject(self, 429, "并发请求过多，请稍后重试", RETRY_AFTER)
+            return
+        try:
+            if bulk:
+                self.handle_bulk(content_length)
+            else:
+                self.handle_event(content_length)
+        finally:
+            in_flight.release()
+    
+    def handle_event(self, content_length):
+        try:
+            data = loads(self.rfile.read(content_length))
+            if not isinstance(data, dict):
+                raise ValueError("记录必须是 JSON 对象")
+        except ValueError as e:
+            send_json(self, 400, {"status": "error", "error": str(e)})
+            return
+        
+        sinks = self.server.pipeline.dispatch(data)
+        failed = [name for name, r in sinks.items() if r["status"] != "ok"]
+        print(f"[Webhook] 已分发: {data.get('source', 'unknown')}, 失败的 sink: {failed or '无'}")
+        send_json(self, 200, {
+            "status": "ok" if not failed else "partial",
+            "sinks": sinks
+        })
+    
+    def handle_bulk(self, content_length):
+        """批量分发：逐条提交给管道，最多 BULK_IN_FLIGHT 条同时在途，各条事件之间是并发的"""
+        pipeline = self.server.pipeline
+        results = []
+        pending = deque()
+        
+        def collect(result, handle):
+            result["sinks"] = pipeline.collect(handle)
+            if any(r["status"] != "ok" for r in result["sinks"].values()):
+                result["status"] = "partial"
+        
+        for index, data, error in iter_bulk_records(self.rfile, content_length):
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            result = {"index": index, "status": "ok"}
+            results.append(result)
+            pending.append((result, pipeline.submit(data)))
+            if len(pending) >= BULK_IN_FLIGHT:
+                collect(*pending.popleft())
+        
+        for result, handle in pending:
+            collect(result, handle)
+        accepted = sum(1 for r in results if r["status"] == "ok")
+        send_json(self, 200, {
+            "status": "ok" if accepted == len(results) else "partial",
+            "accepted": accepted,
+            "failed": len(results) - accepted,
+            "results": results
+        })
+    
+    @instrumented
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_metrics()
+            return
+        if self.path == '/stats' and self.server.dingtalk_queue:
+            send_json(self, 200, self.server.dingtalk_queue.stats())
+            return
+        self.send_error(404)
+    
+    def log_message(self, format, *args):
+        print(f"[Webhook] {format % args}")
+
+
+def build_pipeline(names=DEFAULT_SINKS):
+    """按名称创建 sink，返回 (管道, 钉钉队列或 None)"""
+    sinks = []
+    queue = None
+    for name in names:
+        if name == "file":
+            sinks.append(FileLogSink(JsonlGroupWriter()))
+        elif name == "dingtalk":
+            queue = DingTalkQueue(DINGTALK_WEBHOOK)
+            sinks.append(DingTalkSink(queue))
+        elif name == "gateway":
+            sinks.append(GatewaySink(GatewayClient(OPENCLAW_GATEWAY, timeout=GatewaySink.timeout)))
+        else:
+            raise ValueError(f"未知的 sink: {name}")
+    return SinkPipeline(sinks), queue
+
+
+def start_server(port=8080, sinks=DEFAULT_SINKS, host='0.0.0.0', unix_socket=UNIX_SOCKET):
+    print(f"[Webhook] 多路分发模式启动在 http://{host}:{port}")
+    print(f"[Webhook] sink: {', '.join(sinks)}")
+    server = create_server(HubServer, (host, port), WebhookHandler)
+    server.pipeline, server.dingtalk_queue = build_pipeline(sinks)
+    server.in_flight = InFlightLimit(MAX_IN_FLIGHT)
+    unix_sock = bind_unix_socket(unix_socket) if unix_socket else None
+    listener = start_unix_listener(server, unix_sock) if unix_sock else None
+    try:
+        serve_until_signalled(server)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if listener:
+            listener.shutdown()
+            unix_sock.close()
+            remove_unix_socket(unix_socket)
+        server.server_close()
+        server.pipeline.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhook 接收服务 - 多路分发")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", default="0.0.0.0", help="TCP 监听地址，只供本机使用时可设为 127.0.0.1")
+    parser.add_argument("--unix-socket", default=UNIX_SOCKET, help="Unix 域套接字路径，设为空字符串则不监听")
+    parser.add_argument("--sinks", default=','.join(DEFAULT_SINKS),
+                        help="逗号分隔的 sink 列表: file, dingtalk, gateway")
+    args = parser.parse_args()
+    start_server(args.port, sinks=[s.strip() for s in args.sinks.split(',') if s.strip()],
+                 host=args.host, unix_socket=args.unix_socket)
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Webhook 服务压测工具
+对 webhook_logger / webhook_receiver / webhook_hub 施加开环负载：请求按预定的
+到达时间发出，不等上一个请求返回，延迟从预定发送时间算起，服务变慢时排队
+时间也会计入延迟，不会被"发得慢"掩盖。结果写成 JSON，可以在版本之间对比。
+
+  stub      启动一个假的钉钉机器人接口，webhook_receiver 用 --dingtalk-webhook 指向它
+  run       发起压测，输出吞吐和延迟分位数
+  compare   对比两次压测结果
+
+被测实例要加 --unix-socket ''：默认的 Unix 域套接字是线上服务在用的，
+线上服务运行时会绑定失败，没运行时则会接走本机爬虫经 webhook_client 发来的数据。
+
+用法:
+  python3 webhook_loadtest.py stub --port 18900
+  python3 webhook_receiver.py --port 8081 --unix-socket '' \\
+      --dingtalk-webhook http://127.0.0.1:18900/robot/send --spool-dir /tmp/loadtest_spool
+  python3 webhook_loadtest.py run --url http://127.0.0.1:8081 --rate 200 --duration 30 \\
+      --mix single:8,bulk:1,get:1 --output results/receiver.json
+  HOTSPOT_LOG_DIR=/tmp/loadtest_hotspots python3 webhook_logger.py --port 8080 --unix-socket ''
+  python3 webhook_loadtest.py run --url http://127.0.0.1:8080 --rate 500 --new-connections
+  python3 webhook_loadtest.py compare results/v1.json results/v2.json
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import http.client
+import json
+import os
+import platform
+import queue
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from webhook_common import send_json
+
+# 配置
+DEFAULT_URL = "http://127.0.0.1:8080"
+DEFAULT_MIX = "single:8,bulk:1,get:1"
+DEFAULT_RATE = 100.0        # 每秒发起的请求数
+DEFAULT_DURATION = 30.0     # 压测时长（秒），不含预热
+DEFAULT_WARMUP = 3.0        # 预热时长（秒），这段时间的请求不计入结果
+DEFAULT_CONNECTIONS = 32    # 并发连接（线程）数
+BULK_SIZE = 50              # 每个 /bulk 请求包含的记录数
+MESSAGE_BYTES = 200         # 每条记录 message 字段的大致长度
+GET_PATH = "/metrics"
+REQUEST_TIMEOUT = 10.0
+STUB_PORT = 18900
+PERCENTILES = (50, 90, 99, 99.9)
+CATEGORIES = ("医药", "口腔", "眼科", "医美", "其他")
+
+KINDS = ("single", "bulk", "get")
+
+
+def parse_mix(text):
+    """解析 'single:8,bulk:1,get:1'，返回 {类型: 权重}"""
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition(':')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"未知的请求类型: {kind}（可选 {', '.join(KINDS)}）")
+        mix[kind] = float(weight) if weight else 1.0
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("请求类型权重之和必须大于 0")
+    return mix
+
+
+def percentile(sorted_values, p):
+    """最近秩法分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-p * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class PayloadFactory:
+    """生成压测请求；每条记录标题唯一，不会被 webhook_dedup 当作重复数据丢弃"""
+    
+    def __init__(self, mix, bulk_size=BULK_SIZE, message_bytes=MESSAGE_BYTES,
+                 get_path=GET_PATH, seed=None):
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.bulk_size = bulk_size
+        self.filler = "压测消息" * max(1, message_bytes // 12)
+        self.get_path = get_path
+        self.random = random.Random(seed)
+        self.run_id = f"{os.getpid()}-{int(time.time())}"
+        self._counter = 0
+    
+    def record(self):
+        self._counter += 1
+        n = self._counter
+        return {
+            "source": "loadtest",
+            "title": f"压测话题 {self.run_id}-{n}",
+            "rank": n % 50 + 1,
+            "hot_count": self.random.randint(10000, 5000000),
+            "category": self.random.choice(CATEGORIES),
+            "message": f"{n} {self.filler}",
+        }
+    
+    def next(self):
+        """返回 (类型, 方法, 路径, 请求体, Content-Type, 记录数)"""
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        if kind == "get":
+            return kind, "GET", self.get_path, None, None, 0
+        if kind == "bulk":
+            records = [self.record() for _ in range(self.bulk_size)]
+            body = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode()
+            return kind, "POST", "/bulk", body, "application/x-ndjson", len(records)
+        body = json.dumps(self.record(), ensure_ascii=False).encode()
+        return kind, "POST", "/", body, "application/json", 1
+
+
+class CountingConnection(http.client.HTTPConnection):
+    """记录建立过多少次 TCP 连接，用来确认 keep-alive 是否真的生效"""
+    
+    def __init__(self, *args, counter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counter = counter
+    
+    def connect(self):
+        super().connect()
+        self.counter.increment()
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+    
+    def increment(self):
+        with self._lock:
+            self.value += 1
+
+
+def arrival_times(rate, duration, arrival, rng):
+    """开环到达时间（相对开始的秒数）：uniform 为固定间隔，poisson 为指数分布间隔"""
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+        if t >= duration:
+            return
+        yield t
+
+
+class LoadRunner:
+    """按预定时间把请求放进队列，由固定数量的连接线程取出发送"""
+    
+    def __init__(self, url, factory, rate, duration, warmup=DEFAULT_WARMUP, connections=DEFAULT_CONNECTIONS,
+                 keep_alive=True, arrival="poisson", timeout=REQUEST_TIMEOUT, seed=None):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.factory = factory
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.connections = connections
+        self.keep_alive = keep_alive
+        self.arrival = arrival
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.connects = Counter()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._samples = []          # (类型, 结果, 延迟, 服务时间, 记录数)
+        self._max_backlog = 0
+        self._late = 0              # 调度线程自身落后超过 10ms 的次数
+    
+    def run(self):
+        workers = [threading.Thread(target=self._worker, name=f"load-{i}", daemon=True)
+                   for i in range(self.connections)]
+        for w in workers:
+            w.start()
+        total = self.warmup + self.duration
+        # 请求体提前生成，发送时不占用调度时间
+        schedule = [(t, self.factory.next()) for t in arrival_times(self.rate, total, self.arrival, self.rng)]
+        start = time.perf_counter()
+        for offset, request in schedule:
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.01:
+                self._late += 1
+            self._queue.put((intended, offset >= self.warmup, request))
+            backlog = self._queue.qsize()
+            if backlog > self._max_backlog:
+                self._max_backlog = backlog
+        for _ in workers:
+            self._queue.put(None)
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        return self._report(elapsed, len(schedule))
+    
+    def _new_connection(self):
+        return CountingConnection(self.host, self.port, timeout=self.timeout, counter=self.connects)
+    
+    def _worker(self):
+        conn = self._new_connection() if self.keep_alive else None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            intended, measured, (kind, method, path, body, content_type, records) = item
+            if not self.keep_alive:
+                conn = self._new_connection()
+            headers = {"Content-Type": content_type} if content_type else {}
+            if not self.keep_alive:
+                headers["Connection"] = "close"
+            sent = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                outcome = str(resp.status)
+                if resp.will_close:
+                    conn.close()  # 服务端不支持 keep-alive 时下一次请求会自动重连
+            except Exception as e:
+                outcome = type(e).__name__
+                conn.close()
+            done = time.perf_counter()
+            if not self.keep_alive:
+                conn.close()
+            if measured:
+                with self._lock:
+                    self._samples.append((kind, outcome, done - intended, done - sent, records))
+        if conn:
+            conn.close()
+    
+    def _report(self, elapsed, scheduled):
+        measured_seconds = max(elapsed - self.warmup, 1e-9)
+        by_kind = {}
+        for kind, outcome, latency, service, records in self._samples:
+            by_kind.setdefault(kind, []).append((outcome, latency, service, records))
+        report = {"elapsed_seconds": round(elapsed, 3), "scheduled_requests": scheduled,
+                  "max_backlog": self._max_backlog, "scheduler_late": self._late,
+                  "connections_opened": self.connects.value, "kinds": {}}
+        report["overall"] = summarize(
+            [(outcome, latency, service, records)
+             for samples in by_kind.values() for outcome, latency, service, records in samples],
+            measured_seconds)
+        for kind, samples in sorted(by_kind.items()):
+            report["kinds"][kind] = summarize(samples, measured_seconds)
+        return report
+
+
+def summarize(samples, seconds):
+    """汇总一组 (结果, 延迟, 服务时间, 记录数)；2xx 算成功，429 / 503 算被限流"""
+    outcomes = {}
+    for outcome, _, _, _ in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    ok = [s for s in samples if s[0].startswith('2')]
+    shed = sum(n for o, n in outcomes.items() if o in ("429", "503"))
+    latencies = sorted(s[1] for s in samples)
+    service = sorted(s[2] for s in samples)
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "shed": shed,
+        "errors": len(samples) - len(ok) - shed,
+        "outcomes": outcomes,
+        "throughput_rps": round(len(ok) / seconds, 2),
+        "records_per_second": round(sum(s[3] for s in ok) / seconds, 2),
+        "latency_ms": latency_stats(latencies),
+        "service_time_ms": latency_stats(service),
+    }
+
+
+def latency_stats(sorted_seconds):
+    if not sorted_seconds:
+        return {}
+    stats = {f"p{p:g}": round(percentile(sorted_seconds, p) * 1000, 3) for p in PERCENTILES}
+    stats["mean"] = round(sum(sorted_seconds) / len(sorted_seconds) * 1000, 3)
+    stats["max"] = round(sorted_seconds[-1] * 1000, 3)
+    return stats
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class DingTalkStub:
+    """假的钉钉机器人接口：按配置延迟应答，可以按比例返回限流错误，统计收到的消息"""
+    
+    def __init__(self, port=STUB_PORT, host='127.0.0.1', delay=0.05, error_rate=0.0):
+        stub = self
+        self.delay = delay
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.stats = {"messages": 0, "errors": 0, "bytes": 0}
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(stub.delay)
+                failed = random.random() < stub.error_rate
+                with stub.lock:
+                    stub.stats["messages"] += 1
+                    stub.stats["bytes"] += len(body)
+                    stub.stats["errors"] += failed
+                if failed:
+                    send_json(self, 200, {"errcode": 130101, "errmsg": "send too fast"})
+                else:
+                    send_json(self, 200, {"errcode": 0, "errmsg": "ok"})
+            
+            def do_GET(self):
+                with stub.lock:
+                    send_json(self, 200, dict(stub.stats))
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/robot/send"
+    
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="dingtalk-stub", daemon=True).start()
+        return self
+    
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_loadtest(url=DEFAULT_URL, rate=DEFAULT_RATE, duration=DEFAULT_DURATION, warmup=DEFAULT_WARMUP,
+                 mix=DEFAULT_MIX, connections=DEFAULT_CONNECTIONS, keep_alive=True, arrival="poisson",
+                 bulk_size=BULK_SIZE, message_bytes=MESSAGE_BYTES, get_path=GET_PATH, seed=None,
+                 label=None, stub=None):
+    """执行一次压测并返回结果；stub 为 DingTalkStub 时附带它在压测期间收到的消息数"""
+    factory = PayloadFactory(parse_mix(mix), bulk_size=bulk_size, message_bytes=message_bytes,
+                             get_path=get_path, seed=seed)
+    runner = LoadRunner(url, factory, rate, duration, warmup=warmup, connections=connections,
+                        keep_alive=keep_alive, arrival=arrival, seed=seed)
+    before = stub.snapshot() if stub else None
+    result = runner.run()
+    report = {
+        "label": label,
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "config": {"url": url, "rate": rate, "duration": duration, "warmup": warmup, "mix": mix,
+                   "connections": connections, "keep_alive": keep_alive, "arrival": arrival,
+                   "bulk_size": bulk_size, "message_bytes": message_bytes, "get_path": get_path, "seed": seed},
+    }
+    report.update(result)
+    if stub:
+        after = stub.snapshot()
+        report["dingtalk_stub"] = {k: after[k] - before[k] for k in after}
+    return report
+
+
+def print_report(report):
+    print(f"[LoadTest] {report['config']['url']} 目标 {report['config']['rate']:g} req/s, "
+          f"{'keep-alive' if report['config']['keep_alive'] else '每次新建连接'}, "
+          f"建立连接 {report['connections_opened']} 次, 最大积压 {report['max_backlog']}")
+    rows = [("overall", report["overall"])] + list(report["kinds"].items())
+    print(f"{'类型':<8} {'请求':>7} {'成功':>7} {'限流':>6} {'错误':>6} {'req/s':>9} {'记录/s':>9} "
+          f"{'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}")
+    for name, s in rows:
+        lat = s["latency_ms"]
+        cells = ' '.join(f"{lat.get(k, 0):>8.1f}" for k in ("p50", "p90", "p99", "p99.9", "max"))
+        print(f"{name:<8} {s['requests']:>7} {s['ok']:>7} {s['shed']:>6} {s['errors']:>6} "
+              f"{s['throughput_rps']:>9.1f} {s['records_per_second']:>9.1f} {cells}")
+    if report.get("dingtalk_stub"):
+        print(f"[LoadTest] 钉钉 stub 收到 {report['dingtalk_stub']['messages']} 条消息")
+
+
+def compare_reports(old, new):
+    """逐类型对比吞吐和延迟，返回 [(类型, 指标, 旧值, 新值, 变化百分比)]"""
+    rows = []
+    kinds = [("overall", old["overall"], new["overall"])]
+    kinds += [(k, old["kinds"][k], new["kinds"][k]) for k in new["kinds"] if k in old["kinds"]]
+    for kind, a, b in kinds:
+        metrics = [("throughput_rps", a["throughput_rps"], b["throughput_rps"])]
+        metrics += [(f"latency_{p}", a["latency_ms"].get(p), b["latency_ms"].get(p))
+                    for p in ("p50", "p99", "max")]
+        for name, x, y in metrics:
+            change = round((y - x) / x * 100, 1) if x and y is not None else None
+            rows.append((kind, name, x, y, change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook 服务压测工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    p = sub.add_parser("stub", help="启动假的钉钉机器人接口")
+    p.add_argument("--port", type=int, default=STUB_PORT)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--delay", type=float, default=0.05, help="每次应答前等待的秒数，模拟钉钉接口耗时")
+    p.add_argument("--error-rate", type=float, default=0.0, help="返回限流错误的比例")
+    
+    p = sub.add_parser("run", help="发起压测")
+    p.add_argument("--url", default=DEFAULT_URL)
+    p.add_argument("--rate", type=float, default=DEFAULT_RATE, help="每秒发起的请求数（开环）")
+    p.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    p.add_argument("--warmup", type=float, default=DEFAULT_WARMUP)
+    p.add_argument("--mix", default=DEFAULT_MIX, help="请求类型权重，如 single:8,bulk:1,get:1")
+    p.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS)
+    p.add_argument("--new-connections", action="store_true", help="每个请求新建连接，默认复用长连接")
+    p.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson")
+    p.add_argument("--bulk-size", type=int, default=BULK_SIZE)
+    p.add_argument("--message-bytes", type=int, default=MESSAGE_BYTES)
+    p.add_argument("--get-path", default=GET_PATH, help="get 类型请求的路径，如 /stats、/events?limit=100")
+    p.add_argument("--seed", type=int)
+    p.add_argument("--label", help="写进结果文件的版本标签")
+    p.add_argument("--stub-port", type=int, help="同时在这个端口启动钉钉 stub，并统计它收到的消息")
+    p.add_argument("--output", help="结果 JSON 文件")
+    
+    p = sub.add_parser("compare", help="对比两次压测结果")
+    p.add_argument("old")
+    p.add_argument("new")
+    args = parser.parse_args()
+    
+    if args.command == "stub":
+        stub = DingTalkStub(args.port, args.host, delay=args.delay, error_rate=args.error_rate)
+        print(f"[LoadTest] 钉钉 stub: {stub.url}")
+        try:
+            stub.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.server.server_close()
+            print(f"[LoadTest] 共收到 {stub.snapshot()}")
+        return
+    
+    if args.command == "compare":
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        print(f"[LoadTest] {old.get('label') or old.get('git_revision')} -> {new.get('label') or new.get('git_revision')}")
+        for kind, name, x, y, change in compare_reports(old, new):
+            print(f"{kind:<8} {name:<16} {x!s:>10} {y!s:>10} {'' if change is None else f'{change:+.1f}%':>9}")
+        return
+    
+    stub = DingTalkStub(args.stub_port).start() if args.stub_port else None
+    try:
+        report = run_loadtest(args.url, args.rate, args.duration, args.warmup, args.mix, args.connections,
+                              keep_alive=not args.new_connections, arrival=args.arrival,
+                              bulk_size=args.bulk_size, message_bytes=args.message_bytes,
+                              get_path=args.get_path, seed=args.seed, label=args.label, stub=stub)
+    finally:
+        if stub:
+            stub.close()
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[LoadTest] 结果已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
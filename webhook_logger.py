@@ -2,33 +2,651 @@
 """
 Webhook 接收服务 - 记录模式
 接收数据并保存到日志，每天中午汇总分析
+
+并发模式下使用 ThreadingHTTPServer 接收请求，记录先进入内存缓冲，
+由后台线程按组提交（group commit）批量追加到当天的 JSONL 文件。
+POST /bulk 接收 NDJSON 或 JSON 数组，一次请求记录一整批数据。
+GET /metrics 输出 Prometheus 格式的延迟、吞吐和组提交指标。
+GET /events?from=&to=&source=&category=&limit=&cursor= 按时间范围查询已记录的事件，
+最近几天查内存索引，更早的查压缩分段索引，结果流式输出，用 next_cursor 翻页。
+GET /recent?limit=&after=&source=&category= 返回环形缓冲里最近提交的事件，
+GET /recent/stream 以 Server-Sent Events 实时推送新事件（见 webhook_recent），
+--workers 多进程模式下这两个接口回复 400。
+每次提交后增量更新 hotspot_summary 的当天汇总，中午汇总直接读取统计状态。
+已结束的日志定期由 hotspot_store 压缩成带时间索引的分段文件。
+爬虫重复推送的相同话题由 webhook_dedup 按内容键过滤，不再重复写入。
+请求体超过上限回复 413；并发请求数或待提交记录数超过高水位时回复 429 / 503
+并带 Retry-After，不读取请求体，进程内存占用有上限。/bulk 读取过程中缓冲区
+达到高水位时，剩余的记录不再写入，逐条标记为可重试的错误。
+
+同时监听 Unix 域套接字（默认 run/webhook_logger.sock），本机爬虫通过
+webhook_client 走这个入口，不经过 TCP 协议栈；--host 127.0.0.1 可以不再对外暴露端口。
+
+--workers N 启动多进程模式：N 个 worker 通过 SO_REUSEPORT 共享端口，
+各自写入 segments/ 下的日志分段，master 定期按时间顺序合并到当天的 JSONL。
+每个 worker 的去重索引只看得到自己收到的记录，master 合并时再用自己的索引
+过滤一遍，被路由到不同 worker 的重复记录不会写进当天的 JSONL（这类记录
+worker 仍回复 ok，只是不会出现在合并后的日志里）。
 """
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
 import json
 import os
+import socketserver
+import threading
+import time
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from hotspot_store import RecentEventIndex, compact_pending, iter_events
+from hotspot_summary import HotspotAggregator
+from webhook_common import (RUN_DIR, InFlightLimit, bind_unix_socket, create_server, iter_bulk_records,
+                            read_content_length, reject, remove_unix_socket, send_json, serve_prefork,
+                            serve_until_signalled, start_unix_listener)
+from webhook_codec import BACKEND as JSON_BACKEND, dumps, loads, validate_record
+from webhook_dedup import DedupIndex
+from webhook_metrics import REGISTRY, MetricsHandlerMixin, instrumented
+from webhook_recent import (MAX_STREAM_CLIENTS, RECENT_EVENTS_SIZE, STREAM_HEARTBEAT, STREAM_RETRY_MS,
+                            RecentEvents, parse_event_id, record_matches)
 
 # 配置
-LOG_DIR = "/root/.openclaw/workspace/hotspots"
+LOG_DIR = os.environ.get("HOTSPOT_LOG_DIR", "/root/.openclaw/workspace/hotspots")  # 压测时指向临时目录
 os.makedirs(LOG_DIR, exist_ok=True)
+UNIX_SOCKET = f"{RUN_DIR}/webhook_logger.sock"
+
+# 组提交配置
+FLUSH_INTERVAL = 0.05      # 收到第一条记录后最多等待多久再提交（秒）
+FLUSH_MAX_RECORDS = 1000   # 单次提交的最大记录数，达到后立即提交
+FSYNC_POLICY = "always"    # always: 每次提交都 fsync；interval: 按 FSYNC_INTERVAL 间隔 fsync；never: 交给操作系统
+FSYNC_INTERVAL = 1.0
+COMMIT_TIMEOUT = 10.0      # 请求等待落盘的最长时间（秒）
+LISTEN_BACKLOG = 128       # 并发模式下的监听队列长度，爬虫突发推送时避免连接被重置
+
+# 过载保护
+MAX_BODY_BYTES = 1024 * 1024          # 单条记录请求体上限
+MAX_BULK_BODY_BYTES = 64 * 1024 * 1024  # POST /bulk 请求体上限
+MAX_IN_FLIGHT = 256        # 同时处理的 POST 请求数高水位，超出回复 429
+PENDING_HIGH_WATER = 20000  # 缓冲区待提交记录数高水位，超出回复 503
+RETRY_AFTER = 2            # 过载时建议客户端等待的秒数
+
+# 多进程模式配置
+MERGE_INTERVAL = 1.0       # master 合并分段的间隔（秒）
+# 只合并早于 当前时间 - MERGE_DELAY 的记录，保证跨 worker 有序。时间戳在进入组提交
+# 之前生成，提交（含 fsync）可能拖到 COMMIT_TIMEOUT，水位线不能比它短
+MERGE_DELAY = COMMIT_TIMEOUT + 5.0
+
+# 历史日志压缩
+STORE_DIR = f"{LOG_DIR}/store"
+COMPACT_INTERVAL = 600.0   # 检查并压缩已结束日志的间隔（秒）
+
+# 事件查询
+EVENTS_DEFAULT_LIMIT = 100
+EVENTS_MAX_LIMIT = 10000
+EVENTS_WRITE_BATCH = 200   # 流式输出时每攒够这么多条写一次 socket
+
+# 指标
+SAVE_SECONDS = REGISTRY.histogram("webhook_save_to_log_seconds", "save_to_log 耗时（含等待组提交）")
+COMMIT_SECONDS = REGISTRY.histogram("webhook_log_commit_seconds", "单次组提交写入文件（含 fsync）耗时")
+COMMIT_RECORDS = REGISTRY.histogram("webhook_log_commit_records", "单次组提交的记录数",
+                                    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+PENDING_RECORDS = REGISTRY.gauge("webhook_log_pending_records", "缓冲区中等待提交的记录数")
+IN_FLIGHT = REGISTRY.gauge("webhook_in_flight_requests", "正在处理的 POST 请求数")
+INDEXED_EVENTS = REGISTRY.gauge("webhook_events_indexed", "内存索引中的事件数")
+
+
+class JsonlGroupWriter:
+    """按组提交的 JSONL 追加写入器
+    
+    请求线程调用 append() 把记录放进缓冲区并拿到序号，再用 wait() 等待
+    该序号被提交。后台线程把缓冲区里积攒的记录一次性写入当天的文件，
+    文件句柄跨请求保持打开，日期变化时才切换。
+    
+    指定 segment 时写入 segments/YYYY-MM-DD.<segment>.jsonl，由 merge_segments() 合并。
+    on_commit(day, lines, start_offset, end_offset) 在每段数据写入当天文件后调用。
+    """
+    
+    def __init__(self, log_dir=LOG_DIR, flush_interval=FLUSH_INTERVAL,
+                 fsync_policy=FSYNC_POLICY, fsync_interval=FSYNC_INTERVAL,
+                 max_records=FLUSH_MAX_RECORDS, segment=None, on_commit=None):
+        if fsync_policy not in ("always", "interval", "never"):
+            raise ValueError(f"未知的 fsync 策略: {fsync_policy}")
+        self.log_dir = log_dir
+        self.segment = segment
+        self.on_commit = on_commit
+        if segment is not None:
+            os.makedirs(f"{log_dir}/segments", exist_ok=True)
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_records = max_records
+        
+        self._cond = threading.Condition()
+        self._pending = []
+        self._appended = 0      # 已进入缓冲区的记录序号
+        self._committed = 0     # 已处理（写入或失败）的记录序号
+        self._failures = []     # 最近写入失败的 (起始序号, 结束序号, 异常)
+        self._closed = False
+        
+        self._file = None
+        self._file_date = None
+        self._last_fsync = time.monotonic()
+        
+        self._thread = threading.Thread(target=self._run, name="jsonl-group-writer", daemon=True)
+        self._thread.start()
+    
+    def append(self, record):
+        """把记录放入缓冲区，返回用于 wait() 的序号"""
+        line = dumps(record) + '\n'
+        day = record["timestamp"][:10]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写入器已关闭")
+            self._pending.append((day, line))
+            self._appended += 1
+            self._cond.notify_all()
+            return self._appended
+    
+    def wait(self, seq, timeout=COMMIT_TIMEOUT):
+        """等待序号 seq 之前的记录全部提交，超时或写入失败时抛出异常"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._committed < seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("等待日志落盘超时")
+                self._cond.wait(remaining)
+            for start, end, error in self._failures:
+                if start < seq <= end:
+                    raise error
+    
+    def pending(self):
+        """缓冲区中等待提交的记录数"""
+        return len(self._pending)
+    
+    def close(self):
+        """提交剩余记录并关闭文件"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        if self._file:
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                # 攒一小段时间，让并发请求合并到同一次提交
+                deadline = time.monotonic() + self.flush_interval
+                while (len(self._pending) < self.max_records and not self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending
+                self._pending = []
+                start = self._committed
+                seq = self._appended
+            
+            try:
+                with COMMIT_SECONDS.time():
+                    self._commit(batch)
+                COMMIT_RECORDS.observe(len(batch))
+                error = None
+            except Exception as e:
+                print(f"[Webhook] 写入日志失败: {e}")
+                error = e
+            
+            with self._cond:
+                if error is not None:
+                    self._failures = self._failures[-99:] + [(start, seq, error)]
+                self._committed = seq
+                self._cond.notify_all()
+    
+    def _commit(self, batch):
+        lines = []
+        day = None
+        for record_day, line in batch:
+            if record_day != day and lines:
+                self._write(day, lines)
+                lines = []
+            day = record_day
+            lines.append(line)
+        if lines:
+            self._write(day, lines)
+        self._sync()
+    
+    def _write(self, day, lines):
+        if day != self._file_date:
+            if self._file:
+                self._sync(force=True)
+                self._file.close()
+            if self.segment is None:
+                path = f"{self.log_dir}/{day}.jsonl"
+            else:
+                path = f"{self.log_dir}/segments/{day}.{self.segment}.jsonl"
+            self._file = open(path, 'a', encoding='utf-8')
+            self._file_date = day
+        start_offset = self._file.tell()
+        self._file.write(''.join(lines))
+        self._file.flush()
+        if self.on_commit:
+            try:
+                self.on_commit(day, lines, start_offset, self._file.tell())
+            except Exception as e:
+                print(f"[Webhook] 汇总统计更新失败: {e}")
+    
+    def _sync(self, force=False):
+        if not self._file or self.fsync_policy == "never":
+            return
+        now = time.monotonic()
+        if force or self.fsync_policy == "always" or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+
+def _save_merge_state(state_file, state):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, state_file)
+
+
+def merge_segments(log_dir=LOG_DIR, delay=MERGE_DELAY, aggregator=None, dedup=None):
+    """把各 worker 的日志分段按时间顺序追加到当天的 JSONL
+    
+    每个分段已合并到的字节位置记录在 segments/merge_state.json。只合并时间戳
+    早于 当前时间 - delay 的记录，避免后到的早期记录打乱顺序；delay=None 时
+    合并全部（关闭时使用）。已完全合并且早于昨天的分段会被删除。
+    传入 aggregator 时同步更新汇总统计；传入 dedup（DedupIndex）时跳过其他 worker
+    已经写过的重复记录。
+    
+    追加之前先在状态文件的 "_merging" 里记下各天文件追加前的长度，追加完再写入
+    新的位置。两次写状态之间中断时，下次先把当天文件截回记下的长度再重新合并，
+    不会重复写入。解析不了的行跳过并计数，不会卡住后面的合并。
+    """
+    segment_dir = f"{log_dir}/segments"
+    if not os.path.isdir(segment_dir):
+        return 0
+    state_file = f"{segment_dir}/merge_state.json"
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            offsets = json.load(f)
+    except (FileNotFoundError, ValueError):
+        offsets = {}
+    interrupted = offsets.pop("_merging", {})
+    for day, size in interrupted.items():
+        path = f"{log_dir}/{day}.jsonl"
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            print(f"[Webhook] 上次合并 {day} 时中断，截回 {size} 字节后重新合并")
+            os.truncate(path, size)
+    
+    watermark = None
+    if delay is not None:
+        watermark = datetime.fromtimestamp(time.time() - delay).isoformat()
+    
+    pending = {}  # day -> [(timestamp, line, data)]
+    new_offsets = {}
+    bad_lines = 0
+    for name in sorted(os.listdir(segment_dir)):
+        if not name.endswith('.jsonl'):
+            continue
+        offset = offsets.get(name, 0)
+        with open(f"{segment_dir}/{name}", 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        for raw in data.splitlines(keepends=True):
+            if not raw.endswith(b'\n'):
+                break  # 半行，等 worker 写完
+            try:
+                line = raw.decode('utf-8')
+                record = json.loads(line)
+                timestamp = record["timestamp"]
+                if not isinstance(timestamp, str):
+                    raise ValueError("timestamp 不是字符串")
+            except (ValueError, KeyError, TypeError):
+                bad_lines += 1
+                offset += len(raw)
+                continue
+            if watermark is not None and timestamp > watermark:
+                break
+            pending.setdefault(name[:10], []).append((timestamp, line, record.get("data")))
+            offset += len(raw)
+        new_offsets[name] = offset
+    if bad_lines:
+        print(f"[Webhook] 合并分段时跳过 {bad_lines} 行无法解析的记录")
+    
+    batches = {}   # day -> [line]
+    registered = {}  # day -> [本次登记的去重键]，写入失败时撤销
+    duplicates = 0
+    for day, records in sorted(pending.items()):
+        records.sort(key=lambda r: r[0])
+        lines = []
+        for _, line, data in records:
+            if dedup and isinstance(data, dict):
+                key = dedup.check(day, data)
+                if key is None:
+                    duplicates += 1
+                    continue
+                registered.setdefault(day, []).append(key)
+            lines.append(line)
+        if lines:
+            batches[day] = lines
+    if duplicates:
+        print(f"[Webhook] 合并分段时跳过 {duplicates} 条其他 worker 已记录的重复数据")
+    
+    merged = 0
+    try:
+        if batches:
+            merging = {}
+            for day in batches:
+                path = f"{log_dir}/{day}.jsonl"
+                merging[day] = os.path.getsize(path) if os.path.exists(path) else 0
+            _save_merge_state(state_file, dict(offsets, _merging=merging))
+        
+        for day, lines in batches.items():
+            with open(f"{log_dir}/{day}.jsonl", 'a', encoding='utf-8') as f:
+                start_offset = f.tell()
+                f.write(''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+                end_offset = f.tell()
+            registered.pop(day, None)
+            if aggregator:
+                aggregator.observe(day, lines, start_offset, end_offset)
+            merged += len(lines)
+    finally:
+        # 没写成的记录下一轮会重新合并，先撤销登记，否则会被当成重复丢掉
+        for day, keys in registered.items():
+            for key in keys:
+                dedup.forget(day, key)
+    
+    # 清理已合并完的旧分段
+    yesterday = datetime.fromtimestamp(time.time() - 86400).strftime('%Y-%m-%d')
+    for name, offset in list(new_offsets.items()):
+        path = f"{segment_dir}/{name}"
+        if name[:10] < yesterday and offset >= os.path.getsize(path):
+            os.remove(path)
+            del new_offsets[name]
+    
+    if batches or interrupted or new_offsets != offsets:
+        _save_merge_state(state_file, new_offsets)
+    return merged
+
+
+def chain_callbacks(*callbacks):
+    """把多个 on_commit 回调合成一个，某个回调出错不影响其他回调"""
+    callbacks = [cb for cb in callbacks if cb]
+    if not callbacks:
+        return None
+    
+    def on_commit(*args):
+        for cb in callbacks:
+            try:
+                cb(*args)
+            except Exception as e:
+                print(f"[Webhook] 提交回调失败: {e}")
+    return on_commit
+
+
+def parse_cursor(cursor):
+    """翻页游标格式为 "时间戳,已返回的同时间戳记录数"，返回 (时间戳, 跳过条数)"""
+    timestamp, _, skip = cursor.rpartition(',')
+    if not timestamp or not skip.isdigit():
+        raise ValueError("cursor 格式错误")
+    return timestamp, int(skip)
+
 
-class WebhookHandler(BaseHTTPRequestHandler):
+def compact_logs():
+    """把已结束的日志压缩成分段存储"""
+    try:
+        compact_pending(LOG_DIR, STORE_DIR)
+    except Exception as e:
+        print(f"[Webhook] 压缩历史日志失败: {e}")
+
+
+def start_compactor():
+    """后台定期压缩历史日志，返回用于停止的 Event"""
+    stop = threading.Event()
+    
+    def loop():
+        while True:
+            compact_logs()
+            if stop.wait(COMPACT_INTERVAL):
+                return
+    
+    threading.Thread(target=loop, name="hotspot-compactor", daemon=True).start()
+    return stop
+
+
+class IngestServer(ThreadingHTTPServer):
+    """并发接收服务，每个请求一个线程"""
+    request_queue_size = LISTEN_BACKLOG
+
+
+class WebhookHandler(MetricsHandlerMixin, BaseHTTPRequestHandler):
+    metric_routes = ('/', '/bulk', '/metrics', '/events', '/recent', '/recent/stream')
+    
+    @instrumented
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/metrics':
+            self.send_metrics()
+            return
+        if url.path == '/events':
+            self.handle_events(parse_qs(url.query))
+            return
+        if url.path == '/recent':
+            self.handle_recent(parse_qs(url.query))
+            return
+        if url.path == '/recent/stream':
+            self.handle_recent_stream(parse_qs(url.query))
+            return
+        self.send_error(404)
+    
+    def handle_recent(self, params):
+        """返回环形缓冲中最近的事件 {"events": [...], "count": n, "last_id": ...}，按提交顺序排列"""
+        def param(name):
+            values = params.get(name)
+            return values[0] if values else None
+        
+        recent = self.server.recent
+        if recent is None:
+            send_json(self, 400, {"status": "error", "error": "多进程模式不支持 /recent，请使用 /events"})
+            return
+        try:
+            limit = int(param('limit') or min(EVENTS_DEFAULT_LIMIT, recent.size))
+            if not 0 < limit <= recent.size:
+                raise ValueError(f"limit 必须在 1 到 {recent.size} 之间")
+            after = parse_event_id(param('after'))
+        except ValueError as e:
+            send_json(self, 400, {"status": "error", "error": str(e)})
+            return
+        
+        source, category = param('source'), param('category')
+        last_id = recent.last_id()
+        lines = [line for _, line in recent.since(after) if record_matches(line, source, category)][-limit:]
+        body = (f'{{"events": [{",".join(lines)}], "count": {len(lines)}, "last_id": {last_id}}}').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_recent_stream(self, params):
+        """以 SSE 推送新提交的事件，直到客户端断开或服务停止
+        
+        带 Last-Event-ID 头（或 ?after=）时先补发缓冲中更新的事件；
+        服务重启后序号从头开始，客户端的 id 比当前最大序号还大时补发整个缓冲。
+        """
+        def param(name):
+            values = params.get(name)
+            return values[0] if values else None
+        
+        recent = self.server.recent
+        if not isinstance(self.server, socketserver.ThreadingMixIn):
+            send_json(self, 400, {"status": "error", "error": "单线程模式不支持事件流"})
+            return
+        if recent is None:
+            send_json(self, 400, {"status": "error", "error": "多进程模式不支持事件流"})
+            return
+        try:
+            after = parse_event_id(self.headers.get('Last-Event-ID') or param('after'))
+        except ValueError as e:
+            send_json(self, 400, {"status": "error", "error": str(e)})
+            return
+        if after == 0 and not param('after'):
+            after = recent.last_id()  # 新连接只推送之后的事件
+        elif after > recent.last_id():
+            after = 0
+        if not recent.try_attach(MAX_STREAM_CLIENTS):
+            reject(self, 429, "事件流连接数已满", RETRY_AFTER)
+            return
+        
+        source, category = param('source'), param('category')
+        self.close_connection = True
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.end_headers()
+            self.wfile.write(f"retry: {STREAM_RETRY_MS}\n\n".encode())
+            self.wfile.flush()
+            while True:
+                events = recent.wait(after, STREAM_HEARTBEAT)
+                if events is None:
+                    break
+                if not events:
+                    self.wfile.write(b": ping\n\n")
+                else:
+                    chunk = [f"id: {seq}\nevent: hotspot\ndata: {line}\n\n"
+                             for seq, line in events if record_matches(line, source, category)]
+                    after = events[-1][0]
+                    self.wfile.write(''.join(chunk).encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            recent.detach()
+    
+    def handle_events(self, params):
+        """按时间范围查询事件，流式输出 {"events": [...], "count": n, "next_cursor": ...}
+        
+        结果按时间排序；返回满 limit 条且后面还有数据时给出 next_cursor，
+        带上它（其余参数不变）再请求即得到下一页。
+        
+        游标是 (时间戳, 已返回的同时间戳条数)，只有每天的结果严格按时间戳排序、
+        同时间戳的记录先后固定时才不会漏条。并发写入的 JSONL 里时间戳可能略有
+        颠倒，所以排序放在写入之后：内存索引按时间戳插入，压缩分段在压缩时
+        按时间戳稳定排序，多进程模式下 master 合并分段时按时间戳排序并留出
+        MERGE_DELAY 的水位线。查询时不再排序，磁盘上的数据也是流式输出。
+        翻页期间新写入的、时间戳早于游标的记录不会出现在后面的页里。
+        """
+        def param(name):
+            values = params.get(name)
+            return values[0] if values else None
+        
+        try:
+            start, end = param('from'), param('to')
+            for value in (start, end):
+                if value:
+                    datetime.fromisoformat(value)
+            limit = int(param('limit') or EVENTS_DEFAULT_LIMIT)
+            if not 0 < limit <= EVENTS_MAX_LIMIT:
+                raise ValueError(f"limit 必须在 1 到 {EVENTS_MAX_LIMIT} 之间")
+            skip_timestamp, skip = None, 0
+            if param('cursor'):
+                skip_timestamp, skip = parse_cursor(param('cursor'))
+                start = skip_timestamp
+        except ValueError as e:
+            send_json(self, 400, {"status": "error", "error": str(e)})
+            return
+        
+        index = self.server.event_index
+        query = index.iter_events if index else iter_events
+        events = query(start, end, param('source'), param('category'))
+        
+        # 响应长度未知，不带 Content-Length，写完后关闭连接
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"events": [')
+        
+        count = 0
+        last_timestamp, same_timestamp = skip_timestamp, skip
+        next_cursor = None
+        chunk = []
+        for record in events:
+            timestamp = record.get("timestamp", "")
+            if skip and timestamp == skip_timestamp:
+                skip -= 1
+                continue
+            if count == limit:
+                next_cursor = f"{last_timestamp},{same_timestamp}"
+                break
+            same_timestamp = same_timestamp + 1 if timestamp == last_timestamp else 1
+            last_timestamp = timestamp
+            chunk.append(dumps(record))
+            count += 1
+            if len(chunk) >= EVENTS_WRITE_BATCH:
+                self.wfile.write(((',' if count > len(chunk) else '') + ','.join(chunk)).encode())
+                chunk = []
+        if chunk:
+            self.wfile.write(((',' if count > len(chunk) else '') + ','.join(chunk)).encode())
+        self.wfile.write(f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'.encode())
+    
+    @instrumented
     def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
+        bulk = self.path.startswith('/bulk')
+        content_length = read_content_length(self, MAX_BULK_BODY_BYTES if bulk else MAX_BODY_BYTES)
+        if content_length is None:
+            return
+        if self.server.log_writer.pending() >= PENDING_HIGH_WATER:
+            reject(self, 503, "日志写入积压，请稍后重试", RETRY_AFTER)
+            return
+        in_flight = self.server.in_flight
+        if not in_flight.try_acquire():
+            reject(self, 429, "并发请求过多，请稍后重试", RETRY_AFTER)
+            return
+        try:
+            if bulk:
+                self.handle_bulk(content_length)
+            else:
+                self.handle_record(content_length)
+        finally:
+            in_flight.release()
+    
+    def handle_record(self, content_length):
+        """记录单条数据"""
         post_data = self.rfile.read(content_length)
         
         try:
-            data = json.loads(post_data)
-            
+            data = loads(post_data)
+            if self.server.strict_schema:
+                validate_record(data)
+        except ValueError as e:
+            send_json(self, 400, {"status": "error", "error": str(e)})
+            return
+        
+        try:
             # 记录到日志文件
-            self.save_to_log(data)
+            saved = self.save_to_log(data)
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             self.wfile.write(json.dumps({
                 "status": "ok",
-                "message": "数据已记录"
+                "message": "数据已记录" if saved else "重复数据，已忽略",
+                "duplicate": not saved
             }).encode())
             
         except Exception as e:
@@ -41,29 +659,206 @@ class WebhookHandler(BaseHTTPRequestHandler):
                 "error": str(e)
             }).encode())
     
+    def handle_bulk(self, content_length):
+        """批量记录：整批进入缓冲区后只等待一次提交，返回每条记录的状态
+        
+        每条记录写入缓冲区前检查 PENDING_HIGH_WATER，积压时这一条和之后的记录
+        都标记为 {"status": "error", "retryable": true}，客户端按 Retry-After 重发这些记录。
+        """
+        writer = self.server.log_writer
+        dedup = self.server.dedup
+        start = time.perf_counter()
+        results = []
+        pending = []
+        shed = 0
+        validate = validate_record if self.server.strict_schema else None
+        for index, data, error in iter_bulk_records(self.rfile, content_length, validate):
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            if shed or writer.pending() >= PENDING_HIGH_WATER:
+                # 继续读完请求体以便逐条回复，但不再占用缓冲区
+                shed += 1
+                results.append({"index": index, "status": "error", "retryable": True,
+                                "error": "日志写入积压，请稍后重试"})
+                continue
+            record = {"timestamp": datetime.now().isoformat(), "data": data}
+            day = record["timestamp"][:10]
+            key = dedup.check(day, data) if dedup else None
+            if dedup and key is None:
+                results.append({"index": index, "status": "duplicate"})
+                continue
+            result = {"index": index, "status": "ok"}
+            results.append(result)
+            pending.append((writer.append(record), result, day, key))
+        
+        for seq, result, day, key in pending:
+            try:
+                writer.wait(seq)
+            except Exception as e:
+                result.update(status="error", error=str(e))
+                if dedup:
+                    dedup.forget(day, key)
+        SAVE_SECONDS.observe(time.perf_counter() - start)
+        
+        accepted = sum(1 for r in results if r["status"] == "ok")
+        duplicates = sum(1 for r in results if r["status"] == "duplicate")
+        failed = len(results) - accepted - duplicates
+        print(f"[Webhook] 批量记录: {accepted}/{len(results)} 条, 重复 {duplicates} 条"
+              + (f", 积压未写入 {shed} 条" if shed else ""))
+        status = 200
+        headers = None
+        if shed:
+            headers = {'Retry-After': str(RETRY_AFTER)}
+            if accepted + duplicates == 0:
+                status = 503
+        send_json(self, status, {
+            "status": "ok" if failed == 0 else "partial",
+            "accepted": accepted,
+            "duplicates": duplicates,
+            "failed": failed,
+            "results": results
+        }, headers)
+    
     def save_to_log(self, data):
-        """保存数据到日志文件"""
+        """保存数据到日志文件，等到所在批次提交后才返回；重复数据不写入，返回 False"""
         now = datetime.now()
-        log_file = f"{LOG_DIR}/{now.strftime('%Y-%m-%d')}.jsonl"
         
         record = {
             "timestamp": now.isoformat(),
             "data": data
         }
         
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        day = record["timestamp"][:10]
+        dedup = self.server.dedup
+        key = dedup.check(day, data) if dedup else None
+        if dedup and key is None:
+            return False
+        
+        writer = self.server.log_writer
+        try:
+            with SAVE_SECONDS.time():
+                writer.wait(writer.append(record))
+        except Exception:
+            if dedup:
+                dedup.forget(day, key)
+            raise
         
         print(f"[Webhook] 已记录: {data.get('source', 'unknown')} - {data.get('message', '')[:50]}...")
+        return True
     
     def log_message(self, format, *args):
         print(f"[Webhook] {format % args}")
 
-def start_server(port=8080):
-    server = HTTPServer(('0.0.0.0', port), WebhookHandler)
-    print(f"[Webhook] 记录模式启动在 http://0.0.0.0:{port}")
+def make_server(port=8080, threaded=True, flush_interval=FLUSH_INTERVAL,
+                fsync_policy=FSYNC_POLICY, segment=None, reuse_port=False, dedup=True, host='0.0.0.0',
+                strict_schema=False, recent_size=RECENT_EVENTS_SIZE):
+    server_class = IngestServer if threaded else HTTPServer
+    server = create_server(server_class, (host, port), WebhookHandler, reuse_port=reuse_port)
+    server.dedup = DedupIndex(log_dir=LOG_DIR) if dedup else None
+    server.strict_schema = strict_schema
+    server.in_flight = InFlightLimit(MAX_IN_FLIGHT)
+    IN_FLIGHT.set_function(server.in_flight.active)
+    # 多进程模式下由 master 合并分段时更新汇总
+    # 多进程模式下 worker 只看得到自己的分段，事件查询直接读 master 合并后的日志
+    server.aggregator = HotspotAggregator() if segment is None else None
+    server.event_index = RecentEventIndex(LOG_DIR, STORE_DIR) if segment is None else None
+    # 多进程模式下每个 worker 只看到约 1/N 的事件、序号各自独立，不提供环形缓冲
+    server.recent = RecentEvents(recent_size) if segment is None else None
+    on_commit = chain_callbacks(server.aggregator and server.aggregator.observe,
+                                server.event_index and server.event_index.observe,
+                                server.recent and server.recent.observe)
+    server.log_writer = JsonlGroupWriter(flush_interval=flush_interval, fsync_policy=fsync_policy,
+                                         segment=segment, on_commit=on_commit)
+    PENDING_RECORDS.set_function(server.log_writer.pending)
+    if server.event_index:
+        INDEXED_EVENTS.set_function(server.event_index.size)
+    return server
+
+def run_server(server, unix_sock=None):
+    listener = start_unix_listener(server, unix_sock) if unix_sock else None
+    try:
+        serve_until_signalled(server)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if listener:
+            listener.shutdown()
+        if server.recent:
+            server.recent.close()
+        server.server_close()
+        server.log_writer.close()
+        if server.aggregator:
+            server.aggregator.checkpoint()
+
+def start_server(port=8080, threaded=True, flush_interval=FLUSH_INTERVAL, fsync_policy=FSYNC_POLICY, workers=1,
+                 dedup=True, host='0.0.0.0', unix_socket=UNIX_SOCKET, strict_schema=False,
+                 recent_size=RECENT_EVENTS_SIZE):
+    print(f"[Webhook] 记录模式启动在 http://{host}:{port}")
+    # Unix 域套接字在 fork 之前绑定，多进程模式下所有 worker 共用
+    unix_sock = bind_unix_socket(unix_socket) if unix_socket else None
+    if unix_sock:
+        print(f"[Webhook] Unix 域套接字: {unix_socket}")
     print(f"[Webhook] 日志目录: {LOG_DIR}")
-    server.serve_forever()
+    print(f"[Webhook] {'并发' if threaded else '单线程'}模式, 提交间隔 {flush_interval}s, fsync 策略 {fsync_policy}")
+    print(f"[Webhook] 重复数据过滤: {'开启' if dedup else '关闭'}")
+    print(f"[Webhook] JSON 后端: {JSON_BACKEND}, 字段类型检查: {'开启' if strict_schema else '关闭'}")
+    if workers > 1:
+        # 每个 worker 有自己的去重索引，启动时从 master 合并后的日志预热；
+        # 跨 worker 的重复由 master 合并时的索引过滤
+        def worker_main():
+            run_server(make_server(port, threaded, flush_interval, fsync_policy,
+                                   segment=str(os.getpid()), reuse_port=True, dedup=dedup, host=host,
+                                   strict_schema=strict_schema, recent_size=recent_size),
+                       unix_sock)
+        
+        aggregator = HotspotAggregator()
+        merge_dedup = DedupIndex(log_dir=LOG_DIR) if dedup else None
+        last_compact = [0.0]
+        
+        def on_tick():
+            merge_segments(aggregator=aggregator, dedup=merge_dedup)
+            if time.monotonic() - last_compact[0] >= COMPACT_INTERVAL:
+                last_compact[0] = time.monotonic()
+                compact_logs()
+        
+        def on_stop():
+            merge_segments(delay=None, aggregator=aggregator, dedup=merge_dedup)
+            aggregator.checkpoint()
+            if unix_sock:
+                unix_sock.close()
+                remove_unix_socket(unix_socket)
+        
+        serve_prefork(worker_main, workers, on_tick=on_tick,
+                      tick_interval=MERGE_INTERVAL, on_stop=on_stop)
+        return
+    compactor = start_compactor()
+    try:
+        run_server(make_server(port, threaded, flush_interval, fsync_policy, dedup=dedup, host=host,
+                               strict_schema=strict_schema, recent_size=recent_size), unix_sock)
+    finally:
+        compactor.set()
+        if unix_sock:
+            unix_sock.close()
+            remove_unix_socket(unix_socket)
 
 if __name__ == "__main__":
-    start_server()
+    parser = argparse.ArgumentParser(description="Webhook 接收服务 - 记录模式")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", default="0.0.0.0", help="TCP 监听地址，只供本机使用时可设为 127.0.0.1")
+    parser.add_argument("--unix-socket", default=UNIX_SOCKET, help="Unix 域套接字路径，设为空字符串则不监听")
+    parser.add_argument("--single", action="store_true", help="使用单线程 HTTPServer")
+    parser.add_argument("--workers", type=int, default=1, help="多进程模式的 worker 数量")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--fsync", choices=["always", "interval", "never"], default=FSYNC_POLICY)
+    parser.add_argument("--no-dedup", action="store_true", help="关闭重复数据过滤")
+    parser.add_argument("--strict-schema", action="store_true",
+                        help="按 webhook_codec.HotspotRecord 检查 source/category/rank/title/hot_count 的类型")
+    parser.add_argument("--recent-size", type=int, default=RECENT_EVENTS_SIZE,
+                        help="GET /recent 环形缓冲保留的事件数")
+    args = parser.parse_args()
+    start_server(args.port, threaded=not args.single,
+                 flush_interval=args.flush_interval, fsync_policy=args.fsync,
+                 workers=args.workers, dedup=not args.no_dedup,
+                 host=args.host, unix_socket=args.unix_socket, strict_schema=args.strict_schema,
+                 recent_size=args.recent_size)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Webhook 服务指标
+进程内的计数器 / 仪表 / 直方图，以 Prometheus 文本格式通过 GET /metrics 暴露。
+
+请求路径上的开销只有一次 bisect 和几次加法（持锁），渲染在抓取时才做。
+多进程模式下每个 worker 维护自己的指标，/metrics 返回的是处理该请求的 worker
+的数据，可以用 webhook_worker_info 的 pid 标签区分。
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """仪表；可以 set()，也可以用 set_function() 在抓取时取值"""
+    
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+    
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+    
+    def set_function(self, fn, *labels):
+        with self._lock:
+            self._functions[labels] = fn
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = dict(self._values)
+            functions = dict(self._functions)
+        for labels, fn in functions.items():
+            try:
+                items[labels] = fn()
+            except Exception:
+                continue
+        for labels, value in sorted(items.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # labels -> [每个桶的计数..., +Inf 计数, 总和]
+        self._lock = threading.Lock()
+    
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+    
+    def time(self, *labels):
+        """上下文管理器，统计代码块耗时"""
+        return _Timer(self, labels)
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        names = self.labelnames + ('le',)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {series[-1]}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+    
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+    
+    def gauge(self, name, help_text, labelnames=()):
+        return self.register(Gauge(name, help_text, labelnames))
+    
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self.register(Histogram(name, help_text, buckets, labelnames))
+    
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "webhook_request_duration_seconds", "请求处理耗时", labelnames=("route", "method"))
+REQUEST_BODY_BYTES = REGISTRY.histogram(
+    "webhook_request_body_bytes", "请求体大小", buckets=SIZE_BUCKETS, labelnames=("route",))
+REQUESTS_TOTAL = REGISTRY.counter(
+    "webhook_requests_total", "按状态码统计的请求数", labelnames=("route", "method", "status"))
+WORKER_INFO = REGISTRY.gauge(
+    "webhook_worker_info", "输出本次指标的进程", labelnames=("pid",))
+
+
+class MetricsHandlerMixin:
+    """给 BaseHTTPRequestHandler 记录响应状态码并提供 /metrics 输出
+    
+    子类用 metric_routes 列出已知路由，其他路径统一记为 other，避免标签爆炸。
+    """
+    
+    metric_routes = ('/',)
+    
+    def log_request(self, code='-', size='-'):
+        self._metric_status = code
+        super().log_request(code, size)
+    
+    def metric_route(self):
+        path = self.path.split('?', 1)[0]
+        return path if path in self.metric_routes else 'other'
+    
+    def send_metrics(self):
+        WORKER_INFO.set(1, str(os.getpid()))
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def instrumented(method):
+    """装饰 do_GET / do_POST：记录耗时、请求体大小和状态码"""
+    @functools.wraps(method)
+    def wrapper(self):
+        start = time.perf_counter()
+        self._metric_status = None
+        route = self.metric_route()
+        verb = self.command
+        try:
+            return method(self)
+        finally:
+            status = int(self._metric_status or 500)
+            REQUEST_DURATION.observe(time.perf_counter() - start, route, verb)
+            REQUESTS_TOTAL.inc(route, verb, status)
+            length = self.headers.get('Content-Length')
+            if length and length.isdigit():
+                REQUEST_BODY_BYTES.observe(int(length), route)
+    return wrapper
@@ -2,35 +2,84 @@
 """
 Webhook 接收服务 - 接收爬虫数据
 监听指定端口，接收 POST 请求，处理后发送到钉钉群
+
+钉钉消息交给 DingTalkQueue 在后台投递，请求线程入队后立即返回 202，
+同一来源的消息按时间窗合并成汇总消息，发送频率不超过机器人的限速。
+GET /stats 查看队列深度和投递延迟，GET /metrics 输出 Prometheus 格式指标。
+POST /bulk 接收 NDJSON 或 JSON 数组，一次请求提交一整批数据。
+请求体超过上限回复 413；发送队列深度超过高水位时回复 503 并带 Retry-After，
+不读取请求体。
+--workers N 启动多进程模式，N 个 worker 通过 SO_REUSEPORT 共享端口。
+同时监听 Unix 域套接字（默认 run/webhook_receiver.sock），供本机爬虫使用。
 """
 from http.server import HTTPServer, BaseHTTPRequestHandler
+import argparse
 import json
 import subprocess
 import threading
-import requests
+import time
+
+from dingtalk_queue import DINGTALK_WEBHOOK, SPOOL_DIR, DingTalkQueue
+from webhook_common import (RUN_DIR, bind_unix_socket, create_server, iter_bulk_records,
+                            read_content_length, reject, remove_unix_socket, send_json, serve_prefork,
+                            serve_until_signalled, start_unix_listener)
+from webhook_codec import dumps, loads
+from webhook_metrics import REGISTRY, MetricsHandlerMixin, instrumented
+from webhook_sinks import record_text
 
 # 配置
-DINGTALK_WEBHOOK = "https://oapi.dingtalk.com/robot/send?access_token=3db7259b8553e2bc2b61d16481c998a6443f3f223196412381d2a7f8d9bfe2ef"
 OPENCLAW_GATEWAY = "http://127.0.0.1:18789"
+UNIX_SOCKET = f"{RUN_DIR}/webhook_receiver.sock"
+
+# 过载保护
+MAX_BODY_BYTES = 1024 * 1024            # 单条消息请求体上限
+MAX_BULK_BODY_BYTES = 16 * 1024 * 1024  # POST /bulk 请求体上限
+QUEUE_HIGH_WATER = 800     # 钉钉发送队列深度高水位（队列容量 1000），超出时不再接收
+RETRY_AFTER = 30           # 过载时建议客户端等待的秒数，按机器人限速大约能发出一批汇总
 
-class WebhookHandler(BaseHTTPRequestHandler):
+ENQUEUE_SECONDS = REGISTRY.histogram("webhook_send_to_dingtalk_seconds", "send_to_dingtalk 入队（含写暂存区）耗时")
+
+class WebhookHandler(MetricsHandlerMixin, BaseHTTPRequestHandler):
+    metric_routes = ('/', '/bulk', '/stats', '/metrics')
+    
+    @instrumented
     def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
+        bulk = self.path.startswith('/bulk')
+        content_length = read_content_length(self, MAX_BULK_BODY_BYTES if bulk else MAX_BODY_BYTES)
+        if content_length is None:
+            return
+        if self.server.dingtalk_queue.depth() >= QUEUE_HIGH_WATER:
+            reject(self, 503, "钉钉发送队列积压，请稍后重试", RETRY_AFTER)
+            return
+        if bulk:
+            self.handle_bulk(content_length)
+            return
         post_data = self.rfile.read(content_length)
         
         try:
-            data = json.loads(post_data)
-            print(f"[Webhook] 收到数据: {json.dumps(data, ensure_ascii=False)[:200]}...")
+            data = loads(post_data)
+            print(f"[Webhook] 收到数据: {dumps(data)[:200]}...")
             
             # 处理数据
             result = self.process_data(data)
             
-            self.send_response(200)
+            if not result["queued"]:
+                self.send_response(503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Retry-After', str(RETRY_AFTER))
+                self.end_headers()
+                self.wfile.write(json.dumps({
+                    "status": "error",
+                    "error": "钉钉发送队列已满"
+                }).encode())
+                return
+            
+            self.send_response(202)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             self.wfile.write(json.dumps({
-                "status": "ok",
-                "message": "数据已接收并处理"
+                "status": "accepted",
+                "message": "数据已接收，等待发送"
             }).encode())
             
         except Exception as e:
@@ -43,11 +92,39 @@ class WebhookHandler(BaseHTTPRequestHandler):
                 "error": str(e)
             }).encode())
     
+    def handle_bulk(self, content_length):
+        """批量接收：逐条入队，返回每条记录的状态"""
+        results = []
+        for index, data, error in iter_bulk_records(self.rfile, content_length):
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            try:
+                result = self.process_data(data)
+            except Exception as e:
+                results.append({"index": index, "status": "error", "error": str(e)})
+                continue
+            if result["queued"]:
+                results.append({"index": index, "status": "accepted"})
+            else:
+                results.append({"index": index, "status": "rejected", "error": "钉钉发送队列已满"})
+        
+        accepted = sum(1 for r in results if r["status"] == "accepted")
+        send_json(self, 202, {
+            "status": "accepted" if accepted == len(results) else "partial",
+            "accepted": accepted,
+            "failed": len(results) - accepted,
+            "results": results
+        })
+    
     def process_data(self, data):
         """处理接收到的数据"""
         # 提取关键信息
-        message = data.get('message', '')
+        message = record_text(data)
         source = data.get('source', 'unknown')
+        if message is None:
+            # 没有 message 也没有 title，不往钉钉队列里放空消息
+            return {"processed": True, "queued": False, "skipped": "没有可发送的文本"}
         
         print(f"[Webhook] 来源: {source}, 消息: {message[:100]}...")
         
@@ -55,32 +132,75 @@ class WebhookHandler(BaseHTTPRequestHandler):
         # 比如只转发包含特定关键词的消息
         
         # 发送到钉钉
-        self.send_to_dingtalk(f"【{source}】{message}")
+        queued = self.send_to_dingtalk(message, source)
         
-        return {"processed": True}
+        return {"processed": True, "queued": queued}
     
-    def send_to_dingtalk(self, message):
-        """发送消息到钉钉"""
-        try:
-            payload = {
-                "msgtype": "text",
-                "text": {
-                    "content": f"微博 - {message}"
-                }
-            }
-            resp = requests.post(DINGTALK_WEBHOOK, json=payload, timeout=30)
-            print(f"[Webhook] 钉钉发送结果: {resp.json()}")
-        except Exception as e:
-            print(f"[Webhook] 钉钉发送失败: {e}")
+    def send_to_dingtalk(self, message, source):
+        """把消息放入钉钉发送队列，返回是否入队成功"""
+        with ENQUEUE_SECONDS.time():
+            return self.server.dingtalk_queue.submit(message, source=source)
+    
+    @instrumented
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_metrics()
+            return
+        if self.path != '/stats':
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(self.server.dingtalk_queue.stats()).encode())
     
     def log_message(self, format, *args):
         print(f"[Webhook] {format % args}")
 
-def start_server(port=8080):
-    server = HTTPServer(('0.0.0.0', port), WebhookHandler)
-    print(f"[Webhook] 服务启动在 http://0.0.0.0:{port}")
+def run_server(port=8080, worker=False, host='0.0.0.0', unix_sock=None,
+               webhook_url=DINGTALK_WEBHOOK, spool_dir=SPOOL_DIR):
+    server = create_server(HTTPServer, (host, port), WebhookHandler, reuse_port=worker)
+    server.dingtalk_queue = DingTalkQueue(webhook_url, spool_dir=spool_dir, worker=worker)
+    listener = start_unix_listener(server, unix_sock) if unix_sock else None
+    try:
+        serve_until_signalled(server)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if listener:
+            listener.shutdown()
+        server.server_close()
+        server.dingtalk_queue.close()
+
+def start_server(port=8080, workers=1, host='0.0.0.0', unix_socket=UNIX_SOCKET,
+                 webhook_url=DINGTALK_WEBHOOK, spool_dir=SPOOL_DIR):
+    print(f"[Webhook] 服务启动在 http://{host}:{port}")
     print(f"[Webhook] 接收地址: http://你的服务器IP:{port}/webhook")
-    server.serve_forever()
+    if webhook_url != DINGTALK_WEBHOOK:
+        print(f"[Webhook] 钉钉地址: {webhook_url}")
+    unix_sock = bind_unix_socket(unix_socket) if unix_socket else None
+    if unix_sock:
+        print(f"[Webhook] Unix 域套接字: {unix_socket}")
+    try:
+        if workers > 1:
+            serve_prefork(lambda: run_server(port, worker=True, host=host, unix_sock=unix_sock,
+                                             webhook_url=webhook_url, spool_dir=spool_dir), workers)
+        else:
+            run_server(port, host=host, unix_sock=unix_sock, webhook_url=webhook_url, spool_dir=spool_dir)
+    finally:
+        if unix_sock:
+            unix_sock.close()
+            remove_unix_socket(unix_socket)
 
 if __name__ == "__main__":
-    start_server()
+    parser = argparse.ArgumentParser(description="Webhook 接收服务 - 转发到钉钉")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", default="0.0.0.0", help="TCP 监听地址，只供本机使用时可设为 127.0.0.1")
+    parser.add_argument("--unix-socket", default=UNIX_SOCKET, help="Unix 域套接字路径，设为空字符串则不监听")
+    parser.add_argument("--workers", type=int, default=1, help="多进程模式的 worker 数量")
+    parser.add_argument("--dingtalk-webhook", default=DINGTALK_WEBHOOK,
+                        help="钉钉机器人地址，压测时指向 webhook_loadtest.py stub")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="钉钉消息暂存目录")
+    args = parser.parse_args()
+    start_server(args.port, workers=args.workers, host=args.host, unix_socket=args.unix_socket,
+                 webhook_url=args.dingtalk_webhook, spool_dir=args.spool_dir)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Webhook 最近事件环形缓冲
+webhook_logger 每提交一批记录就把这些 JSONL 行放进固定容量的环形缓冲，
+GET /recent 返回最近的若干条，GET /recent/stream 以 Server-Sent Events
+推送新事件，看板不用再读日志文件或盯着服务的标准输出。
+
+缓冲里存的是已经落盘的原始 JSONL 行，输出时直接拼接，不重新编码；
+每条事件有递增的序号，作为 SSE 的 id，客户端断线重连时带上
+Last-Event-ID 即可补上缓冲中还在的事件。
+
+多进程模式下 worker 各自只收到一部分事件、序号互不相关，断线重连到另一个
+worker 时补发的内容是错的，所以 --workers 模式不开启环形缓冲，两个接口回复 400。
+"""
+import threading
+from collections import deque
+from itertools import islice
+
+from webhook_codec import loads
+from webhook_metrics import REGISTRY
+
+# 配置
+RECENT_EVENTS_SIZE = 1000     # 缓冲的事件条数
+STREAM_HEARTBEAT = 15.0       # 没有新事件时发送 SSE 注释行的间隔（秒），用于发现已断开的客户端
+STREAM_RETRY_MS = 3000        # 建议客户端断线后重连的等待时间（毫秒）
+MAX_STREAM_CLIENTS = 32       # 同时连接的 SSE 客户端上限
+
+STREAM_CLIENTS = REGISTRY.gauge("webhook_recent_stream_clients", "已连接的 SSE 客户端数")
+
+
+def record_matches(line, source=None, category=None):
+    """按来源 / 分类过滤一行 JSONL，不需要过滤时不解析"""
+    if not source and not category:
+        return True
+    try:
+        data = loads(line).get("data") or {}
+    except (ValueError, AttributeError):
+        return False
+    if source and data.get("source") != source:
+        return False
+    if category and data.get("category") != category:
+        return False
+    return True
+
+
+class RecentEvents:
+    """最近 size 条事件的环形缓冲，线程安全"""
+    
+    def __init__(self, size=RECENT_EVENTS_SIZE):
+        self.size = size
+        self._events = deque(maxlen=size)  # (序号, JSONL 行)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._clients = 0
+        STREAM_CLIENTS.set_function(lambda: self._clients)
+    
+    def observe(self, day, lines, start_offset, end_offset):
+        """JsonlGroupWriter 的 on_commit 回调"""
+        with self._cond:
+            for line in lines:
+                self._seq += 1
+                self._events.append((self._seq, line.rstrip('\n')))
+            self._cond.notify_all()
+    
+    def last_id(self):
+        with self._cond:
+            return self._seq
+    
+    def since(self, after=0, limit=None):
+        """返回序号大于 after 的事件，limit 指定时只取最新的 limit 条"""
+        with self._cond:
+            if not self._events:
+                return []
+            # 序号是连续的，直接算出起始位置
+            skip = max(0, after - self._events[0][0] + 1)
+            if limit:
+                skip = max(skip, len(self._events) - limit)
+            return list(islice(self._events, skip, None))
+    
+    def wait(self, after, timeout):
+        """等待序号大于 after 的新事件；超时返回空列表，缓冲已关闭时返回 None"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self._seq > after, timeout)
+            if self._closed:
+                return None
+            if self._seq <= after:
+                return []
+        return self.since(after)
+    
+    def try_attach(self, limit=MAX_STREAM_CLIENTS):
+        """登记一个 SSE 客户端，超过上限时返回 False"""
+        with self._cond:
+            if self._clients >= limit:
+                return False
+            self._clients += 1
+            return True
+    
+    def detach(self):
+        with self._cond:
+            self._clients -= 1
+    
+    def close(self):
+        """唤醒所有等待中的 SSE 连接让它们结束"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def parse_event_id(value):
+    """解析 Last-Event-ID / after 参数，缺省为 0"""
+    if not value:
+        return 0
+    event_id = int(value)
+    if event_id < 0:
+        raise ValueError("事件 id 不能为负数")
+    return event_id
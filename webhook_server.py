@@ -2,26 +2,66 @@
 """
 Webhook 接收服务
 接收外部请求，转发到 OpenClaw
+POST /bulk 接收 NDJSON 或 JSON 数组，一次请求处理一整批消息
+--workers N 启动多进程模式，N 个 worker 通过 SO_REUSEPORT 共享端口
+GET /metrics 输出 Prometheus 格式的延迟和吞吐指标
+请求体超过上限时回复 413，不读取请求体
+同时监听 Unix 域套接字（默认 run/webhook_server.sock），供本机程序使用
+process_message 通过 openclaw_client 的长连接池调用 OpenClaw 网关，网关熔断时回复 503
 """
 from http.server import HTTPServer, BaseHTTPRequestHandler
+import argparse
 import json
 import subprocess
 import threading
 
-class WebhookHandler(BaseHTTPRequestHandler):
+from openclaw_client import CircuitOpenError, GatewayClient
+from webhook_common import (RUN_DIR, bind_unix_socket, create_server, iter_bulk_records,
+                            read_content_length, reject, remove_unix_socket, send_json, serve_prefork,
+                            serve_until_signalled, start_unix_listener)
+from webhook_codec import loads
+from webhook_metrics import REGISTRY, MetricsHandlerMixin, instrumented
+
+OPENCLAW_GATEWAY = "http://127.0.0.1:18789"
+UNIX_SOCKET = f"{RUN_DIR}/webhook_server.sock"
+
+# 过载保护
+MAX_BODY_BYTES = 1024 * 1024            # 单条消息请求体上限
+MAX_BULK_BODY_BYTES = 16 * 1024 * 1024  # POST /bulk 请求体上限
+
+PROCESS_SECONDS = REGISTRY.histogram("webhook_process_message_seconds", "process_message 耗时")
+
+class WebhookHandler(MetricsHandlerMixin, BaseHTTPRequestHandler):
+    metric_routes = ('/', '/bulk', '/metrics')
+    
+    @instrumented
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_metrics()
+            return
+        self.send_error(404)
+    
+    @instrumented
     def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
+        bulk = self.path.startswith('/bulk')
+        content_length = read_content_length(self, MAX_BULK_BODY_BYTES if bulk else MAX_BODY_BYTES)
+        if content_length is None:
+            return
+        if bulk:
+            self.handle_bulk(content_length)
+            return
         post_data = self.rfile.read(content_length)
         
         try:
-            data = json.loads(post_data)
+            data = loads(post_data)
             message = data.get('message', '')
             
             # 处理消息
             print(f"[Webhook] 收到消息: {message}")
             
             # 调用 OpenClaw 处理
-            result = self.process_message(message)
+            with PROCESS_SECONDS.time():
+                result = self.process_message(message)
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
@@ -31,6 +71,8 @@ class WebhookHandler(BaseHTTPRequestHandler):
                 "result": result
             }).encode())
             
+        except CircuitOpenError as e:
+            reject(self, 503, str(e), e.retry_after)
         except Exception as e:
             self.send_response(500)
             self.send_header('Content-Type', 'application/json')
@@ -40,18 +82,71 @@ class WebhookHandler(BaseHTTPRequestHandler):
                 "error": str(e)
             }).encode())
     
+    def handle_bulk(self, content_length):
+        """批量处理：逐条调用 process_message，返回每条消息的结果"""
+        results = []
+        for index, data, error in iter_bulk_records(self.rfile, content_length):
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            try:
+                with PROCESS_SECONDS.time():
+                    result = self.process_message(data.get('message', ''))
+                results.append({"index": index, "status": "ok", "result": result})
+            except Exception as e:
+                results.append({"index": index, "status": "error", "error": str(e)})
+        
+        accepted = sum(1 for r in results if r["status"] == "ok")
+        send_json(self, 200, {
+            "status": "ok" if accepted == len(results) else "partial",
+            "accepted": accepted,
+            "failed": len(results) - accepted,
+            "results": results
+        })
+    
     def process_message(self, message):
-        # 这里可以调用 OpenClaw 或其他处理逻辑
-        return f"Processed: {message}"
+        """转发给 OpenClaw 网关，返回网关的响应"""
+        return self.server.gateway.post({"message": message, "name": "webhook"})
     
     def log_message(self, format, *args):
         # 简化日志输出
         print(f"[Webhook] {format % args}")
 
-def start_webhook_server(port=8080):
-    server = HTTPServer(('0.0.0.0', port), WebhookHandler)
+def run_webhook_server(port=8080, reuse_port=False, host='0.0.0.0', unix_sock=None):
+    server = create_server(HTTPServer, (host, port), WebhookHandler, reuse_port=reuse_port)
+    server.gateway = GatewayClient(OPENCLAW_GATEWAY)
+    listener = start_unix_listener(server, unix_sock) if unix_sock else None
+    try:
+        serve_until_signalled(server)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if listener:
+            listener.shutdown()
+        server.server_close()
+        server.gateway.close()
+
+def start_webhook_server(port=8080, workers=1, host='0.0.0.0', unix_socket=UNIX_SOCKET):
     print(f"[Webhook] 服务启动在端口 {port}")
-    server.serve_forever()
+    unix_sock = bind_unix_socket(unix_socket) if unix_socket else None
+    if unix_sock:
+        print(f"[Webhook] Unix 域套接字: {unix_socket}")
+    try:
+        if workers > 1:
+            serve_prefork(lambda: run_webhook_server(port, reuse_port=True, host=host, unix_sock=unix_sock),
+                          workers)
+        else:
+            run_webhook_server(port, host=host, unix_sock=unix_sock)
+    finally:
+        if unix_sock:
+            unix_sock.close()
+            remove_unix_socket(unix_socket)
 
 if __name__ == "__main__":
-    start_webhook_server()
+    parser = argparse.ArgumentParser(description="Webhook 接收服务 - 转发到 OpenClaw")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", default="0.0.0.0", help="TCP 监听地址，只供本机使用时可设为 127.0.0.1")
+    parser.add_argument("--unix-socket", default=UNIX_SOCKET, help="Unix 域套接字路径，设为空字符串则不监听")
+    parser.add_argument("--workers", type=int, default=1, help="多进程模式的 worker 数量")
+    args = parser.parse_args()
+    start_webhook_server(args.port, workers=args.workers, host=args.host, unix_socket=args.unix_socket)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Webhook 事件输出管道
+一条事件同时交给多个 sink（写日志文件、推送钉钉、转发 OpenClaw 网关），
+每个 sink 有自己的线程池、单次超时和重试策略，慢的 sink 只占用自己的线程，
+不会拖慢其他 sink。
+
+新增输出方式时继承 Sink 实现 send()，加到 SinkPipeline 的列表里即可。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+
+from openclaw_client import CircuitOpenError
+from webhook_metrics import REGISTRY
+
+SINK_SECONDS = REGISTRY.histogram("webhook_sink_seconds", "单个 sink 处理一条事件的耗时（含重试）",
+                                  labelnames=("sink",))
+SINK_RESULTS = REGISTRY.counter("webhook_sink_results_total", "按 sink 和结果统计的事件数",
+                                labelnames=("sink", "result"))
+
+
+class Sink:
+    """事件输出的基类
+    
+    timeout 是单次尝试的超时（秒），失败后最多重试 retries 次，
+    第 n 次重试前等待 backoff * 2^(n-1) 秒；concurrency 是该 sink 的线程数。
+    """
+    
+    name = "sink"
+    timeout = 5.0
+    retries = 0
+    backoff = 0.5
+    concurrency = 4
+    
+    def send(self, event):
+        """处理一条事件，失败时抛出异常；返回值会放进结果里"""
+        raise NotImplementedError
+    
+    def budget(self):
+        """包括所有重试在内的最长耗时"""
+        waits = sum(self.backoff * 2 ** n for n in range(self.retries))
+        return self.timeout * (self.retries + 1) + waits
+    
+    def close(self):
+        pass
+
+
+class FileLogSink(Sink):
+    """写入按天划分的 JSONL，由 JsonlGroupWriter 组提交"""
+    
+    name = "file"
+    timeout = 10.0
+    concurrency = 32  # 主要时间花在等待组提交上
+    
+    def __init__(self, writer):
+        self.writer = writer
+    
+    def send(self, event):
+        record = {"timestamp": event["timestamp"], "data": event["data"]}
+        self.writer.wait(self.writer.append(record), timeout=self.timeout)
+    
+    def close(self):
+        self.writer.close()
+
+
+def record_text(data):
+    """钉钉消息正文：优先用 message；爬虫推送的记录只有 title / rank / hot_count / link，
+    按这些字段拼一行；都没有时返回 None"""
+    message = (data.get("message") or "").strip()
+    if message:
+        return message
+    title = (data.get("title") or "").strip()
+    if not title:
+        return None
+    rank = str(data.get("rank") or "").strip()
+    if rank.isdigit():
+        text = f"第{rank}名: {title}"
+    else:
+        text = f"{rank}: {title}" if rank else title
+    hot_count = str(data.get("hot_count") or "").strip()
+    if hot_count:
+        text += f"（热度 {hot_count}）"
+    if data.get("link"):
+        text += f"\n{data['link']}"
+    return text
+
+
+class DingTalkSink(Sink):
+    """放入钉钉发送队列；真正的投递、合并和限速由 DingTalkQueue 在后台完成"""
+    
+    name = "dingtalk"
+    timeout = 1.0
+    retries = 2       # 队列满时稍等再试
+    backoff = 1.0
+    
+    def __init__(self, queue):
+        self.queue = queue
+    
+    def send(self, event):
+        data = event["data"]
+        text = record_text(data)
+        if text is None:
+            return "skipped"  # 没有可发送的文本，不往队列里放空消息
+        if not self.queue.submit(text, source=data.get("source", "unknown")):
+            raise RuntimeError("钉钉发送队列已满")
+    
+    def close(self):
+        self.queue.close()
+
+
+class GatewaySink(Sink):
+    """通过 GatewayClient 的长连接池转发到 OpenClaw 网关"""
+    
+    name = "gateway"
+    timeout = 5.0
+    retries = 2
+    backoff = 0.5
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def send(self, event):
+        data = event["data"]
+        return self.client.post({
+            "message": data.get("message", ""),
+            "name": data.get("source", "webhook"),
+            "data": data,
+        })
+    
+    def close(self):
+        self.client.close()
+
+
+class SinkPipeline:
+    """把事件并发分发给所有 sink"""
+    
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self._pools = {
+            sink.name: ThreadPoolExecutor(max_workers=sink.concurrency, thread_name_prefix=f"sink-{sink.name}")
+            for sink in self.sinks
+        }
+    
+    def dispatch(self, data, timestamp=None):
+        """分发一条事件并等待结果，返回 {sink 名: 结果}"""
+        return self.collect(self.submit(data, timestamp))
+    
+    def submit(self, data, timestamp=None):
+        """把事件交给所有 sink 后立即返回，用 collect() 取结果
+        
+        timestamp 默认为当前时间，回放历史记录时传入原始时间戳。
+        """
+        event = {"timestamp": timestamp or datetime.now().isoformat(), "data": data}
+        futures = [(sink, self._pools[sink.name].submit(self._deliver, sink, event))
+                   for sink in self.sinks]
+        return time.monotonic(), futures
+    
+    def collect(self, pending):
+        """等待 submit() 提交的事件，结果的 status 为 ok / error / timeout
+        
+        每个 sink 从提交时起最多等待自己的 budget()，超时的 sink 在后台继续执行，
+        不影响其他 sink 的结果。
+        """
+        start, futures = pending
+        results = {}
+        for sink, future in futures:
+            remaining = sink.budget() - (time.monotonic() - start)
+            try:
+                results[sink.name] = future.result(timeout=max(0, remaining))
+            except FutureTimeout:
+                SINK_RESULTS.inc(sink.name, "timeout")
+                results[sink.name] = {"status": "timeout"}
+        return results
+    
+    def close(self):
+        for sink in self.sinks:
+            self._pools[sink.name].shutdown(wait=True)
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"[Sink] 关闭 {sink.name} 失败: {e}")
+    
+    def _deliver(self, sink, event):
+        start = time.perf_counter()
+        error = None
+        for attempt in range(sink.retries + 1):
+            if attempt:
+                time.sleep(sink.backoff * 2 ** (attempt - 1))
+            try:
+                value = sink.send(event)
+            except CircuitOpenError as e:
+                error = e
+                break  # 熔断期间重试没有意义
+            except Exception as e:
+                error = e
+                print(f"[Sink] {sink.name} 第 {attempt + 1} 次发送失败: {e}")
+                continue
+            SINK_SECONDS.observe(time.perf_counter() - start, sink.name)
+            SINK_RESULTS.inc(sink.name, "ok")
+            result = {"status": "ok", "attempts": attempt + 1}
+            if value is not None:
+                result["result"] = value
+            return result
+        SINK_SECONDS.observe(time.perf_counter() - start, sink.name)
+        SINK_RESULTS.inc(sink.name, "error")
+        return {"status": "error", "attempts": attempt + 1, "error": str(error)}
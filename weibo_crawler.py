@@ -8,6 +8,13 @@ import json
 import re
 from datetime import datetime
 
+from dingtalk_queue import DINGTALK_WEBHOOK, RateLimiter
+from topic_classifier import load_rules
+from webhook_client import post_bulk
+
+# Category rules live in config/weibo_category_rules.json
+TOPIC_RULES = load_rules("medical")
+
 def fetch_weibo_hot():
     """Fetch Weibo hot search list"""
     
@@ -54,7 +61,7 @@ def parse_weibo_data(html_or_json, source_name):
                 return items
         except:
             pass
-    
+        
     elif source_name == "tophub":
         # Parse HTML
         items = []
@@ -72,50 +79,20 @@ def parse_weibo_data(html_or_json, source_name):
     
     return None
 
-def filter_medical_topics(items):
-    """Filter medical and aesthetic topics"""
-    
-    # Keywords for classification
-    medical_keywords = ["药", "医药", "医疗", "医院", "医生", "病", "治疗", "疫苗", "健康", "医保", "新冠", "流感", "发烧", "感冒"]
-    dental_keywords = ["牙", "口腔", "牙科", "牙齿", "矫正", "种植"]
-    eye_keywords = ["眼", "眼科", "视力", "近视", "激光", "眼镜"]
-    aesthetic_keywords = ["医美", "整形", "美容", "玻尿酸", "隆鼻", "双眼皮", "抽脂", "抗衰", "皮肤", "激光"]
-    
-    medical_items = []
-    dental_items = []
-    eye_items = []
-    aesthetic_items = []
-    
-    for item in items:
-        title = item.get("title", "")
-        rank = item.get("rank", 999)
-        
-        # Check dental (rank <= 20)
-        if rank <= 20 and any(kw in title for kw in dental_keywords):
-            dental_items.append({**item, "category": "口腔牙科"})
-            continue
-        
-        # Check eye (rank <= 20)
-        if rank <= 20 and any(kw in title for kw in eye_keywords):
-            eye_items.append({**item, "category": "眼科"})
-            continue
-        
-        # Check aesthetic (rank <= 20)
-        if rank <= 20 and any(kw in title for kw in aesthetic_keywords):
-            aesthetic_items.append({**item, "category": "医美"})
-            continue
-        
-        # Check medical (rank <= 13)
-        if rank <= 13 and any(kw in title for kw in medical_keywords):
-            medical_items.append({**item, "category": "医药"})
-            continue
+def filter_medical_topics(items, mode=None):
+    """Filter medical and aesthetic topics by the shared category rules
     
-    return {
-        "medical": medical_items,
-        "dental": dental_items,
-        "eye": eye_items,
-        "aesthetic": aesthetic_items
-    }
+    Returns {category key: items} in rule order. mode="multi" lists a topic
+    under every category it qualifies for instead of only the first one.
+    """
+    
+    results = {rule.key: [] for rule in TOPIC_RULES.rules}
+    rows = [(item.get("title", ""), item.get("rank", 999)) for item in items]
+    for item, matched in zip(items, TOPIC_RULES.classify_many(rows, mode=mode)):
+        for rule in matched:
+            results[rule.key].append({**item, "category": rule.name})
+    
+    return results
 
 def format_message(results):
     """Format results for DingTalk"""
@@ -143,7 +120,10 @@ def format_message(results):
     return "\n".join(lines)
 
 def send_to_dingtalk(message, webhook_url):
-    """Send message to DingTalk"""
+    """Send message to DingTalk, sharing the per-robot rate limit with webhook_receiver"""
+    
+    if not RateLimiter(webhook_url).acquire(timeout=120):
+        return {"error": "DingTalk rate limit: no quota available"}
     
     payload = {
         "msgtype": "text",
@@ -158,6 +138,26 @@ def send_to_dingtalk(message, webhook_url):
     except Exception as e:
         return {"error": str(e)}
 
+def push_to_logger(results):
+    """Record filtered topics in the local webhook_logger (Unix socket, TCP fallback)"""
+    records = [
+        {
+            "source": "weibo_crawler",
+            "title": item["title"],
+            "rank": item["rank"],
+            "hot_count": item.get("hot", ""),
+            "category": item["category"]
+        }
+        for items in results.values() for item in items
+    ]
+    if not records:
+        return
+    try:
+        status, _ = post_bulk(records)
+        print(f"Logged {len(records)} topics: HTTP {status}")
+    except OSError as e:
+        print(f"Webhook logger unavailable: {e}")
+
 def main():
     # Fetch data
     items = fetch_weibo_hot()
@@ -169,14 +169,14 @@ def main():
     
     # Filter
     results = filter_medical_topics(items)
+    push_to_logger(results)
     
     # Format
     message = format_message(results)
     print(message)
     
     # Send (optional, for testing)
-    webhook = "https://oapi.dingtalk.com/robot/send?access_token=3db7259b8553e2bc2b61d16481c998a6443f3f223196412381d2a7f8d9bfe2ef"
-    result = send_to_dingtalk(message, webhook)
+    result = send_to_dingtalk(message, DINGTALK_WEBHOOK)
     print(f"Send result: {result}")
 
 if __name__ == "__main__":
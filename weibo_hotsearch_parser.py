@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+微博热搜榜页面解析
+s.weibo.com/top/summary 的榜单是一个表格，每行 td-01 是排名（置顶行是
+<i class="icon-top">），td-02 里是话题链接和热度标签 <span>。
+
+以前用一个很长的 re.DOTALL 正则匹配整行，标签顺序或属性稍有变化
+（比如 a 标签没有 target="_blank"、td-02 多了一个 class）就一条都匹配不到，
+只能把页面存到 data/weibo_debug.html 再排查。这里改用标准库 html.parser
+逐个标签走一遍：只认 td-01 / td-02 这两个 class，不关心属性顺序和中间多出来的标签，
+整体是一次线性扫描。parse_hotsearch() 只把 pl_top_realtimehot 下的榜单表格交给
+解析器，找不到时再解析整个页面；HotSearchParser 本身也可以分块 feed()。
+
+    hot_list = parse_hotsearch(html)   -> [{'rank', 'title', 'link', 'hot_count'}, ...]
+
+没有 </tr> 的行（比如被截断的页面最后一行）不会输出。
+
+用法: python3 weibo_hotsearch_parser.py [页面文件 ...] [--rounds 200] [--repeat 1]
+      与原来的正则对比耗时并核对结果，默认使用 data/weibo_debug.html
+"""
+import argparse
+import os
+import re
+import time
+from html.parser import HTMLParser
+
+# 配置
+BASE_URL = 'https://s.weibo.com'
+TABLE_ID = 'pl_top_realtimehot'   # 榜单表格外层 div 的 id
+DEBUG_PAGES = (
+    "/root/.openclaw/workspace/data/weibo_debug.html",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "weibo_debug.html"),
+)
+
+
+def normalize_row(rank, link, title, hot_count):
+    """整理一行的字段，标题为空时返回 None"""
+    rank = rank.strip()
+    title = title.strip()
+    hot_count = hot_count.strip() if hot_count else ''
+    
+    # 处理排名（可能是 "icon-top" 或数字）
+    if not rank or 'icon' in rank:
+        rank = '置顶'
+    
+    # 确保链接完整
+    if link.startswith('/'):
+        link = f'{BASE_URL}{link}'
+    elif not link.startswith('http'):
+        link = f'{BASE_URL}/weibo?q={link}'
+    
+    if not title:
+        return None
+    return {
+        'rank': rank,
+        'title': title,
+        'link': link,
+        'hot_count': hot_count
+    }
+
+
+class HotSearchParser(HTMLParser):
+    """热搜表格的事件驱动解析器，解析结果在 rows 中"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._row = None    # 当前行已收集的字段
+        self._cell = None   # 'rank' / 'topic' / None
+        self._text = None   # 正在收集文本的字段名
+    
+    def _start_row(self):
+        self._row = {'rank': [], 'link': None, 'title': None, 'hot_count': None}
+        self._cell = None
+        self._text = None
+    
+    def _end_row(self):
+        row = self._row
+        self._row = None
+        self._cell = None
+        self._text = None
+        if row is None or row['title'] is None:
+            return
+        item = normalize_row(''.join(row['rank']), row['link'] or '', row['title'], row['hot_count'])
+        if item:
+            self.rows.append(item)
+    
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            # 上一行没有闭合时按已结束处理
+            self._end_row()
+            self._start_row()
+            return
+        row = self._row
+        if row is None:
+            return
+        if tag == 'td':
+            classes = (dict(attrs).get('class') or '').split()
+            if 'td-01' in classes:
+                self._cell = 'rank'
+            elif 'td-02' in classes:
+                self._cell = 'topic'
+            else:
+                self._cell = None
+            self._text = None
+        elif self._cell == 'topic':
+            if tag == 'a' and row['title'] is None:
+                attrs = dict(attrs)
+                link = attrs.get('href') or ''
+                # 推广位的 href 是 javascript:void(0)，真实地址在 href_to
+                if link.startswith('javascript') and attrs.get('href_to'):
+                    link = attrs['href_to']
+                row['link'] = link
+                row['title'] = []
+                self._text = 'title'
+            elif tag == 'span' and row['hot_count'] is None:
+                row['hot_count'] = []
+                self._text = 'hot_count'
+    
+    def handle_endtag(self, tag):
+        if self._row is None:
+            return
+        if tag == 'tr':
+            self._end_row()
+        elif tag in ('tbody', 'table'):
+            self._end_row()
+        elif tag == 'td':
+            self._cell = None
+            self._text = None
+        elif tag == 'a' and self._text == 'title':
+            self._row['title'] = ''.join(self._row['title'])
+            self._text = None
+        elif tag == 'span' and self._text == 'hot_count':
+            self._row['hot_count'] = ''.join(self._row['hot_count'])
+            self._text = None
+    
+    def handle_data(self, data):
+        if self._cell == 'rank':
+            self._row['rank'].append(data)
+        elif self._text:
+            self._row[self._text].append(data)
+    
+    def close(self):
+        """结束解析并返回结果，未闭合的最后一行丢弃"""
+        super().close()
+        self._row = None
+        return self.rows
+
+
+def _feed(html):
+    parser = HotSearchParser()
+    parser.feed(html)
+    return parser.close()
+
+
+def _table_section(html):
+    """截取榜单所在的 <table>，页头的脚本和样式占了页面的一大半，不用逐个标签解析"""
+    start = html.find('<table', max(html.find(TABLE_ID), 0))
+    if start < 0:
+        return html
+    end = html.find('</table>', start)
+    return html[start:] if end < 0 else html[start:end + len('</table>')]
+
+
+def parse_hotsearch(html):
+    """解析热搜数据"""
+    if not html:
+        return []
+    section = _table_section(html)
+    rows = _feed(section)
+    if not rows and section is not html:
+        # 榜单不在预期的位置时再完整解析一遍
+        rows = _feed(html)
+    return rows
+
+
+# 原来的整行正则，只用于基准测试对比
+LEGACY_PATTERN = re.compile(r'<tr[^>]*>\s*<td[^>]*class=["\']td-01[^"\']*["\'][^>]*>\s*(?:<i[^>]*>)?([^\s<]*)(?:</i>)?\s*</td>\s*<td[^>]*class=["\']td-02["\'][^>]*>\s*<a[^>]*href=["\']([^"\']+)["\'][^>]*target=["\']_blank["\'][^>]*>([^<]+)</a>\s*(?:<i[^>]*>[^<]*</i>)?\s*(?:<span[^>]*>([^<]*)</span>)?\s*</td>', re.DOTALL)
+
+
+def parse_hotsearch_regex(html):
+    if not html:
+        return []
+    rows = (normalize_row(*match) for match in LEGACY_PATTERN.findall(html))
+    return [row for row in rows if row]
+
+
+def benchmark(html, rounds=200):
+    """对比正则与 html.parser，返回 ({名称: 毫秒/页}, {名称: 解析条数}, 结果是否一致)"""
+    timings = {}
+    counts = {}
+    results = {}
+    for name, fn in (("正则", parse_hotsearch_regex), ("html.parser", parse_hotsearch)):
+        results[name] = fn(html)
+        counts[name] = len(results[name])
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn(html)
+        timings[name] = (time.perf_counter() - start) / rounds * 1e3
+    return timings, counts, results["正则"] == results["html.parser"]
+
+
+# 模拟改版：每项把页面中的一段文本替换掉，看两种解析方式还能解析出多少条
+MARKUP_SHIFTS = {
+    "a 标签去掉 target": ('target="_blank"', ''),
+    "td-02 多一个 class": ('class="td-02"', 'class="td-02 td-topic"'),
+    "属性换行": ('<a href=', '<a\n   href='),
+    "标题前插入图标": ('target="_blank">', 'target="_blank"><img src="/icon.png">'),
+}
+
+
+def check_markup_shifts(html):
+    """返回 {改动: (正则条数, html.parser 条数)}"""
+    results = {}
+    for name, (old, new) in MARKUP_SHIFTS.items():
+        shifted = html.replace(old, new)
+        results[name] = (len(parse_hotsearch_regex(shifted)), len(parse_hotsearch(shifted)))
+    return results
+
+
+def _repeat_rows(html, times):
+    """把榜单表格的行复制 times 倍，模拟更大的页面"""
+    start = html.find('<tbody>')
+    end = html.rfind('</tr>')
+    if times <= 1 or start < 0 or end < start:
+        return html
+    body_start = start + len('<tbody>')
+    body_end = end + len('</tr>')
+    return html[:body_start] + html[body_start:body_end] * times + html[body_end:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热搜页面解析基准测试")
+    parser.add_argument("pages", nargs="*", help="保存的热搜页面，默认使用 data/weibo_debug.html")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=1, help="把表格行复制多少倍，模拟更大的页面")
+    args = parser.parse_args()
+    
+    pages = args.pages or [p for p in DEBUG_PAGES if os.path.exists(p)][:1]
+    if not pages:
+        print("[Parser] 没有找到保存的热搜页面")
+        return
+    for path in pages:
+        with open(path, encoding='utf-8') as f:
+            html = _repeat_rows(f.read(), args.repeat)
+        timings, counts, same = benchmark(html, args.rounds)
+        print(f"[Parser] {path}（{len(html)} 字符，{args.rounds} 轮）")
+        for name, millis in timings.items():
+            print(f"  {name:<12} {millis:8.3f} 毫秒/页  解析 {counts[name]} 条")
+        print(f"  结果{'一致' if same else '不一致'}")
+        for name, (regex_count, parser_count) in check_markup_shifts(html).items():
+            print(f"  {name:<14} 正则 {regex_count:>4} 条, html.parser {parser_count:>4} 条")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,11 @@ import json
 import requests
 from datetime import datetime
 
+from topic_classifier import load_rules
+
+# 分类规则见 config/weibo_category_rules.json
+TOPIC_RULES = load_rules("medical")
+
 def fetch_weibo():
     """Fetch weibo hot search"""
     try:
@@ -24,36 +29,12 @@ def fetch_weibo():
 
 def filter_topics(items):
     """Filter medical topics"""
-    medical_keywords = ["药", "医药", "医疗", "医院", "医生", "病", "治疗", "疫苗", "健康", "医保", "新冠", "流感", "发烧", "感冒"]
-    dental_keywords = ["牙", "口腔", "牙科", "牙齿", "矫正", "种植"]
-    eye_keywords = ["眼", "眼科", "视力", "近视", "激光", "眼镜"]
-    aesthetic_keywords = ["医美", "整形", "美容", "玻尿酸", "隆鼻", "双眼皮", "抽脂", "抗衰", "皮肤", "喷雾"]
-    
     results = []
-    for item in items:
-        title = item.get('word', '')
-        rank = item.get('realpos', 999)
-        hot = item.get('num', 0)
-        
-        # 医美/皮肤类 (rank <= 20)
-        if rank <= 20 and any(kw in title for kw in aesthetic_keywords):
-            results.append({"rank": rank, "title": title, "hot": hot, "category": "医美/皮肤"})
-            continue
-        
-        # 眼科 (rank <= 20)
-        if rank <= 20 and any(kw in title for kw in eye_keywords):
-            results.append({"rank": rank, "title": title, "hot": hot, "category": "眼科"})
-            continue
-        
-        # 口腔牙科 (rank <= 20)
-        if rank <= 20 and any(kw in title for kw in dental_keywords):
-            results.append({"rank": rank, "title": title, "hot": hot, "category": "口腔牙科"})
-            continue
-        
-        # 医药类 (rank <= 13)
-        if rank <= 13 and any(kw in title for kw in medical_keywords):
-            results.append({"rank": rank, "title": title, "hot": hot, "category": "医药"})
-            continue
+    rows = [(item.get('word', ''), item.get('realpos', 999)) for item in items]
+    for item, matched in zip(items, TOPIC_RULES.classify_many(rows)):
+        if matched:
+            results.append({"rank": item.get('realpos', 999), "title": item.get('word', ''),
+                            "hot": item.get('num', 0), "category": matched[0].name})
     
     return results
 
@@ -71,7 +52,8 @@ def format_message(results):
             lines.append(f"  排位{r['rank']}. {r['title']} (热度: {r['hot']})")
         return "\n".join(lines)
     else:
-        return f"微博 - 【微博热搜医药监测 - {now}】\n\n本次暂无符合筛选条件的热搜话题。\n\n筛选规则：\n- 医药话题：排位13名以内\n- 口腔/眼科/医美：排位20名以内"
+        rules = "\n".join(f"- {rule.name}：排位{rule.max_rank}名以内" for rule in TOPIC_RULES.rules)
+        return f"微博 - 【微博热搜医药监测 - {now}】\n\n本次暂无符合筛选条件的热搜话题。\n\n筛选规则：\n{rules}"
 
 def main():
     items = fetch_weibo()